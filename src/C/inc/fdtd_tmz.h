@@ -2,12 +2,16 @@
 #define FDTD_TMZ_H 1
 
 /* Headers */
+#include <stdint.h>
 #include <stdlib.h>
 #include <stdio.h>
 
 /* Macros */
 #define ARR_SIZE (g->sizeX * g->sizeY)
-#define EzG(TIME, MM, NN) *(g->Ez + (TIME)*ARR_SIZE + (MM)*g->sizeY + (NN))
+#define EZ_LEVELS 2 // Time levels of Ez kept in its ring buffer
+#define EzG(TIME, MM, NN) *(g->Ez + ((TIME) % EZ_LEVELS) * ARR_SIZE + (MM)*g->sizeY + (NN))
+#define MatG(MM, NN) g->material[(MM)*g->sizeY + (NN)]
+#define CoefG(MM, NN) g->materials[MatG(MM, NN)]
 #define EzLeft(M, Q, N) ezLeft[(N)*6 + (Q)*3 + (M)]
 #define EzRight(M, Q, N) ezRight[(N)*6 + (Q)*3 + (M)]
 #define EzTop(N, Q, M) ezTop[(M)*6 + (Q)*3 + (N)]
@@ -23,27 +27,49 @@
         exit(-1);                                                      \
     }
 
+/* Material IDs; the only two supported, since field updates compare with MAT_PEC */
+#define MAT_FREE_SPACE 0 // Free space
+#define MAT_PEC 1        // Perfect electric conductor
+#define MIN_POOL_ROWS 32 // Fewest rows per thread of the default pool
+
 /* Structs */
+struct ThreadPool; // Persistent worker threads; defined in fdtd_updates.c
+
+struct Material
+{
+    // Update coefficients of Hx, Hy and Ez in cells of a material
+    double Chxh, Chxe;
+    double Chyh, Chye;
+    double Ceze, Cezh;
+};
+
 struct Grid
 {
     // Hack to allow a pointer to a VLA as a member of struct
     double (*Hx)[];
-    double (*Chxh)[];
-    double (*Chxe)[];
-
     double (*Hy)[];
-    double (*Chyh)[];
-    double (*Chye)[];
+    double *Ez; // Ring buffer of EZ_LEVELS time levels; use macro EzG to index
 
-    double *Ez; // 3D array; use macro EzG to index
-    double (*Ceze)[];
-    double (*Cezh)[];
+    uint8_t *material;          // Material ID of each cell; use macro MatG
+    struct Material *materials; // Coefficients of each ID; use macro CoefG
 
     uint sizeX;
     uint sizeY;
     uint time;
     uint max_time;
     double Cdtds;
+
+    double *snapshots; // Recorded frames of Ez, NULL to record none
+    uint *snap_steps;  // Increasing time steps to record, NULL for snap_every
+    uint snap_every;   // Record every snap_every time steps
+    uint num_snaps;    // Number of frames the snapshots array can hold
+    uint snap_count;   // Number of frames recorded so far
+
+    uint num_threads;        // Threads updating fields, 0 for every processor
+    struct ThreadPool *pool; // Started by initThreadPool, NULL if serial
+
+    uint tile_steps; // Time steps per wavefront sweep, 0 or 1 to not tile;
+                     // only scenarioRicker tiles, others reset it to 0
 };
 
 struct Grid1D
@@ -90,4 +116,16 @@ void updateE2d(struct Grid *g);
 void *updateHx(struct Grid *g);
 void *updateHy(struct Grid *g);
 void *updateEz(struct Grid *g);
+void updateHxRows(struct Grid *g, uint first, uint last);
+void updateHyRows(struct Grid *g, uint first, uint last);
+void updateEzRows(struct Grid *g, uint first, uint last);
+#ifdef FDTD_OPENMP
+void updateH2dOmp(struct Grid *g);
+void updateE2dOmp(struct Grid *g);
+#endif
+void updateTiled(struct Grid *g, uint steps, void (*rowHook)(struct Grid *g, uint mm));
+uint tiledSteps(struct Grid *g);
+void initThreadPool(struct Grid *g);
+void freeThreadPool(struct Grid *g);
+void recordSnapshot(struct Grid *g, uint step);
 #endif
\ No newline at end of file
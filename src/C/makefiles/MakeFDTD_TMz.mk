@@ -7,9 +7,12 @@
 ###############################################################################
 
 ## Library and executable filename
-LIBFILE = libFDTD_TMz.so
+LIBFILE ?= libFDTD_TMz.so
 BINFILE = FDTD_TMz
 
+## Field update kernels: pthread (default) or openmp
+KERNELS ?= pthread
+
 ## Compiler
 CC=gcc					# GNU C Compiler
 
@@ -30,19 +33,28 @@ CFLAGS += -Werror		# Make all warnings into errors
 CFLAGS += -g			# GCC compiler core dump: "ulimit -c unlimited" if fail
 CFLAGS += -O3			# Enable many optimizations
 
-CFLAGS_EXEC := $(filter-out -fPIC -O3, $(CFLAGS))
-
 ## Define libraries
 LIBS = -lpthread		# Necessary when including pthread.h
 LIBS += -lm				# Math library, only necessary if including math.h
 
+## OpenMP kernels with restrict-qualified pointers that GCC vectorizes
+ifeq ($(KERNELS), openmp)
+CFLAGS += -fopenmp		# Compile OpenMP pragmas
+CFLAGS += -DFDTD_OPENMP	# Select OpenMP field update kernels
+LIBS += -fopenmp		# Link OpenMP runtime
+else ifneq ($(KERNELS), pthread)
+$(error Unknown KERNELS '$(KERNELS)', use pthread or openmp)
+endif
+
+CFLAGS_EXEC := $(filter-out -fPIC -O3, $(CFLAGS))
+
 ## Define source, dependencies (headers), and object files
 SRC = $(wildcard $(SRCDIR)/*.c)
 
 DEPS = $(INCDIR)/fdtd_tmz.h
 
 OBJ := $(addprefix $(OBJDIR)/, $(notdir $(SRC)))
-OBJ := $(OBJ:.c=.o)
+OBJ := $(OBJ:.c=.$(KERNELS).o)	# Kernels are compiled separately
 
 OBJ_EXEC = $(OBJ:.o=.x.o)
 
@@ -51,16 +63,16 @@ all: $(LIBDIR)/$(LIBFILE)
 
 ## Create objects for library
 .SECONDEXPANSION:
-$(OBJ): $$(addprefix $(SRCDIR)/, $$(patsubst %.o,%.c,$$(@F))) $(DEPS)
+$(OBJ): $$(addprefix $(SRCDIR)/, $$(patsubst %.$(KERNELS).o,%.c,$$(@F))) $(DEPS)
 	$(CC) -c $< $(CFLAGS) -o $@ $(LIBS)
 
-## Create shared library
-$(LIBDIR)/$(LIBFILE): $(OBJ)
-	$(CC) -shared -o $@ $(OBJ)
+## Create shared library, relinked in case objects of other KERNELS were used
+$(LIBDIR)/$(LIBFILE): $(OBJ) FORCE
+	$(CC) -shared -o $@ $(OBJ) $(LIBS)
 
 ## Create objects for executable
 .SECONDEXPANSION:
-$(OBJ_EXEC): $$(addprefix $(SRCDIR)/, $$(patsubst %.x.o,%.c,$$(@F))) $(DEPS)
+$(OBJ_EXEC): $$(addprefix $(SRCDIR)/, $$(patsubst %.$(KERNELS).x.o,%.c,$$(@F))) $(DEPS)
 	$(CC) -c $< $(CFLAGS_EXEC) -o $@ $(LIBS)
 
 ## Create executable file (for debugging)
@@ -68,7 +80,7 @@ $(BINDIR)/$(BINFILE): $(OBJ_EXEC)
 	$(CC) -o $@ $(OBJ_EXEC) $(LIBS)
 
 ## Indicate phony targets
-.PHONY: clean all 		# Runs rules even if files named "clean" or "all" exist
+.PHONY: clean all FORCE	# Runs rules even if files named "clean" or "all" exist
 
 ## Clean up
 clean:
@@ -16,9 +16,6 @@ void initABC(struct Grid *g)
 {
     double temp1, temp2;
 
-    double(*Chye)[g->sizeY] = g->Chye;
-    double(*Cezh)[g->sizeY] = g->Cezh;
-
     initDone = 1;
 
     // allocate memory for ABC arrays //
@@ -28,7 +25,7 @@ void initABC(struct Grid *g)
     ALLOC_1D(ezBottom, g->sizeX * 6, double);
 
     // calculate ABC coefficients //
-    temp1 = sqrt(Cezh[0][0] * Chye[0][0]);
+    temp1 = sqrt(CoefG(0, 0).Cezh * CoefG(0, 0).Chye);
     temp2 = 1.0 / temp1 + 2.0 + temp1;
     coef0 = -(1.0 / temp1 - 2.0 + temp1) / temp2;
     coef1 = -2.0 * (temp1 - 1.0 / temp1) / temp2;
@@ -22,49 +22,33 @@ struct Grid *manual_tmzdemo(uint sizeX, uint sizeY, uint max_time)
     g->Cdtds = 1.0 / sqrt(2.0);
 
     double(*Hx)[sizeY - 1] = calloc((size_t)(sizeX * (sizeY - 1)), sizeof(double));
-    double(*Chxh)[sizeY - 1] = malloc(sizeof(double[sizeX][sizeY - 1]));
-    double(*Chxe)[sizeY - 1] = malloc(sizeof(double[sizeX][sizeY - 1]));
-
     double(*Hy)[sizeY] = calloc(1, sizeof(double[sizeX - 1][sizeY]));
-    double(*Chyh)[sizeY] = malloc(sizeof(double[sizeX - 1][sizeY]));
-    double(*Chye)[sizeY] = malloc(sizeof(double[sizeX - 1][sizeY]));
-
-    double *Ez = (double *)calloc((size_t)(max_time * sizeX * sizeY), sizeof(double));
-    double(*Ceze)[sizeY] = malloc(sizeof(double[sizeX][sizeY]));
-    double(*Cezh)[sizeY] = malloc(sizeof(double[sizeX][sizeY]));
-
-    for (uint mm = 0; mm < g->sizeX; mm++)
-        for (uint nn = 0; nn < g->sizeY - 1; nn++)
-        {
-            Chxh[mm][nn] = 1;
-            Chxe[mm][nn] = g->Cdtds / imp0;
-        }
+    double *Ez = (double *)calloc((size_t)(EZ_LEVELS * sizeX * sizeY), sizeof(double));
 
-    for (uint mm = 0; mm < g->sizeX - 1; mm++)
-        for (uint nn = 0; nn < g->sizeY; nn++)
-        {
-            Chyh[mm][nn] = 1;
-            Chye[mm][nn] = g->Cdtds / imp0;
-        }
-
-    for (uint mm = 0; mm < g->sizeX; mm++)
-        for (uint nn = 0; nn < g->sizeY; nn++)
-        {
-            Ceze[mm][nn] = 1;
-            Cezh[mm][nn] = g->Cdtds * imp0;
-        }
+    // Every cell starts as free space
+    uint8_t *material = calloc((size_t)(sizeX * sizeY), sizeof(uint8_t));
+    struct Material *materials = malloc(2 * sizeof(struct Material));
+    materials[MAT_FREE_SPACE] = (struct Material){
+        1, g->Cdtds / imp0, 1, g->Cdtds / imp0, 1, g->Cdtds * imp0};
+    materials[MAT_PEC] = (struct Material){
+        1, g->Cdtds / imp0, 1, g->Cdtds / imp0, 0, 0};
 
     g->Hx = Hx;
-    g->Chxh = Chxh;
-    g->Chxe = Chxe;
-
     g->Hy = Hy;
-    g->Chyh = Chyh;
-    g->Chye = Chye;
-
     g->Ez = Ez;
-    g->Ceze = Ceze;
-    g->Cezh = Cezh;
+
+    g->material = material;
+    g->materials = materials;
+
+    g->snapshots = NULL; // Only the final time levels of Ez are kept
+    g->snap_steps = NULL;
+    g->snap_every = 1;
+    g->num_snaps = 0;
+    g->snap_count = 0;
+
+    g->num_threads = 0; // Update fields with every processor
+    g->pool = NULL;
+    g->tile_steps = 0; // Advance fields one time step at a time
 
     // scenarioRicker(g);
     scenarioTFSF(g);
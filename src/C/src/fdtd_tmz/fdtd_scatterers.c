@@ -12,17 +12,13 @@ void add_PEC_plate(struct Grid *g)
 {
     /* Create vertical PEC plate scatterer. */
 
-    double(*Cezh)[g->sizeY] = g->Cezh;
-    double(*Ceze)[g->sizeY] = g->Ceze;
-
     uint pec_left_offset = 20;
     uint pec_bottom_offset = 20;
     uint pec_top_offset = 20;
 
     for (uint nn = pec_bottom_offset; nn < g->sizeY - pec_top_offset; nn++)
     {
-        Ceze[pec_left_offset][nn] = 0;
-        Cezh[pec_left_offset][nn] = 0;
+        MatG(pec_left_offset, nn) = MAT_PEC;
     }
 
     return;
@@ -32,9 +28,6 @@ void add_PEC_disk(struct Grid *g)
 {
     /* Create circular PEC disk scatterer. */
 
-    double(*Cezh)[g->sizeY] = g->Cezh;
-    double(*Ceze)[g->sizeY] = g->Ceze;
-
     uint rad = 12;
     uint xCenter = g->sizeX / 2;
     uint yCenter = g->sizeY / 2;
@@ -48,8 +41,7 @@ void add_PEC_disk(struct Grid *g)
             yLocation = (int)nn - (int)yCenter;
             if ((pow(xLocation, 2) + pow(yLocation, 2)) < pow(rad, 2))
             {
-                Ceze[mm][nn] = 0;
-                Cezh[mm][nn] = 0;
+                MatG(mm, nn) = MAT_PEC;
             }
         }
     }
@@ -61,9 +53,6 @@ void add_corner_reflector(struct Grid *g)
 {
     /* Create corner reflector scatterer. */
 
-    double(*Cezh)[g->sizeY] = g->Cezh;
-    double(*Ceze)[g->sizeY] = g->Ceze;
-
     uint xCenter = g->sizeX / 2;
     uint yCenter = g->sizeY / 2;
 
@@ -73,10 +62,8 @@ void add_corner_reflector(struct Grid *g)
     {
         if (nnlow <= yCenter)
         {
-            Ceze[mm][nnlow] = 0;
-            Cezh[mm][nnlow] = 0;
-            Ceze[mm][nnhigh] = 0;
-            Cezh[mm][nnhigh] = 0;
+            MatG(mm, nnlow) = MAT_PEC;
+            MatG(mm, nnhigh) = MAT_PEC;
             nnlow++;
             nnhigh--;
         }
@@ -93,9 +80,6 @@ void add_minefield_scatterers(struct Grid *g)
 {
     /* Create multiple circular scatterers. */
 
-    double(*Cezh)[g->sizeY] = g->Cezh;
-    double(*Ceze)[g->sizeY] = g->Ceze;
-
     const uint NUM_SCATTERERS = 5;
     uint rads[5] = {5, 12, 10, 8, 6};
     uint xCenters[5] = {g->sizeX / 8, g->sizeX / 3, g->sizeX / 2, 3 * g->sizeX / 4, 4 * g->sizeX / 5};
@@ -112,8 +96,7 @@ void add_minefield_scatterers(struct Grid *g)
                 yLocation = (int)nn - (int)yCenters[i];
                 if ((pow(xLocation, 2) + pow(yLocation, 2)) < pow(rads[i], 2))
                 {
-                    Ceze[mm][nn] = 0;
-                    Cezh[mm][nn] = 0;
+                    MatG(mm, nn) = MAT_PEC;
                 }
             }
         }
@@ -6,18 +6,42 @@
 /******************************************************************************
  *  Scenarios
  ******************************************************************************/
+static void rickerSource(struct Grid *g, uint mm)
+{
+    /* Update Ricker Wavelet source at center of grid once its row is updated. */
+    if (mm == g->sizeX / 2)
+        EzG(g->time, g->sizeX / 2, g->sizeY / 2) = updateRickerWavelet(g, 0.0);
+}
+
 void scenarioRicker(struct Grid *g)
 {
     /* Reproduce John B. Schneider's C program from section 8.4 of his textbook
        Understanding the Finite-Difference Time-Domain Method.
+
+       With tile_steps above one, fields are advanced serially by wavefront
+       sweeps over several time steps that keep the rows in flight in cache.
     */
+    if (g->tile_steps > 1)
+    {
+        recordSnapshot(g, 0); // Record initial fields
+        for (g->time = 1; g->time < g->max_time;)
+        {
+            updateTiled(g, tiledSteps(g), rickerSource);
+            recordSnapshot(g, g->time - 1); // Record Ez if time step is recorded
+        }
+        return;
+    }
+    initThreadPool(g);    // Start threads that update fields
+    recordSnapshot(g, 0); // Record initial fields
     for (g->time = 1; g->time < g->max_time; g->time++)
     {
         updateH2d(g); // Update magnetic field
         updateE2d(g); // Update electric field
         // Update Ricker Wavelet source at center of grid
         EzG(g->time, g->sizeX / 2, g->sizeY / 2) = updateRickerWavelet(g, 0.0);
+        recordSnapshot(g, g->time); // Record Ez if time step is recorded
     }
+    freeThreadPool(g); // Stop threads that update fields
 }
 
 void scenarioTFSF(struct Grid *g)
@@ -32,14 +56,20 @@ void scenarioTFSF(struct Grid *g)
     ALLOC_1D(g1, 1, struct Grid1D); // allocate memory for 1D Grid
     initABC(g);                     // Initialize absorbing boundary condition
     initTFSF(g, g1, 5, 95, 5, 75);  // Initialize total field/scattered field source
+    g->tile_steps = 0;              // TFSF source and ABC need whole time steps
+    initThreadPool(g);              // Start threads that update fields
 
     for (g->time = 1; g->time < g->max_time; g->time++)
     {
         updateH2d(g);      // Update magnetic field
         updateTFSF(g, g1); // Update total field/scattered field
+        // Record Ez of previous time step once corrected by TFSF source
+        recordSnapshot(g, g->time - 1);
         updateE2d(g);      // Update electric field
         updateABC(g);      // Update absorbing boundary condition
     }
+    recordSnapshot(g, g->time - 1); // Record Ez of final time step
+    freeThreadPool(g);              // Stop threads that update fields
 }
 
 void scenarioPlate(struct Grid *g)
@@ -55,14 +85,20 @@ void scenarioPlate(struct Grid *g)
     add_PEC_plate(g);               // add vertical PEC plate to grid
     initABC(g);                     // Initialize absorbing boundary condition
     initTFSF(g, g1, 5, 95, 5, 75);  // Initialize total field/scattered field source
+    g->tile_steps = 0;              // TFSF source and ABC need whole time steps
+    initThreadPool(g);              // Start threads that update fields
 
     for (g->time = 1; g->time < g->max_time; g->time++)
     {
         updateH2d(g);      // Update magnetic field
         updateTFSF(g, g1); // Update total field/scattered field
+        // Record Ez of previous time step once corrected by TFSF source
+        recordSnapshot(g, g->time - 1);
         updateE2d(g);      // Update electric field
         updateABC(g);      // Update absorbing boundary condition
     }
+    recordSnapshot(g, g->time - 1); // Record Ez of final time step
+    freeThreadPool(g);              // Stop threads that update fields
 }
 
 void scenarioCircle(struct Grid *g)
@@ -78,14 +114,20 @@ void scenarioCircle(struct Grid *g)
     add_PEC_disk(g);                // add circular PEC disk to grid
     initABC(g);                     // Initialize absorbing boundary condition
     initTFSF(g, g1, 5, 95, 5, 75);  // Initialize total field/scattered field source
+    g->tile_steps = 0;              // TFSF source and ABC need whole time steps
+    initThreadPool(g);              // Start threads that update fields
 
     for (g->time = 1; g->time < g->max_time; g->time++)
     {
         updateH2d(g);      // Update magnetic field
         updateTFSF(g, g1); // Update total field/scattered field
+        // Record Ez of previous time step once corrected by TFSF source
+        recordSnapshot(g, g->time - 1);
         updateE2d(g);      // Update electric field
         updateABC(g);      // Update absorbing boundary condition
     }
+    recordSnapshot(g, g->time - 1); // Record Ez of final time step
+    freeThreadPool(g);              // Stop threads that update fields
 }
 
 void scenarioCornerReflector(struct Grid *g)
@@ -97,14 +139,20 @@ void scenarioCornerReflector(struct Grid *g)
     add_corner_reflector(g);        // add corner reflector to grid
     initABC(g);                     // Initialize absorbing boundary condition
     initTFSF(g, g1, 5, 95, 5, 75);  // Initialize total field/scattered field source
+    g->tile_steps = 0;              // TFSF source and ABC need whole time steps
+    initThreadPool(g);              // Start threads that update fields
 
     for (g->time = 1; g->time < g->max_time; g->time++)
     {
         updateH2d(g);      // Update magnetic field
         updateTFSF(g, g1); // Update total field/scattered field
+        // Record Ez of previous time step once corrected by TFSF source
+        recordSnapshot(g, g->time - 1);
         updateE2d(g);      // Update electric field
         updateABC(g);      // Update absorbing boundary condition
     }
+    recordSnapshot(g, g->time - 1); // Record Ez of final time step
+    freeThreadPool(g);              // Stop threads that update fields
 }
 
 void scenarioMinefield(struct Grid *g)
@@ -116,12 +164,18 @@ void scenarioMinefield(struct Grid *g)
     add_minefield_scatterers(g);    // add multiple circular scatterers
     initABC(g);                     // Initialize absorbing boundary condition
     initTFSF(g, g1, 5, 95, 5, 75);  // Initialize total field/scattered field source
+    g->tile_steps = 0;              // TFSF source and ABC need whole time steps
+    initThreadPool(g);              // Start threads that update fields
 
     for (g->time = 1; g->time < g->max_time; g->time++)
     {
         updateH2d(g);      // Update magnetic field
         updateTFSF(g, g1); // Update total field/scattered field
+        // Record Ez of previous time step once corrected by TFSF source
+        recordSnapshot(g, g->time - 1);
         updateE2d(g);      // Update electric field
         updateABC(g);      // Update absorbing boundary condition
     }
+    recordSnapshot(g, g->time - 1); // Record Ez of final time step
+    freeThreadPool(g);              // Stop threads that update fields
 }
\ No newline at end of file
@@ -56,10 +56,7 @@ void updateTFSF(struct Grid *g, struct Grid1D *g1)
 {
     uint mm, nn;
     double(*Hy)[g->sizeY] = g->Hy;
-    double(*Chye)[g->sizeY] = g->Chye;
     double(*Hx)[g->sizeY - 1] = g->Hx;
-    double(*Chxe)[g->sizeY - 1] = g->Chxe;
-    double(*Cezh)[g->sizeY] = g->Cezh;
 
     // check if tfsfInit() has been called
     if (firstX <= 0)
@@ -73,22 +70,22 @@ void updateTFSF(struct Grid *g, struct Grid1D *g1)
     // correct Hy along left edge
     mm = firstX - 1;
     for (nn = firstY; nn <= lastY; nn++)
-        Hy[mm][nn] -= Chye[mm][nn] * g1->Ez[mm + 1];
+        Hy[mm][nn] -= CoefG(mm, nn).Chye * g1->Ez[mm + 1];
 
     // correct Hy along right edge
     mm = lastX;
     for (nn = firstY; nn <= lastY; nn++)
-        Hy[mm][nn] += Chye[mm][nn] * g1->Ez[mm];
+        Hy[mm][nn] += CoefG(mm, nn).Chye * g1->Ez[mm];
 
     // correct Hx along the bottom
     nn = firstY - 1;
     for (mm = firstX; mm <= lastX; mm++)
-        Hx[mm][nn] += Chxe[mm][nn] * g1->Ez[mm];
+        Hx[mm][nn] += CoefG(mm, nn).Chxe * g1->Ez[mm];
 
     // correct Hx along the top
     nn = lastY;
     for (mm = firstX; mm <= lastX; mm++)
-        Hx[mm][nn] -= Chxe[mm][nn] * g1->Ez[mm];
+        Hx[mm][nn] -= CoefG(mm, nn).Chxe * g1->Ez[mm];
 
     updateH1d(g1);                          // update 1D magnetic field
     updateE1d(g1);                          // update 1D electric field
@@ -99,12 +96,12 @@ void updateTFSF(struct Grid *g, struct Grid1D *g1)
     // correct Ez field along left edge
     mm = firstX;
     for (nn = firstY; nn <= lastY; nn++)
-        EzG(g->time - 1, mm, nn) -= Cezh[mm][nn] * g1->Hy[mm - 1];
+        EzG(g->time - 1, mm, nn) -= CoefG(mm, nn).Cezh * g1->Hy[mm - 1];
 
     // correct Ez field along right edge
     mm = lastX;
     for (nn = firstY; nn <= lastY; nn++)
-        EzG(g->time - 1, mm, nn) += Cezh[mm][nn] * g1->Hy[mm];
+        EzG(g->time - 1, mm, nn) += CoefG(mm, nn).Cezh * g1->Hy[mm];
 
     // no need to correct Ez along top and bottom since
     // incident Hx is zero
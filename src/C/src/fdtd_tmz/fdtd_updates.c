@@ -6,74 +6,418 @@
 #include <pthread.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#ifdef FDTD_OPENMP
+#include <omp.h>
+#endif
 
 /******************************************************************************
- *  Field Updates
+ *  Thread Pool
  ******************************************************************************/
-void updateH2d(struct Grid *g)
+enum PoolPhase
 {
-    /* The X and Y components of the H-field updates are independent can be
-       performed in parallel using separate threads.
+    PHASE_H,   // Update Hx and Hy
+    PHASE_E,   // Update Ez
+    PHASE_STOP // Exit worker threads
+};
+
+struct PoolWorker
+{
+    struct ThreadPool *pool;
+    uint id;
+};
+
+struct ThreadPool
+{
+    struct Grid *g;
+    uint num_threads;           // Worker threads including the calling thread
+    pthread_t *threads;         // Threads of workers 1 to num_threads - 1
+    struct PoolWorker *workers; // Arguments of every worker
+    pthread_barrier_t start;    // Releases workers into a phase
+    pthread_barrier_t done;     // Waits for every worker to finish a phase
+    enum PoolPhase phase;
+};
+
+static void tileRows(uint first, uint last, uint id, uint num_threads, uint *tileFirst, uint *tileLast)
+{
+    /* Split rows first to last - 1 into num_threads contiguous tiles. */
+    size_t rows = last - first;
+    *tileFirst = first + (uint)(rows * id / num_threads);
+    *tileLast = first + (uint)(rows * (id + 1) / num_threads);
+}
+
+static void runPhase(struct PoolWorker *worker, enum PoolPhase phase)
+{
+    /* Update the row tile of a worker during a phase. */
+    struct Grid *g = worker->pool->g;
+    uint id = worker->id, num_threads = worker->pool->num_threads;
+    uint first, last;
+    if (phase == PHASE_H)
+    {
+        tileRows(0, g->sizeX, id, num_threads, &first, &last);
+        updateHxRows(g, first, last);
+        tileRows(0, g->sizeX - 1, id, num_threads, &first, &last);
+        updateHyRows(g, first, last);
+    }
+    else if (phase == PHASE_E)
+    {
+        tileRows(1, g->sizeX - 1, id, num_threads, &first, &last);
+        updateEzRows(g, first, last);
+    }
+}
+
+static void *poolWorker(void *arg)
+{
+    /* Wait for phases and update the tile of a worker until stopped. */
+    struct PoolWorker *worker = arg;
+    struct ThreadPool *pool = worker->pool;
+    for (;;)
+    {
+        pthread_barrier_wait(&pool->start);
+        if (pool->phase == PHASE_STOP)
+            break;
+        runPhase(worker, pool->phase);
+        pthread_barrier_wait(&pool->done);
+    }
+    return NULL;
+}
+
+static void dispatchPhase(struct ThreadPool *pool, enum PoolPhase phase)
+{
+    /* Run a phase on every worker, with the calling thread as worker 0. */
+    pool->phase = phase;
+    pthread_barrier_wait(&pool->start);
+    if (phase == PHASE_STOP)
+        return;
+    runPhase(&pool->workers[0], phase);
+    pthread_barrier_wait(&pool->done);
+}
+
+void initThreadPool(struct Grid *g)
+{
+    /* Start the worker threads used by every time step of a simulation.
+
+       num_threads of zero uses every online processor, but leaves each
+       thread at least MIN_POOL_ROWS rows, since the barriers of every phase
+       cost more than updating fewer rows saves.  A single thread updates the
+       fields without a pool, as do OpenMP kernels, whose threads persist
+       between parallel regions.
     */
-    pthread_t threadX;
-    pthread_t threadY;
+    uint num_threads = g->num_threads;
+#ifdef FDTD_OPENMP
+    num_threads = 1;
+#endif
+    if (num_threads == 0)
+    {
+        long num_procs = sysconf(_SC_NPROCESSORS_ONLN);
+        uint max_threads = (g->sizeX - 2) / MIN_POOL_ROWS;
+        num_threads = num_procs > 0 ? (uint)num_procs : 1;
+        if (num_threads > max_threads)
+            num_threads = max_threads > 1 ? max_threads : 1;
+    }
+    if (num_threads > g->sizeX - 2)
+        num_threads = g->sizeX - 2; // Leave every worker at least one row
+    g->pool = NULL;
+    if (num_threads <= 1)
+        return;
 
-    pthread_create(&threadX, NULL, (void *)updateHx, (void *)g);
-    pthread_create(&threadY, NULL, (void *)updateHy, (void *)g);
+    struct ThreadPool *pool;
+    ALLOC_1D(pool, 1, struct ThreadPool);
+    ALLOC_1D(pool->threads, num_threads - 1, pthread_t);
+    ALLOC_1D(pool->workers, num_threads, struct PoolWorker);
+    pool->g = g;
+    pool->num_threads = num_threads;
+    pthread_barrier_init(&pool->start, NULL, num_threads);
+    pthread_barrier_init(&pool->done, NULL, num_threads);
+    for (uint id = 0; id < num_threads; id++)
+    {
+        pool->workers[id].pool = pool;
+        pool->workers[id].id = id;
+        if (id > 0)
+            pthread_create(&pool->threads[id - 1], NULL, poolWorker, &pool->workers[id]);
+    }
+    g->pool = pool;
+}
 
-    pthread_join(threadX, NULL);
-    pthread_join(threadY, NULL);
+void freeThreadPool(struct Grid *g)
+{
+    /* Stop and join the worker threads of a simulation. */
+    struct ThreadPool *pool = g->pool;
+    if (!pool)
+        return;
+    dispatchPhase(pool, PHASE_STOP);
+    for (uint id = 1; id < pool->num_threads; id++)
+        pthread_join(pool->threads[id - 1], NULL);
+    pthread_barrier_destroy(&pool->start);
+    pthread_barrier_destroy(&pool->done);
+    free(pool->threads);
+    free(pool->workers);
+    free(pool);
+    g->pool = NULL;
+}
+
+/******************************************************************************
+ *  Field Updates
+ ******************************************************************************/
+void updateH2d(struct Grid *g)
+{
+    /* The X and Y components of the H-field updates are independent and are
+       split into row tiles across the thread pool, if one was started.
+    */
+#ifdef FDTD_OPENMP
+    updateH2dOmp(g);
+#else
+    if (g->pool)
+    {
+        dispatchPhase(g->pool, PHASE_H);
+        return;
+    }
+    updateHx(g);
+    updateHy(g);
+#endif
 }
 
 void updateE2d(struct Grid *g)
 {
-    /* Wrapper for electric field update.  Could be modified for parallel
-       execution of multiple electric field components when relevant.
+    /* Wrapper for electric field update, split into row tiles across the
+       thread pool if one was started.
     */
+#ifdef FDTD_OPENMP
+    updateE2dOmp(g);
+#else
+    if (g->pool)
+    {
+        dispatchPhase(g->pool, PHASE_E);
+        return;
+    }
     updateEz(g);
+#endif
 }
 
 void *updateHx(struct Grid *g)
 {
     /* Update X component of magnetic field. */
-    double(*Hx)[g->sizeY - 1] = g->Hx;
-    double(*Chxh)[g->sizeY - 1] = g->Chxh;
-    double(*Chxe)[g->sizeY - 1] = g->Chxe;
-    for (uint mm = 0; mm < g->sizeX; mm++)
-        for (uint nn = 0; nn < g->sizeY - 1; nn++)
-            Hx[mm][nn] = Chxh[mm][nn] * Hx[mm][nn] -
-                         Chxe[mm][nn] * (EzG(g->time - 1, mm, nn + 1) - EzG(g->time - 1, mm, nn));
+    updateHxRows(g, 0, g->sizeX);
     return NULL;
 }
 
 void *updateHy(struct Grid *g)
 {
     /* Update Y component of magnetic field. */
-    double(*Hy)[g->sizeY] = g->Hy;
-    double(*Chyh)[g->sizeY] = g->Chyh;
-    double(*Chye)[g->sizeY] = g->Chye;
-    for (uint mm = 0; mm < g->sizeX - 1; mm++)
-        for (uint nn = 0; nn < g->sizeY; nn++)
-            Hy[mm][nn] = Chyh[mm][nn] * Hy[mm][nn] +
-                         Chye[mm][nn] * (EzG(g->time - 1, mm + 1, nn) - EzG(g->time - 1, mm, nn));
+    updateHyRows(g, 0, g->sizeX - 1);
     return NULL;
 }
 
 void *updateEz(struct Grid *g)
 {
     /* Update Z component of electric field. */
-    double(*Hx)[g->sizeY - 1] = g->Hx;
-    double(*Hy)[g->sizeY] = g->Hy;
-    double(*Cezh)[g->sizeY] = g->Cezh;
-    double(*Ceze)[g->sizeY] = g->Ceze;
-    for (uint mm = 1; mm < g->sizeX - 1; mm++)
-        for (uint nn = 1; nn < g->sizeY - 1; nn++)
-            EzG(g->time, mm, nn) = Ceze[mm][nn] * EzG(g->time - 1, mm, nn) +
-                                   Cezh[mm][nn] * ((Hy[mm][nn] - Hy[mm - 1][nn]) -
-                                                   (Hx[mm][nn] - Hx[mm][nn - 1]));
+    updateEzRows(g, 1, g->sizeX - 1);
     return NULL;
 }
 
+void updateHxRows(struct Grid *g, uint first, uint last)
+{
+    /* Update X component of magnetic field in rows first to last - 1.
+
+       Every cell is free space or PEC, so coefficients are selected by
+       comparing material IDs rather than looked up, which GCC vectorizes.
+    */
+    const size_t sizeY = g->sizeY;
+    const struct Material fs = g->materials[MAT_FREE_SPACE], pec = g->materials[MAT_PEC];
+    for (size_t mm = first; mm < last; mm++)
+    {
+        const double *restrict ezRow = &EzG(g->time - 1, mm, 0);
+        double *restrict hxRow = (double *)g->Hx + mm * (sizeY - 1);
+        const uint8_t *restrict matRow = &MatG(mm, 0);
+        for (size_t nn = 0; nn < sizeY - 1; nn++)
+        {
+            const double chxh = matRow[nn] == MAT_PEC ? pec.Chxh : fs.Chxh;
+            const double chxe = matRow[nn] == MAT_PEC ? pec.Chxe : fs.Chxe;
+            hxRow[nn] = chxh * hxRow[nn] - chxe * (ezRow[nn + 1] - ezRow[nn]);
+        }
+    }
+}
+
+void updateHyRows(struct Grid *g, uint first, uint last)
+{
+    /* Update Y component of magnetic field in rows first to last - 1. */
+    const size_t sizeY = g->sizeY;
+    const struct Material fs = g->materials[MAT_FREE_SPACE], pec = g->materials[MAT_PEC];
+    for (size_t mm = first; mm < last; mm++)
+    {
+        const double *restrict ezRow = &EzG(g->time - 1, mm, 0);
+        double *restrict hyRow = (double *)g->Hy + mm * sizeY;
+        const uint8_t *restrict matRow = &MatG(mm, 0);
+        for (size_t nn = 0; nn < sizeY; nn++)
+        {
+            const double chyh = matRow[nn] == MAT_PEC ? pec.Chyh : fs.Chyh;
+            const double chye = matRow[nn] == MAT_PEC ? pec.Chye : fs.Chye;
+            hyRow[nn] = chyh * hyRow[nn] + chye * (ezRow[sizeY + nn] - ezRow[nn]);
+        }
+    }
+}
+
+void updateEzRows(struct Grid *g, uint first, uint last)
+{
+    /* Update Z component of electric field in rows first to last - 1. */
+    const size_t sizeY = g->sizeY;
+    const struct Material fs = g->materials[MAT_FREE_SPACE], pec = g->materials[MAT_PEC];
+    for (size_t mm = first; mm < last; mm++)
+    {
+        const double *restrict ezPrev = &EzG(g->time - 1, mm, 0);
+        double *restrict ezRow = &EzG(g->time, mm, 0);
+        const double *restrict hxRow = (const double *)g->Hx + mm * (sizeY - 1);
+        const double *restrict hyRow = (const double *)g->Hy + mm * sizeY;
+        const double *restrict hyPrev = hyRow - sizeY;
+        const uint8_t *restrict matRow = &MatG(mm, 0);
+        for (size_t nn = 1; nn < sizeY - 1; nn++)
+        {
+            const double ceze = matRow[nn] == MAT_PEC ? pec.Ceze : fs.Ceze;
+            const double cezh = matRow[nn] == MAT_PEC ? pec.Cezh : fs.Cezh;
+            ezRow[nn] = ceze * ezPrev[nn] +
+                        cezh * ((hyRow[nn] - hyPrev[nn]) - (hxRow[nn] - hxRow[nn - 1]));
+        }
+    }
+}
+
+/******************************************************************************
+ *  Temporally Tiled Field Updates
+ ******************************************************************************/
+void updateTiled(struct Grid *g, uint steps, void (*rowHook)(struct Grid *g, uint mm))
+{
+    /* Advance the fields by steps time steps in one wavefront sweep over rows.
+
+       Each step lags the step before it by one row, which is all that the
+       updates of a row depend on, so each row of the fields and coefficients
+       is streamed from memory once for every steps time steps while the rows
+       in flight stay in cache.  rowHook, if given, is called after Ez of each
+       row is updated, with g->time set to its time step, to apply sources.
+       Sources and boundaries that need whole time steps cannot be tiled.
+    */
+    uint firstTime = g->time;
+    for (uint row = 0; row < g->sizeX + steps - 1; row++)
+        for (uint step = 0; step < steps && step <= row; step++)
+        {
+            uint mm = row - step;
+            if (mm >= g->sizeX)
+                continue;
+            g->time = firstTime + step;
+            updateHxRows(g, mm, mm + 1);
+            if (mm < g->sizeX - 1)
+                updateHyRows(g, mm, mm + 1);
+            if (mm > 0 && mm < g->sizeX - 1)
+                updateEzRows(g, mm, mm + 1);
+            if (rowHook)
+                rowHook(g, mm);
+        }
+    g->time = firstTime + steps;
+}
+
+uint tiledSteps(struct Grid *g)
+{
+    /* Return time steps of the next wavefront sweep from g->time.
+
+       Sweeps hold at most tile_steps steps and end at the next recorded
+       snapshot, since only the last time levels of Ez are complete.
+    */
+    uint steps = g->max_time - g->time;
+    if (g->tile_steps && g->tile_steps < steps)
+        steps = g->tile_steps;
+    if (g->snapshots && g->snap_count < g->num_snaps)
+    {
+        uint next = g->snap_steps ? g->snap_steps[g->snap_count]
+                                  : (g->time + g->snap_every - 1) / g->snap_every * g->snap_every;
+        if (next >= g->time && next - g->time + 1 < steps)
+            steps = next - g->time + 1;
+    }
+    return steps;
+}
+
+#ifdef FDTD_OPENMP
+/******************************************************************************
+ *  OpenMP Field Updates
+ ******************************************************************************/
+static int ompThreads(struct Grid *g)
+{
+    /* Return threads of parallel regions, every processor if num_threads
+       is zero.
+    */
+    return g->num_threads ? (int)g->num_threads : omp_get_max_threads();
+}
+
+void updateH2dOmp(struct Grid *g)
+{
+    /* Update X and Y components of magnetic field in OpenMP row tiles.
+
+       Fields are indexed through restrict-qualified pointers to contiguous
+       rows of one time level of Ez, and coefficients are selected by the
+       material ID of each cell, so GCC vectorizes the inner loops.
+    */
+    const size_t sizeX = g->sizeX, sizeY = g->sizeY;
+    const double *restrict ez = &EzG(g->time - 1, 0, 0);
+    double *restrict hx = (double *)g->Hx;
+    double *restrict hy = (double *)g->Hy;
+    const uint8_t *restrict material = g->material;
+    const struct Material fs = g->materials[MAT_FREE_SPACE], pec = g->materials[MAT_PEC];
+
+#pragma omp parallel num_threads(ompThreads(g))
+    {
+#pragma omp for schedule(static) nowait
+        for (size_t mm = 0; mm < sizeX; mm++)
+        {
+            const size_t row = mm * (sizeY - 1);
+            const double *restrict ezRow = ez + mm * sizeY;
+            const uint8_t *restrict matRow = material + mm * sizeY;
+            for (size_t nn = 0; nn < sizeY - 1; nn++)
+            {
+                const double chxh = matRow[nn] == MAT_PEC ? pec.Chxh : fs.Chxh;
+                const double chxe = matRow[nn] == MAT_PEC ? pec.Chxe : fs.Chxe;
+                hx[row + nn] = chxh * hx[row + nn] - chxe * (ezRow[nn + 1] - ezRow[nn]);
+            }
+        }
+#pragma omp for schedule(static)
+        for (size_t mm = 0; mm < sizeX - 1; mm++)
+        {
+            const size_t row = mm * sizeY;
+            for (size_t nn = 0; nn < sizeY; nn++)
+            {
+                const double chyh = material[row + nn] == MAT_PEC ? pec.Chyh : fs.Chyh;
+                const double chye = material[row + nn] == MAT_PEC ? pec.Chye : fs.Chye;
+                hy[row + nn] = chyh * hy[row + nn] + chye * (ez[row + sizeY + nn] - ez[row + nn]);
+            }
+        }
+    }
+}
+
+void updateE2dOmp(struct Grid *g)
+{
+    /* Update Z component of electric field in OpenMP row tiles. */
+    const size_t sizeX = g->sizeX, sizeY = g->sizeY;
+    const double *restrict ezPrev = &EzG(g->time - 1, 0, 0);
+    double *restrict ez = &EzG(g->time, 0, 0);
+    const double *restrict hx = (const double *)g->Hx;
+    const double *restrict hy = (const double *)g->Hy;
+    const uint8_t *restrict material = g->material;
+    const struct Material fs = g->materials[MAT_FREE_SPACE], pec = g->materials[MAT_PEC];
+
+#pragma omp parallel for schedule(static) num_threads(ompThreads(g))
+    for (size_t mm = 1; mm < sizeX - 1; mm++)
+    {
+        const size_t row = mm * sizeY;
+        const double *restrict hxRow = hx + mm * (sizeY - 1);
+        for (size_t nn = 1; nn < sizeY - 1; nn++)
+        {
+            const double ceze = material[row + nn] == MAT_PEC ? pec.Ceze : fs.Ceze;
+            const double cezh = material[row + nn] == MAT_PEC ? pec.Cezh : fs.Cezh;
+            ez[row + nn] = ceze * ezPrev[row + nn] +
+                           cezh * ((hy[row + nn] - hy[row - sizeY + nn]) -
+                                   (hxRow[nn] - hxRow[nn - 1]));
+        }
+    }
+}
+#endif
+
 void updateH1d(struct Grid1D *g)
 {
     /* The X and Y components of the H-field updates are independent can be
@@ -91,4 +435,23 @@ void updateE1d(struct Grid1D *g)
     /* Update Z component of electric field. */
     for (uint mm = 1; mm < g->sizeX - 1; mm++)
         g->Ez[mm] = g->Ceze[mm] * g->Ez[mm] + g->Cezh[mm] * (g->Hy[mm] - g->Hy[mm - 1]);
+}
+
+/******************************************************************************
+ *  Snapshots
+ ******************************************************************************/
+void recordSnapshot(struct Grid *g, uint step)
+{
+    /* Copy Ez of a time step into the next frame of the snapshots array if
+       the step is recorded.  Only EZ_LEVELS time levels of Ez are kept, so
+       this must be called for every time step that could be recorded.
+    */
+    if (!g->snapshots || g->snap_count >= g->num_snaps)
+        return;
+    if (g->snap_steps ? g->snap_steps[g->snap_count] != step
+                      : step % g->snap_every != 0)
+        return;
+    memcpy(g->snapshots + (size_t)g->snap_count * ARR_SIZE, &EzG(step, 0, 0),
+           ARR_SIZE * sizeof(double));
+    g->snap_count++;
 }
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Persistent cache of FDA simulation results keyed by scenario content."""
+# %% Imports
+# Standard system imports
+import contextlib
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+
+# Related third party imports
+import numpy as np
+
+# Local application/library specific imports
+
+
+# %% Globals
+cache_version = 2       # Increment when cached results become incompatible
+
+
+# %% Classes
+class ResultCache:
+    """Cache of run_sim results stored as compressed NumPy archives.
+
+    Entries are keyed by a hash of the scenario class, the values of its
+    __init__ arguments, its mesh and its solver settings.  The voltages of
+    every mode are optionally stored so images can be plotted without
+    solving again.  Least recently used entries are evicted once the cache
+    directory exceeds max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=256*2**20):
+        """Create cache directory if it does not already exist."""
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(scenario):
+        """Return hash identifying the simulation of a scenario."""
+        content = {
+            'version': cache_version,
+            'class': type(scenario).__name__,
+            'params': scenario.get_params(),
+            'mesh': (scenario.Nx, scenario.Ny, scenario.dx, scenario.dy),
+            'settings': [getattr(scenario, setting)
+                         for setting in scenario.settings],
+        }
+        text = json.dumps(content, sort_keys=True, default=repr)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, scenario):
+        """Return (results, mode_voltages) of a cached simulation or None."""
+        file = self._file(self.key(scenario))
+        try:
+            with np.load(file) as data:
+                results = tuple(data['results'])
+                mode_voltages = {name[len('voltages_'):]: data[name]
+                                 for name in data.files
+                                 if name.startswith('voltages_')}
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        self._touch(file)               # Mark entry as recently used
+        self.hits += 1
+        return results, mode_voltages or None
+
+    def put(self, scenario, results, mode_voltages=None):
+        """Store results and optionally the voltages of each mode."""
+        arrays = {f'voltages_{mode}': voltages for mode, voltages in
+                  (mode_voltages or {}).items()}
+        file = self._file(self.key(scenario))
+        # Unique temporary name so concurrent writers never share a file
+        fh = tempfile.NamedTemporaryFile(dir=self.path, suffix='.tmp',
+                                         delete=False)
+        try:
+            with fh:
+                np.savez_compressed(fh, results=np.asarray(results), **arrays)
+            os.replace(fh.name, file)   # Readers never see a partial entry
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(fh.name)
+            raise
+        self._touch(file)
+        self._evict()
+
+    def run_sim(self, scenario, filepath=None, set_progress=None,
+                store_voltages=True):
+        """Return cached results of a scenario or run and cache them.
+
+        Images are plotted from cached voltages if filepath is given, so only
+        the solve is skipped when images are requested.
+        """
+        entry = self.get(scenario)
+        if entry is not None:
+            results, mode_voltages = entry
+            if not filepath:
+                return results
+            if mode_voltages:
+                if set_progress:
+                    scenario.set_progress = set_progress
+                scenario.counter = 0
+                scenario.plot_voltages(mode_voltages, filepath)
+                return results
+        results = scenario.run_sim(filepath=filepath,
+                                   set_progress=set_progress)
+        self.put(scenario, results,
+                 scenario.mode_voltages if store_voltages else None)
+        return results
+
+    def size(self):
+        """Return total size of cached entries in bytes."""
+        return sum(file.stat().st_size for file in self.path.glob('*.npz'))
+
+    def clear(self):
+        """Delete all cached entries."""
+        for file in self.path.glob('*.npz'):
+            file.unlink()
+
+    def _file(self, key):
+        """Return path of the archive of a cache key."""
+        return self.path / f'{key}.npz'
+
+    @staticmethod
+    def _touch(file):
+        """Set modification time of an entry to the current time.
+
+        Coarse filesystem timestamps could otherwise tie entries that were
+        used in quick succession.
+        """
+        now = time.time_ns()
+        os.utime(file, ns=(now, now))
+
+    def _evict(self):
+        """Delete least recently used entries until within max_bytes."""
+        entries = []
+        for file in self.path.glob('*.npz'):
+            with contextlib.suppress(FileNotFoundError):
+                stat = file.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, file))
+        entries.sort(key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, file in entries:
+            if total <= self.max_bytes:
+                break
+            total -= size
+            with contextlib.suppress(FileNotFoundError):
+                file.unlink()           # Another process may have evicted it
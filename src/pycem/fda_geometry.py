@@ -0,0 +1,32 @@
+"""Vectorized mask primitives for drawing FDA scenario geometries."""
+# %% Imports
+# Standard system imports
+
+# Related third party imports
+import numpy as np
+
+# Local application/library specific imports
+
+
+# %% Functions
+def rectangle_mask(shape, row1, row2, col1=0, col2=None):
+    """Return boolean mask of the cells in rows row1:row2, cols col1:col2.
+
+    Index ranges follow slice semantics, so a full-width plane only needs
+    its rows.
+    """
+    mask = np.zeros(shape, dtype=bool)
+    mask[row1:row2, col1:col2] = True
+    return mask
+
+
+def cell_distance(shape, center, dx=1, dy=1):
+    """Return physical distance of every cell from a (row, col) center."""
+    rows, cols = np.ogrid[:shape[0], :shape[1]]
+    return np.sqrt(((rows - center[0]) * dy)**2 + ((cols - center[1]) * dx)**2)
+
+
+def circle_mask(shape, center, radius, dx=1, dy=1):
+    """Return boolean mask of cells within radius of a (row, col) center."""
+    return cell_distance(shape, center, dx, dy) <= radius
+
@@ -1,19 +1,30 @@
 """Contains scenarios of various transmission lines for FDA analysis."""
 # %% Imports
 # Standard system imports
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import inspect
+import warnings
 
 # Related third party imports
 import numpy as np
 from numba import njit
+from scipy import ndimage, optimize, sparse
 
 # Local application/library specific imports
+from pycem.fda_geometry import circle_mask, rectangle_mask
 from pycem.fda_pyvista import save_mesh_png
+from pycem.fda_solvers import FDASystem, combine_info
 
 
 # %% Scenarios
 class FDAScenario:
     """Parent class with methods to be inherited by child classes."""
 
+    # Attributes that control how, but not what, a scenario is simulated
+    settings = ('solver', 'preconditioner', 'tol', 'maxiter', 'grading',
+                'refine', 'refine_tol', 'symmetry', 'precision')
+
     def __init__(self):
         """Initialize physical constants."""
         self.u0 = 1.2566370614e-6   # Permeability of free space
@@ -22,6 +33,23 @@ class FDAScenario:
         self.n0 = (self.u0 / self.e0)**0.5  # Impedance of free space
         self.differential = False   # Default single-ended transmission lines
         self.diff_mode = 'diff'     # Default differential mode analysis
+        self.solver = 'sparse'  # 'sparse','dense','cg','bicgstab','multigrid'
+        self.preconditioner = 'ic'  # Krylov: 'ic', 'jacobi', or 'multigrid'
+        self.tol = 1e-8             # Relative residual tolerance of iterations
+        self.maxiter = None         # Maximum number of iterations or V-cycles
+        self.precision = 'double'   # 'double', 'mixed', or 'single' floats
+        self.initial_voltages = None    # Initial guess of each mode's voltages
+        self.grading = None         # Graded mesh growth ratio, None is uniform
+        self.refine = None          # Adaptive mesh: None, 'global', 'field'
+        self.refine_tol = 1e-3      # Relative change that stops refinement
+        self.symmetry = True        # Solve half of mirror symmetric meshes
+        self.store_fields = True    # Keep Ex_mat/Ey_mat without plotting them
+        self.mesh_lines = None
+        self.solve_lines = None
+        self.refine_history = None
+        self.extrapolation_history = None
+        self.convergence_order = None
+        self.design_history = None
         # Placeholder variables
         self.Nx = None
         self.Ny = None
@@ -30,6 +58,7 @@ class FDAScenario:
         self.Er = None
         self.z0 = None
         self.voltages = None
+        self.mode_voltages = None
         self.name = None
         self.er_mat = None
         self.signal_mat = None
@@ -37,8 +66,12 @@ class FDAScenario:
         self.capacitance = None
         self.capacitance_h = None
         self.inductance = None
+        self.capacitance_matrix = None
+        self.inductance_matrix = None
+        self.conductor_labels = None
         self.Ex_mat = None
         self.Ey_mat = None
+        self.solver_info = None
         self.set_progress = None
         self.counter = 0
         self.max_val = 0
@@ -71,119 +104,916 @@ class FDAScenario:
                     Ex_mat[i, j] = -(v_mat[i, j+1]-v_mat[i, j])/dx
         return Ex_mat, Ey_mat
 
+    @staticmethod
+    @njit(cache=True)
+    def _energy_matrix(v_mesh, coef_x, coef_y, coef_edge):
+        """Sum energy bilinear forms of flattened voltages over every face.
+
+        The voltage difference across each face is formed once for all
+        excitations, so no intermediate arrays of the mesh size are needed.
+        Faces on the edges of the mesh see the 0V beyond them.
+        """
+        Ny, Nx = coef_x.shape[0], coef_y.shape[1]
+        num = v_mesh.shape[1]
+        energy = np.zeros((num, num))
+        diff_x = np.zeros(num)          # Differences across the face to the
+        diff_y = np.zeros(num)          # next column and to the next row
+        for i in range(Ny):
+            for j in range(Nx):
+                cell = i*Nx + j
+                coef_xij = coef_x[i, j] if j < Nx - 1 else 0.0
+                coef_yij = coef_y[i, j] if i < Ny - 1 else 0.0
+                for k in range(num):
+                    if j < Nx - 1:
+                        diff_x[k] = v_mesh[cell+1, k] - v_mesh[cell, k]
+                    if i < Ny - 1:
+                        diff_y[k] = v_mesh[cell+Nx, k] - v_mesh[cell, k]
+                for k in range(num):
+                    for m in range(k, num):
+                        energy[k, m] += coef_xij * diff_x[k] * diff_x[m] + \
+                            coef_yij * diff_y[k] * diff_y[m] + \
+                            coef_edge[i, j] * v_mesh[cell, k] * v_mesh[cell, m]
+        for k in range(num):
+            for m in range(k):
+                energy[k, m] = energy[m, k]
+        return energy
+
+    def get_params(self):
+        """Return current values of the arguments of the scenario __init__."""
+        names = inspect.signature(type(self).__init__).parameters
+        return {name: getattr(self, name) for name in names if name != 'self'}
+
+    def apply_settings(self, settings):
+        """Set solver attributes from a dict keyed by names in settings.
+
+        Raises ValueError for any other key, so that geometry and methods of
+        the scenario cannot be overwritten.
+        """
+        unknown = set(settings) - set(FDAScenario.settings)
+        if unknown:
+            raise ValueError(f"{self.name} has no settings "
+                             f"{sorted(unknown)}.")
+        for key, value in settings.items():
+            setattr(self, key, value)
+
     def run_sim(self, filepath=None, set_progress=None):
-        """Run single-ended or differential simulation."""
+        """Run single-ended or differential simulation.
+
+        If refine is set, the simulation is repeated on adaptively refined
+        meshes until it converges.
+        """
         if set_progress:
             self.set_progress = set_progress
+        if self.refine:
+            return self._run_adaptive(filepath)
+        return self._run_once(filepath)
+
+    @classmethod
+    def analytical_batch(cls, **params):
+        """Return analytical impedances over arrays of __init__ arguments.
+
+        The arrays are broadcast against each other and the remaining
+        arguments keep their defaults, so a single call evaluates a dense
+        design chart.  Returns arrays of the broadcast shape in the order of
+        analytical_soln.  Formulas outside their range of validity give nan.
+        """
+        scenario = cls()
+        unknown = set(params) - set(scenario.get_params())
+        if unknown:
+            raise ValueError(f"{cls.name} has no parameters "
+                             f"{sorted(unknown)}.")
+        for name, value in zip(params, np.broadcast_arrays(
+                *_as_float(*params.values()))):
+            setattr(scenario, name, value)
+        return scenario.analytical_soln()
+
+    def _run_once(self, filepath=None):
+        """Run single-ended or differential simulation on a single mesh."""
+        self.counter = 0
         if self.differential:
-            # Calculate differential impedance
-            diff_C, diff_L, diff_z0 = self._run_sim()
-            if filepath:
-                self._plot_matrices(filepath, prefix=self.diff_mode)
-            # Calculate common mode impedance
-            self.diff_mode = 'comm'
-            comm_C, comm_L, comm_z0 = self._run_sim()
-            if filepath:
-                self._plot_matrices(filepath, prefix=self.diff_mode)
+            # Calculate differential and common mode impedance together
+            diff_result, comm_result = self._run_sim(modes=('diff', 'comm'),
+                                                     filepath=filepath)
             self.diff_mode = 'diff'      # Reset to diff mode impedance
+            diff_C, diff_L, diff_z0 = diff_result
+            comm_C, comm_L, comm_z0 = comm_result
             odd_z0 = 0.5 * diff_z0      # Odd mode impedance
             even_z0 = 2 * comm_z0       # Even mode impedance
             return (diff_C, diff_L, diff_z0, comm_C, comm_L, comm_z0, odd_z0,
                     even_z0)
         else:
-            capacitance, inductance, z0 = self._run_sim()
-            if filepath:
-                self._plot_matrices(filepath)
+            (capacitance, inductance, z0), = self._run_sim(filepath=filepath)
             return capacitance, inductance, z0
 
-    def _run_sim(self):
-        """Calculate transmission line parameters.
+    def design(self, target, param='trace_w', mode='diff', rtol=1e-3,
+               maxiter=10):
+        """Return value of a parameter that achieves a target impedance.
+
+        The analytical solution seeds the search.  Each simulation corrects
+        the analytical impedance by its error at the latest value, and the
+        corrected formula is solved for the next value.  Once simulations
+        bracket the target, values outside the bracket are replaced by
+        bisection, which stops at the mesh resolution since the simulated
+        impedance only changes when the geometry gains or loses a cell.
+        Every simulation is warm-started from the voltages of the previous
+        one.  mode selects the 'diff', 'comm', 'odd' or 'even' impedance of
+        differential pairs.  Returns the simulated value closest to the
+        target and its impedance; design_history holds the (value,
+        impedance) pair of every simulation.
+        """
+        resolution = min(self.dx, self.dy)
+        value = self._invert_analytical(target, param, mode,
+                                        getattr(self, param))
+        below = above = previous = None     # Bracket of (value, error)
+        self.design_history = []
+        for _ in range(maxiter):
+            scenario = self._variant(param, value)
+            scenario.store_fields = False
+            if previous is not None:
+                scenario.warm_start(previous)
+            z0 = scenario._select_impedance(scenario.run_sim(), mode)
+            self.design_history.append((value, z0))
+            if abs(z0 - target) <= rtol * target:
+                break
+            if z0 < target:
+                below = (value, z0)
+            else:
+                above = (value, z0)
+            offset = z0 - scenario._select_impedance(
+                scenario.analytical_soln(), mode, analytical=True)
+            next_value = self._invert_analytical(target - offset, param, mode,
+                                                 value)
+            if below and above:
+                lower, upper = sorted((below[0], above[0]))
+                if upper - lower <= resolution:
+                    break
+                if not lower < next_value < upper:
+                    next_value = 0.5 * (lower + upper)
+            value = next_value
+            previous = scenario
+        else:
+            warnings.warn(f"{self.name} design did not converge in "
+                          f"{maxiter} simulations.")
+        return min(self.design_history, key=lambda x: abs(x[1] - target))
+
+    def _select_impedance(self, results, mode, analytical=False):
+        """Return impedance of a mode from run_sim or analytical results."""
+        if not self.differential:
+            return results if analytical else results[2]
+        if analytical:
+            order = ('diff', 'comm', 'odd', 'even')
+        else:
+            order = ('', '', 'diff', '', '', 'comm', 'odd', 'even')
+        return results[order.index(mode)]
+
+    def _variant(self, param, value):
+        """Return new scenario with one parameter and the same settings."""
+        params = self.get_params()
+        params[param] = value
+        scenario = type(self)(**params)
+        scenario.apply_settings({setting: getattr(self, setting)
+                                 for setting in FDAScenario.settings})
+        return scenario
+
+    def _invert_analytical(self, target, param, mode, guess, factor=1.25,
+                           max_steps=40):
+        """Return parameter value whose analytical impedance is target.
+
+        The bracket grows geometrically around guess until the impedance
+        crosses the target.
+        """
+        trial = copy.copy(self)
+
+        def error(value):
+            setattr(trial, param, value)
+            with np.errstate(all='ignore'):
+                z0 = trial._select_impedance(trial.analytical_soln(), mode,
+                                             analytical=True)
+            # Formulas outside their range of validity may be complex
+            return np.real(z0) - target if np.isreal(z0) else np.nan
+
+        lower = upper = guess
+        err_lower = err_upper = error(guess)
+        for _ in range(max_steps):
+            lower /= factor
+            upper *= factor
+            err_next = error(lower)
+            if np.isfinite(err_next) and np.isfinite(err_lower) and \
+                    np.sign(err_next) != np.sign(err_lower):
+                return optimize.brentq(error, lower, lower*factor)
+            err_lower = err_next
+            err_next = error(upper)
+            if np.isfinite(err_next) and np.isfinite(err_upper) and \
+                    np.sign(err_next) != np.sign(err_upper):
+                return optimize.brentq(error, upper/factor, upper)
+            err_upper = err_next
+        raise ValueError(f"No {param} of {self.name} reaches an impedance of "
+                         f"{target} Ohms.")
+
+    def _run_adaptive(self, filepath=None, stride=8, max_levels=12):
+        """Refine the solved mesh until every result converges to refine_tol.
+
+        The first mesh keeps every stride-th grid line and the lines on
+        either side of conductor edges and dielectric interfaces.  Each level
+        halves every interval between kept lines ('global'), or the intervals
+        with the largest jumps in electric field magnitude ('field'), and is
+        warm-started from the previous level.  refine_history holds the number
+        of cells and the results of each level.
+        """
+        if self.refine not in ('global', 'field'):
+            raise ValueError(f"Unknown mesh refinement '{self.refine}'.")
+        self._draw_geometry()
+        _, fixed = self._forced_potentials()
+        edge_rows, edge_cols = self._geometry_edges(fixed)
+        rows = np.union1d(FDAScenario._required_lines(edge_rows),
+                          np.arange(0, self.Ny, stride))
+        cols = np.union1d(FDAScenario._required_lines(edge_cols),
+                          np.arange(0, self.Nx, stride))
+        initial_voltages = self.initial_voltages
+        self.refine_history = []
+        previous = None
+        for _ in range(max_levels):
+            self.solve_lines = (rows, cols)
+            results = self._run_once()
+            self.refine_history.append((rows.size * cols.size, results))
+            if previous is not None and np.all(
+                    np.abs(np.subtract(results, previous))
+                    <= self.refine_tol * np.abs(previous)):
+                break
+            previous = results
+            new_rows, new_cols = self._refine_lines(rows, cols)
+            if new_rows.size == rows.size and new_cols.size == cols.size:
+                break                   # Every grid line is already solved
+            rows, cols = new_rows, new_cols
+            self.warm_start(self)
+        else:
+            warnings.warn(f"{self.name} mesh refinement did not converge in "
+                          f"{max_levels} levels.")
+        self.solve_lines = None
+        self.initial_voltages = initial_voltages
+        if filepath:
+            self.plot_voltages(self.mode_voltages, filepath)
+        return results
+
+    def _refine_lines(self, rows, cols):
+        """Return the solved grid lines of the next refinement level."""
+        if self.refine == 'global':
+            return (FDAScenario._split_intervals(rows),
+                    FDAScenario._split_intervals(cols))
+        # Field magnitude of every mode drives refinement
+        e_mag = np.zeros((self.Ny, self.Nx))
+        for voltages in self.mode_voltages.values():
+            self._set_voltages(voltages)
+            e_mag = np.maximum(e_mag, np.hypot(self.Ex_mat, self.Ey_mat))
+        jump_x = np.abs(np.diff(e_mag, axis=1)).max(axis=0)
+        jump_y = np.abs(np.diff(e_mag, axis=0)).max(axis=1)
+        return (FDAScenario._split_intervals(rows, jump_y),
+                FDAScenario._split_intervals(cols, jump_x))
+
+    @staticmethod
+    def _split_intervals(lines, jumps=None, fraction=0.3):
+        """Return lines with the midpoints of intervals to be refined added.
 
-        Capacitance calculation assumes 1V applied voltage.
+        Without field jumps every interval is split.  Otherwise the fraction
+        of intervals with the largest length times field jump, over the
+        interval and its end faces, are split.
         """
-        self._draw_geometry()           # Draw geometry to be simulated
-        self._construct_matrices()      # Construct matrices for FDA
-        self._update_progress()
+        length = np.diff(lines)
+        split = length > 1
+        if jumps is not None and np.any(split):
+            indicator = np.array([
+                length[k] * jumps[max(lines[k]-1, 0):lines[k+1]+1].max()
+                for k in range(length.size)])
+            threshold = np.quantile(indicator[split], 1 - fraction)
+            split &= indicator >= threshold
+        return np.union1d(lines, (lines[:-1] + lines[1:])[split] // 2)
+
+    def extrapolate(self, strides=(4, 2, 1), order=None, max_workers=None):
+        """Return run_sim results extrapolated to zero mesh spacing.
+
+        Each level keeps every stride-th grid line and the lines on either
+        side of conductor edges and dielectric interfaces, so every level
+        resolves the same geometry.  Strides must shrink by a constant ratio.
+        The levels are independent and solved in a process pool, or serially
+        if max_workers is 1.  The convergence order of each result is fitted
+        from the finest three levels, or given by order.  Returns the
+        extrapolated results and an estimate of their absolute errors;
+        extrapolation_history holds the number of cells and the results of
+        each level, and convergence_order the order of each result.
+        """
+        strides = np.asarray(strides)
+        ratios = strides[:-1] / strides[1:]
+        if strides.size < 2 or np.any(strides < 1) or \
+                not np.allclose(ratios, ratios[0]) or ratios[0] <= 1:
+            raise ValueError("Strides must shrink by a constant ratio.")
+        if order is None and strides.size < 3:
+            raise ValueError("Fitting the convergence order requires at least "
+                             "three strides.")
+        self._draw_geometry()
+        _, fixed = self._forced_potentials()
+        edge_rows, edge_cols = self._geometry_edges(fixed)
+        levels = [(np.union1d(FDAScenario._required_lines(edge_rows),
+                              np.arange(0, self.Ny, stride)),
+                   np.union1d(FDAScenario._required_lines(edge_cols),
+                              np.arange(0, self.Nx, stride)))
+                  for stride in strides]
+        params = self.get_params()
+        settings = {setting: getattr(self, setting)
+                    for setting in FDAScenario.settings}
+        args = [(type(self), params, settings, lines) for lines in levels]
+        if max_workers == 1:
+            results = [_run_lines(*arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_run_lines, *zip(*args)))
+        self.extrapolation_history = [(rows.size * cols.size, result)
+                                      for (rows, cols), result
+                                      in zip(levels, results)]
+        extrapolated = [FDAScenario._richardson(values, ratios[0], order)
+                        for values in np.transpose(results)]
+        values, errors, self.convergence_order = zip(*extrapolated)
+        return values, errors
+
+    @staticmethod
+    def _richardson(values, ratio, order=None):
+        """Return (value, error, order) extrapolated from a mesh sequence.
+
+        The order is fitted from the last three values unless given.  Values
+        that do not converge monotonically cannot be extrapolated, so the
+        finest value is returned with its change from the previous level as
+        the error.
+        """
+        coarse, fine = values[-2:]
+        if order is None:
+            with np.errstate(all='ignore'):
+                order = np.log((values[-2] - values[-3]) /
+                               (fine - coarse)) / np.log(ratio)
+            if not np.isfinite(order) or order <= 0:
+                return fine, abs(fine - coarse), np.nan
+        correction = (fine - coarse) / (ratio**order - 1)
+        return fine + correction, abs(correction), order
+
+    def _run_sim(self, modes=('',), filepath=None):
+        """Calculate transmission line parameters of each excitation mode.
+
+        All modes share the same conductor geometry, so the FDA system is
+        factored once and each mode is solved as an additional right-hand
+        side.  Capacitance calculation assumes 1V applied voltage.  Returns a
+        list of (capacitance, inductance, z0) tuples, one per mode.
+        """
+        b_mats = []
+        for mode in modes:
+            if mode:
+                self.diff_mode = mode
+            self._draw_geometry()       # Draw geometry to be simulated
+            b_mat, fixed = self._forced_potentials()
+            b_mats.append(b_mat)
+        b_mats = np.column_stack(b_mats)
+        x0 = self._initial_guess(modes, b_mats)
+        voltages, cap_mat, cap_mat_h = self._solve(b_mats, fixed, x0=x0)
+        self.mode_voltages = {}
+        results = []
+        for k, mode in enumerate(modes):
+            self._update_progress()
+            if len(modes) > 1:
+                # Restore conductor potentials of this mode for plotting
+                self.diff_mode = mode
+                self._draw_geometry()
+            self._set_voltages(voltages[:, k],
+                               fields=bool(filepath) or self.store_fields)
+            self.mode_voltages[mode] = self.voltages
+            self._update_progress()
+            # Distributed and homogenous capacitance
+            self.capacitance = cap_mat[k, k]
+            self.capacitance_h = cap_mat_h[k, k]
+            # Calculate distributed inductance
+            self.inductance = 1 / (self.c0**2 * self.capacitance_h)
+            # Calculate characteristic impedance
+            self.z0 = np.sqrt(self.inductance / self.capacitance)
+            results.append((self.capacitance, self.inductance, self.z0))
+            if filepath:
+                self._plot_matrices(filepath, prefix=mode)
+        return results
+
+    def warm_start(self, previous):
+        """Use previously solved voltages as the initial guess.
+
+        previous is a simulated scenario, a dict of (Ny, Nx) voltage arrays
+        keyed by mode, or the (Ny, Nx) voltages of a single-ended scenario.
+        The previous mesh may differ in size; its voltages are resampled onto
+        this mesh.  Only iterative solvers make use of the initial guess, and
+        solver_info then reports the estimated iterations_saved.
+        """
+        if isinstance(previous, FDAScenario):
+            previous = {mode: voltages.reshape((previous.Ny, previous.Nx))
+                        for mode, voltages in previous.mode_voltages.items()}
+        elif not isinstance(previous, dict):
+            previous = {'': previous}
+        self.initial_voltages = {mode: np.asarray(voltages) for mode, voltages
+                                 in previous.items()}
+
+    def _initial_guess(self, modes, b_mats):
+        """Return initial guess of the voltages of each mode or None."""
+        if not self.initial_voltages:
+            return None
+        x0 = np.array(b_mats, dtype=float)
+        for k, mode in enumerate(modes):
+            if mode in self.initial_voltages:
+                x0[:, k] = FDAScenario._resample(self.initial_voltages[mode],
+                                                 (self.Ny, self.Nx)).flatten()
+        return x0
+
+    @staticmethod
+    def _resample(v_mat, shape):
+        """Bilinearly interpolate a voltage matrix onto a mesh shape."""
+        if v_mat.shape == tuple(shape):
+            return v_mat
+        rows = np.linspace(0, v_mat.shape[0]-1, shape[0])
+        cols = np.linspace(0, v_mat.shape[1]-1, shape[1])
+        coords = np.meshgrid(rows, cols, indexing='ij')
+        return ndimage.map_coordinates(v_mat, coords, order=1)
+
+    def _set_voltages(self, voltages, fields=True):
+        """Store flattened voltages and unless fields is False their field."""
         Nx = self.Nx
         Ny = self.Ny
-        dx = self.dx
-        dy = self.dy
-        v_mat = self.voltages.reshape((Ny, Nx))
-        Ex_mat = np.zeros((Ny, Nx))     # Electric field in X-direction
-        Ey_mat = np.zeros((Ny, Nx))     # Electric field in Y-direction
-        FDAScenario._calculate_e_field(Nx, Ny, dx, dy, Ex_mat, Ey_mat, v_mat)
-        self._update_progress()
+        self.voltages = voltages
+        if not fields:
+            self.Ex_mat = None
+            self.Ey_mat = None
+            return
+        dtype = np.float64 if self.precision == 'double' else np.float32
+        Ex_mat = np.empty((Ny, Nx), dtype)  # Electric field in X-direction
+        Ey_mat = np.empty((Ny, Nx), dtype)  # Electric field in Y-direction
+        FDAScenario._calculate_e_field(Nx, Ny, self.dx, self.dy, Ex_mat,
+                                       Ey_mat, voltages.reshape((Ny, Nx)))
         self.Ex_mat = Ex_mat
         self.Ey_mat = Ey_mat
-        Dx_mat = Ex_mat * self.er_mat   # Displacement field in X-direction
-        Dy_mat = Ey_mat * self.er_mat   # Displacement field in Y-direction
-        # Calculate distributed capacitance
-        self.capacitance = (np.sum(Dx_mat * Ex_mat) +
-                            np.sum(Dy_mat * Ey_mat)) * self.e0 * dx * dy
-        # Calculate homogenous capacitance
-        self.capacitance_h = (np.sum(Ex_mat * Ex_mat) +
-                              np.sum(Ey_mat * Ey_mat)) * self.e0 * dx * dy
-        # Calculate distributed inductance
-        self.inductance = 1 / (self.c0**2 * self.capacitance_h)
-        # Calculate characteristic impedance
-        self.z0 = np.sqrt(self.inductance / self.capacitance)
-        return self.capacitance, self.inductance, self.z0
 
-    @staticmethod
-    @njit(cache=True)
-    def _create_eqns(Nx, Ny, dx, dy, laplacian_mat, b_mat, signal_mat,
-                     ground_mat, neg_mat, differential=False):
-        """Create simultaneous equations for FDA."""
-        coef_i = 1 / (dy ** 2)         # Y-difference coefficients
-        coef_j = 1 / (dx ** 2)         # X-difference coefficients
-        coef_self = -(2*coef_i + 2*coef_j)  # Self-term coefficents
-        for i in range(Ny):
-            for j in range(Nx):
-                if signal_mat[i, j] > 0:
-                    # Force known potentials for signal
-                    laplacian_mat[i*Nx+j, i*Nx+j] = 1
-                    b_mat[i*Nx + j] = signal_mat[i, j]
-                elif ground_mat[i, j] > 0:
-                    # Force known potentials for ground
-                    laplacian_mat[i*Nx+j, i*Nx+j] = 1
-                    b_mat[i*Nx + j] = 0
-                elif differential and neg_mat[i, j] != 0:
-                    # Force potentials for negative conductor of diff pair
-                    laplacian_mat[i*Nx+j, i*Nx+j] = 1
-                    b_mat[i*Nx + j] = neg_mat[i, j]
-                else:
-                    # Assign finite-difference equation coeffients
-                    temp_mat = np.zeros((Ny, Nx))
-                    if i > 0:
-                        temp_mat[i-1, j] = coef_i
-                    if i < (Ny - 1):
-                        temp_mat[i+1, j] = coef_i
-                    if j > 0:
-                        temp_mat[i, j-1] = coef_j
-                    if j < (Nx - 1):
-                        temp_mat[i, j+1] = coef_j
-                    temp_mat[i, j] = coef_self
-                    laplacian_mat[i*Nx+j] = temp_mat.flatten()
-
-    def _construct_matrices(self):
-        """Construct matrices used for finite difference analysis."""
+    def plot_voltages(self, mode_voltages, filepath):
+        """Save PNG images of previously solved voltages of each mode."""
+        for mode, voltages in mode_voltages.items():
+            if mode:
+                self.diff_mode = mode
+            self._draw_geometry()
+            self._set_voltages(voltages)
+            self._plot_matrices(filepath, prefix=mode)
+        self.diff_mode = 'diff'         # Reset to diff mode impedance
+        self.mode_voltages = mode_voltages
+
+    def solve_excitations(self, excitations):
+        """Solve for the voltages of several conductor excitations at once.
+
+        Each excitation is an (Ny, Nx) array of potentials applied to the
+        conductor cells of the drawn geometry; values of other cells are
+        ignored.  The FDA system is factored once and every excitation is
+        solved as an additional right-hand side.  Returns voltages with shape
+        (num_excitations, Ny, Nx).
+        """
         Nx = self.Nx
         Ny = self.Ny
+        _, fixed = self._forced_potentials()
+        b_mats = np.reshape(excitations, (-1, Nx*Ny)).T
+        voltages, _, _ = self._solve(b_mats, fixed, capacitance=False)
+        return voltages.T.reshape((-1, Ny, Nx))
+
+    def extract_matrices(self, labels=None):
+        """Return the capacitance and inductance matrices of the conductors.
+
+        Every connected signal (and negative) conductor of the drawn geometry
+        is labeled, unless an (Ny, Nx) integer array of conductor labels is
+        given, where 0 marks cells that are not a labeled conductor.  Each
+        conductor is excited with 1V while the others and ground are held at
+        0V, and all excitations are solved as right-hand sides of a single
+        factored system.  Returns the N x N Maxwell capacitance matrix (F/m)
+        and inductance matrix (H/m), ordered by conductor label.
+        """
+        self._draw_geometry()
+        ground = self.ground_mat > 0
+        if labels is None:
+            conductors = self.signal_mat > 0
+            if self.differential:
+                conductors |= (self.neg_mat != 0) & ~ground
+            labels, num_conductors = ndimage.label(conductors)
+        else:
+            labels = np.asarray(labels)
+            num_conductors = labels.max()
+        fixed = (ground | (labels > 0)).flatten()
+        b_mats = np.stack([(labels == k).flatten() for k in
+                           range(1, num_conductors+1)], axis=1).astype(float)
+        _, cap_mat, cap_mat_h = self._solve(b_mats, fixed)
+        self.conductor_labels = labels
+        self.capacitance_matrix = cap_mat
+        self.inductance_matrix = np.linalg.inv(cap_mat_h) / self.c0**2
+        return self.capacitance_matrix, self.inductance_matrix
+
+    @staticmethod
+    def _face_permittivity(er_mat):
+        """Return permittivity averaged onto faces between adjacent cells.
+
+        Returns the faces between neighboring columns, shape (Ny, Nx-1), and
+        the faces between neighboring rows, shape (Ny-1, Nx).
+        """
+        eps_x = 0.5 * (er_mat[:, 1:] + er_mat[:, :-1])
+        eps_y = 0.5 * (er_mat[1:, :] + er_mat[:-1, :])
+        return eps_x, eps_y
+
+    def _face_coefficients(self, er_mat, rows=None, cols=None):
+        """Return coupling coefficients of the faces between adjacent cells.
+
+        Each face permittivity is weighted by the width of the face divided
+        by the distance between the cells it separates, normalized by the
+        area dx*dy of a uniform cell.  rows and cols are the indices of the
+        grid lines of a graded mesh, and are every line if omitted.  Also
+        returns the coefficients coupling each cell on the edges of the mesh
+        to 0V cells one uniform step beyond them, shaped (Ny, Nx).
+        """
         dx = self.dx
         dy = self.dy
-        # Construct Laplacian matrix
-        b_mat = np.zeros((Nx*Ny,))          # Forced potentials
-        laplacian_mat = np.zeros((Nx*Ny, Nx*Ny))
-        if self.differential:
-            FDAScenario._create_eqns(Nx, Ny, dx, dy, laplacian_mat, b_mat,
-                                     self.signal_mat, self.ground_mat,
-                                     self.neg_mat, differential=True)
+        eps_x, eps_y = FDAScenario._face_permittivity(er_mat)
+        if rows is None:
+            rows = np.arange(er_mat.shape[0])
+            cols = np.arange(er_mat.shape[1])
+        x_pos = cols * dx
+        y_pos = rows * dy
+        # Control volume edges are halfway between grid lines
+        width_x = np.diff(np.concatenate(([x_pos[0] - dx/2],
+                                          0.5 * (x_pos[1:] + x_pos[:-1]),
+                                          [x_pos[-1] + dx/2])))
+        width_y = np.diff(np.concatenate(([y_pos[0] - dy/2],
+                                          0.5 * (y_pos[1:] + y_pos[:-1]),
+                                          [y_pos[-1] + dy/2])))
+        weight_x = width_y[:, None] / np.diff(x_pos)[None, :]
+        weight_y = width_x[None, :] / np.diff(y_pos)[:, None]
+        # Faces to the 0V cells beyond the edges take the permittivity of
+        # the edge cell
+        weight_edge = np.zeros(er_mat.shape)
+        weight_edge[:, [0, -1]] += width_y[:, None] / dx
+        weight_edge[[0, -1], :] += width_x[None, :] / dy
+        return (eps_x * weight_x / (dx*dy), eps_y * weight_y / (dx*dy),
+                er_mat * weight_edge / (dx*dy))
+
+    def _capacitance_matrix(self, v_mesh, coef_x, coef_y, coef_edge):
+        """Return capacitance matrix from the energies of several voltages.
+
+        v_mesh holds the flattened voltages of one excitation per column.
+        Entry (i, j) is the electrostatic energy bilinear form of voltages i
+        and j, summed over the same faces and coefficients used to construct
+        the FDA equations, so the diagonal is the capacitance of each
+        excitation.
+        """
+        energy = FDAScenario._energy_matrix(
+            np.ascontiguousarray(v_mesh, dtype=float),
+            np.ascontiguousarray(coef_x), np.ascontiguousarray(coef_y),
+            np.ascontiguousarray(coef_edge))
+        return energy * self.e0 * self.dx * self.dy
+
+    def _solve(self, b_mats, fixed, x0=None, capacitance=True):
+        """Solve for the voltages of excitations on the mesh of the geometry.
+
+        b_mats holds flattened potentials forced on the conductor cells, one
+        excitation per column, and x0 is an optional initial guess of the same
+        shape.  Graded meshes are solved on a subset of the grid lines and the
+        voltages are interpolated back onto the full grid.  Returns the
+        voltages, and unless capacitance is False the capacitance matrices of
+        the excitations in the dielectric and in free space.  solver_info
+        combines the information of the dielectric and free space solves.
+        """
+        Nx = self.Nx
+        Ny = self.Ny
+        rows, cols = self._mesh_lines(fixed)
+        self.mesh_lines = (rows, cols)
+        shape = (rows.size, cols.size)
+
+        def restrict(array):
+            array = np.reshape(array, (Ny, Nx, -1))[np.ix_(rows, cols)]
+            return array.reshape((rows.size * cols.size, -1))
+
+        er_mat = self.er_mat[np.ix_(rows, cols)]
+        fixed_mesh = restrict(fixed)[:, 0]
+        b_mesh = restrict(b_mats)
+        x0_mesh = None if x0 is None else restrict(x0)
+        graded = shape != (Ny, Nx)
+        mesh = (rows, cols) if graded else ()
+        coefs = self._face_coefficients(er_mat, *mesh)
+        v_mesh, self.solver_info = self._solve_mesh(*coefs, fixed_mesh, b_mesh,
+                                                    x0=x0_mesh)
+        if graded:
+            voltages = FDAScenario._prolong(v_mesh, rows, cols, (Ny, Nx))
+            voltages[fixed] = b_mats[fixed]
+        else:
+            voltages = v_mesh
+        if not capacitance:
+            return voltages, None, None
+        cap_mat = self._capacitance_matrix(v_mesh, *coefs)
+        er_uniform = er_mat.flat[0]
+        if np.all(er_mat == er_uniform):
+            # Potentials of a uniform dielectric match free space
+            cap_mat_h = cap_mat / er_uniform
+        else:
+            # Homogenous capacitance requires potentials in free space
+            coefs = self._face_coefficients(np.ones(shape), *mesh)
+            v_mesh_h, info = self._solve_mesh(*coefs, fixed_mesh, b_mesh,
+                                              x0=x0_mesh)
+            self.solver_info = combine_info([self.solver_info, info])
+            cap_mat_h = self._capacitance_matrix(v_mesh_h, *coefs)
+        return voltages, cap_mat, cap_mat_h
+
+    def _solve_mesh(self, coef_x, coef_y, coef_edge, fixed, b_mats, x0=None):
+        """Return voltages of flattened excitations and solver information.
+
+        Unless symmetry is False, mirror symmetric meshes are folded in half
+        about their vertical and then their horizontal centerline, so a mesh
+        symmetric about both is solved on a quarter of its cells.
+        """
+        shape = coef_edge.shape
+        b_mats = np.reshape(b_mats, shape + (-1,))
+        if x0 is not None:
+            x0 = np.reshape(x0, b_mats.shape)
+        axes = (1, 0) if self.symmetry else ()
+        voltages, info = self._solve_folded(
+            coef_x, coef_y, coef_edge, np.reshape(fixed, shape), b_mats, x0,
+            axes)
+        return voltages.reshape((shape[0] * shape[1], -1)), info
+
+    def _solve_folded(self, coef_x, coef_y, coef_edge, fixed, b_mats, x0,
+                      axes):
+        """Solve (Ny, Nx, K) excitations, folding the mesh about each axis.
+
+        Excitations that are even about the mirror plane of the first axis
+        are solved on half the mesh with a Neumann boundary at the plane, and
+        odd excitations with a Dirichlet boundary.  Other excitations, and
+        meshes that are not mirror symmetric, are solved unfolded.  The
+        remaining axes are folded recursively.
+        """
+        if not axes:
+            system = self._construct_matrices(coef_x, coef_y, coef_edge,
+                                              fixed.ravel())
+            shape = b_mats.shape
+            x0 = None if x0 is None else x0.reshape((-1, shape[2]))
+            voltages, info = system.solve(b_mats.reshape((-1, shape[2])), x0)
+            return voltages.reshape(shape), info
+        axis, axes = axes[0], axes[1:]
+        symmetric = np.array_equal(fixed, np.flip(fixed, axis)) and all(
+            np.allclose(coef, np.flip(coef, axis), rtol=1e-12, atol=0)
+            for coef in (coef_x, coef_y, coef_edge))
+        parity = np.zeros(b_mats.shape[2])
+        for k in range(parity.size if symmetric else 0):
+            b_mat = b_mats[..., k]
+            if np.array_equal(b_mat, np.flip(b_mat, axis)):
+                parity[k] = 1
+            elif np.array_equal(b_mat, -np.flip(b_mat, axis)):
+                parity[k] = -1
+        voltages = np.empty(b_mats.shape)
+        infos = []
+        for sign in (1, -1, 0):
+            idx = np.flatnonzero(parity == sign)
+            if not idx.size:
+                continue
+            args = (coef_x, coef_y, coef_edge, fixed, b_mats[..., idx],
+                    None if x0 is None else x0[..., idx])
+            if sign:
+                voltages[..., idx], info = self._solve_half(*args, axis, sign,
+                                                            axes)
+            else:
+                voltages[..., idx], info = self._solve_folded(*args, axes)
+            infos.append(info)
+        return voltages, combine_info(infos)
+
+    def _solve_half(self, coef_x, coef_y, coef_edge, fixed, b_mats, x0, axis,
+                    sign, axes):
+        """Solve excitations even (sign 1) or odd (-1) about a mirror plane.
+
+        An even number of cells along the axis puts the plane on the face
+        between the middle cells.  Odd excitations then couple the last cell
+        of the half to an extra layer of 0V cells through twice the
+        coefficient of that face.  Otherwise the plane runs through the
+        middle cells, whose equations are halved for even excitations and
+        which are held at 0V for odd excitations.
+        """
+        num_cells = fixed.shape[axis]
+        half = num_cells // 2
+        # Faces crossing the axis and faces parallel to it
+        normal, parallel = (coef_y, coef_x) if axis == 0 else (coef_x, coef_y)
+        middle = [slice(None)] * 3
+        middle[axis] = -1
+        middle = tuple(middle)
+
+        def take(array, stop):
+            return np.take(array, np.arange(stop), axis=axis)
+
+        if num_cells % 2 == 0:
+            plane = 2 * np.take(normal, [half - 1], axis=axis)
+            normal = take(normal, half - 1)
+            parallel = take(parallel, half)
+            coef_edge = take(coef_edge, half)
+            fixed = take(fixed, half)
+            b_mats = take(b_mats, half)
+            x0 = None if x0 is None else take(x0, half)
+            if sign < 0:
+                # Extra layer of 0V cells stands in for the mirror plane
+                normal = np.concatenate((normal, plane), axis=axis)
+                parallel = np.concatenate((parallel, 0 * take(parallel, 1)),
+                                          axis=axis)
+                coef_edge = np.concatenate(
+                    (coef_edge, 0 * take(coef_edge, 1)), axis=axis)
+                fixed = np.concatenate((fixed, np.ones_like(take(fixed, 1))),
+                                       axis=axis)
+                b_mats = np.concatenate((b_mats, 0 * take(b_mats, 1)),
+                                        axis=axis)
+                if x0 is not None:
+                    x0 = np.concatenate((x0, 0 * take(x0, 1)), axis=axis)
         else:
-            FDAScenario._create_eqns(Nx, Ny, dx, dy, laplacian_mat, b_mat,
-                                     self.signal_mat, self.ground_mat,
-                                     np.zeros((Ny, Nx)), differential=False)
-        # Solve for voltages
-        self.voltages = np.linalg.solve(laplacian_mat, b_mat)
+            normal = take(normal, half)
+            parallel = take(parallel, half + 1)
+            coef_edge = take(coef_edge, half + 1)
+            fixed = take(fixed, half + 1)
+            b_mats = take(b_mats, half + 1)
+            x0 = None if x0 is None else take(x0, half + 1)
+            if sign > 0:
+                parallel[middle[:2]] *= 0.5
+                coef_edge[middle[:2]] *= 0.5
+            else:
+                fixed[middle[:2]] = True
+                b_mats[middle] = 0
+                if x0 is not None:
+                    x0[middle] = 0
+        coefs = (parallel, normal) if axis == 0 else (normal, parallel)
+        v_half, info = self._solve_folded(*coefs, coef_edge, fixed, b_mats,
+                                          x0, axes)
+        v_half = take(v_half, half + num_cells % 2)   # Drop any 0V layer
+        mirror = np.flip(take(v_half, half), axis)
+        return np.concatenate((v_half, sign * mirror), axis=axis), info
+
+    def _mesh_lines(self, fixed):
+        """Return indices of the grid rows and columns of the solved mesh.
+
+        Uniform meshes keep every line.  Graded meshes keep the lines on
+        either side of conductor edges and dielectric interfaces, and the
+        spacing of the kept lines grows by the grading ratio away from them.
+        """
+        if self.solve_lines is not None:
+            return self.solve_lines
+        if not self.grading:
+            return np.arange(self.Ny), np.arange(self.Nx)
+        edge_rows, edge_cols = self._geometry_edges(fixed)
+        rows = FDAScenario._graded_lines(edge_rows, self.grading)
+        cols = FDAScenario._graded_lines(edge_cols, self.grading)
+        if self.symmetry:
+            rows = FDAScenario._mirror_lines(rows, edge_rows)
+            cols = FDAScenario._mirror_lines(cols, edge_cols)
+        return rows, cols
+
+    @staticmethod
+    def _mirror_lines(lines, edges):
+        """Return lines made mirror symmetric if the edges of an axis are.
+
+        Lines of the first half and the middle line are mirrored onto the
+        second half.
+        """
+        if not np.array_equal(edges, edges[::-1]):
+            return lines
+        middle = edges.size // 2
+        first_half = np.append(lines[lines < middle], middle)
+        return np.union1d(first_half, edges.size - first_half)
+
+    def _geometry_edges(self, fixed):
+        """Return flags of the row and column faces where geometry changes."""
+        fixed = np.reshape(fixed, (self.Ny, self.Nx))
+        er_mat = self.er_mat
+        edge_x = (fixed[:, 1:] != fixed[:, :-1]) | \
+            (er_mat[:, 1:] != er_mat[:, :-1])
+        edge_y = (fixed[1:, :] != fixed[:-1, :]) | \
+            (er_mat[1:, :] != er_mat[:-1, :])
+        return np.any(edge_y, axis=1), np.any(edge_x, axis=0)
+
+    @staticmethod
+    def _required_lines(edges):
+        """Return indices of the end lines and the lines beside each edge."""
+        faces = np.flatnonzero(edges)
+        return np.unique(np.concatenate(([0, edges.size], faces, faces+1)))
+
+    @staticmethod
+    def _graded_lines(edges, grading):
+        """Return indices of graded grid lines along one axis.
+
+        edges flags the faces between consecutive lines where the geometry
+        changes.  The spacing of the kept lines, in cells, may not exceed
+        1 + (grading-1)*distance from the nearest edge at either end, which
+        grows approximately geometrically away from the edges.
+        """
+        num_lines = edges.size + 1
+        required_idx = FDAScenario._required_lines(edges)
+        idx = np.arange(num_lines)
+        right = np.searchsorted(required_idx, idx)
+        left = np.maximum(right - 1, 0)
+        right = np.minimum(right, required_idx.size - 1)
+        dist = np.minimum(np.abs(idx - required_idx[left]),
+                          np.abs(required_idx[right] - idx))
+        max_spacing = np.floor(1 + (grading - 1) * dist).astype(int)
+        lines = [0]
+        while lines[-1] < num_lines - 1:
+            line = lines[-1]
+            next_required = required_idx[np.searchsorted(required_idx, line,
+                                                          side='right')]
+            step = min(max_spacing[line], next_required - line)
+            while step > max_spacing[line + step]:
+                step -= 1
+            lines.append(line + step)
+        return np.array(lines)
+
+    @staticmethod
+    def _interpolation(lines, num_lines):
+        """Return sparse matrix linearly interpolating lines onto all lines."""
+        idx = np.arange(num_lines)
+        right = np.clip(np.searchsorted(lines, idx), 1, lines.size - 1)
+        left = right - 1
+        frac = (idx - lines[left]) / (lines[right] - lines[left])
+        return sparse.csr_matrix(
+            (np.concatenate((1 - frac, frac)),
+             (np.concatenate((idx, idx)), np.concatenate((left, right)))),
+            shape=(num_lines, lines.size))
+
+    @staticmethod
+    def _prolong(v_mesh, rows, cols, shape):
+        """Return graded mesh voltages interpolated onto the full grid."""
+        interp_y = FDAScenario._interpolation(rows, shape[0])
+        interp_x = FDAScenario._interpolation(cols, shape[1])
+        voltages = np.empty((shape[0] * shape[1], v_mesh.shape[1]))
+        for k in range(v_mesh.shape[1]):
+            v_mat = v_mesh[:, k].reshape((rows.size, cols.size))
+            voltages[:, k] = (interp_x @ (interp_y @ v_mat).T).T.ravel()
+        return voltages
+
+    def _forced_potentials(self):
+        """Return potentials forced on conductors and mask of conductor cells.
+
+        Both are flattened.  Potentials of free cells are zero.
+        """
+        Nx = self.Nx
+        Ny = self.Ny
+        # Assign known potentials from lowest to highest precedence
+        b_mat = np.zeros((Ny, Nx))
+        fixed = np.zeros((Ny, Nx), dtype=bool)
+        if self.differential:
+            neg = self.neg_mat != 0         # Negative conductor of diff pair
+            b_mat[neg] = self.neg_mat[neg]
+            fixed |= neg
+        ground = self.ground_mat > 0        # Ground conductors
+        b_mat[ground] = 0
+        fixed |= ground
+        signal = self.signal_mat > 0        # Signal conductors
+        b_mat[signal] = self.signal_mat[signal]
+        fixed |= signal
+        return b_mat.flatten(), fixed.flatten()
+
+    def _create_eqns(self, coef_x, coef_y, coef_edge, fixed):
+        """Create simultaneous equations for FDA.
+
+        Discretizes the generalized Laplacian div(er * grad(V)) = 0 using the
+        coupling coefficients of the faces between adjacent cells, shaped
+        (Ny, Nx-1) and (Ny-1, Nx), and of the faces to 0V cells beyond the
+        edges of the mesh, shaped (Ny, Nx).  The stencil is emitted as COO
+        index/value arrays in a single vectorized pass, and duplicate entries
+        are meant to be summed.  Conductor cells given by the flattened mask
+        fixed reduce to the identity equation.
+        """
+        Ny, Nx = coef_edge.shape
+        idx = np.arange(Nx*Ny).reshape((Ny, Nx))
+        # Each face couples the cells on either side of it
+        cell1 = np.concatenate((idx[:, :-1].ravel(), idx[:-1, :].ravel()))
+        cell2 = np.concatenate((idx[:, 1:].ravel(), idx[1:, :].ravel()))
+        coefs = np.concatenate((coef_x.ravel(), coef_y.ravel()))
+        # Assign finite-difference equation coefficients of free cells
+        free1 = ~fixed[cell1]
+        free2 = ~fixed[cell2]
+        diag_fixed = np.flatnonzero(fixed)
+        diag_free = np.flatnonzero(~fixed)
+        rows = np.concatenate((cell1[free1], cell2[free2], cell1[free1],
+                               cell2[free2], diag_free, diag_fixed))
+        cols = np.concatenate((cell2[free1], cell1[free2], cell1[free1],
+                               cell2[free2], diag_free, diag_fixed))
+        vals = np.concatenate((coefs[free1], coefs[free2], -coefs[free1],
+                               -coefs[free2], -coef_edge.ravel()[diag_free],
+                               np.ones(diag_fixed.size)))
+        return rows, cols, vals
+
+    def _construct_matrices(self, coef_x, coef_y, coef_edge, fixed):
+        """Construct and factor matrices used for finite difference analysis.
+
+        Returns an FDASystem that solves for the voltages of any potentials
+        forced on the conductor cells.
+        """
+        shape = coef_edge.shape
+        num_cells = shape[0] * shape[1]
+        rows, cols, vals = self._create_eqns(coef_x, coef_y, coef_edge, fixed)
+        # Sparse storage is proportional to the number of cells
+        laplacian_mat = sparse.csr_matrix((vals, (rows, cols)),
+                                          shape=(num_cells, num_cells))
+        return FDASystem(laplacian_mat, fixed, shape,
+                         solver=self.solver,
+                         preconditioner=self.preconditioner, tol=self.tol,
+                         maxiter=self.maxiter, precision=self.precision)
 
     def _plot_matrices(self, filepath, prefix=''):
         """Save PNG images of matrix data using PyVista."""
@@ -267,38 +1097,35 @@ class SymmetricStripline(FDAScenario):
         tr_w = round(self.trace_w / self.dx)    # Trace width in cells
         idx1 = Nx//2-tr_w//2                    # Start idx of stripline trace
         idx2 = idx1 + tr_w                      # End index of trace
-        self.signal_mat[Ny//2, idx1:idx2] = 1   # 1V applied to stripline trace
-        self.ground_mat[0, :] = 1               # Top ground plane
-        self.ground_mat[-1, :] = 1              # Bottom ground plane
-        self.er_mat = self.Er * self.er_mat     # Set dielectric constant
+        trace = rectangle_mask((Ny, Nx), Ny//2, Ny//2+1, idx1, idx2)
+        self.signal_mat[trace] = 1              # 1V applied to stripline trace
+        self.ground_mat[rectangle_mask((Ny, Nx), 0, 1)] = 1    # Top ground
+        self.ground_mat[rectangle_mask((Ny, Nx), Ny-1, Ny)] = 1    # Bottom
+        self.er_mat = self.Er * np.ones((Ny, Nx))   # Set dielectric constant
 
+    @np.errstate(divide='ignore', invalid='ignore')
     def analytical_soln(self):
         """Calculate transmission line impedance using analytical formula."""
-        w = self.trace_w
-        Er = self.Er
-        t = self.dy
-        b = self.sub_thk
-        h = self.sub_thk / 2
-        if w / b < 0.35:
-            # Narrow signal conductor
-            m = 6*h / (3*h + t)
-            quant1 = t / (4*h + t)
-            quant2 = np.pi * t / (4*(w + 1.1*t))
-            w_eff = w + t/np.pi * np.log(Er / (quant1**2 + quant2**m)**0.5)
-            quant4 = 8*h / (np.pi*w_eff)
-            quant5 = 16*h / (np.pi*w_eff)
-            quant6 = 16*h/(np.pi*w_eff)
-            z0 = 60 / Er**0.5 * \
-                np.log(1 + quant4*(quant5 + (quant6**2 + 6.27)**0.5))
-        elif w / b >= 0.35:
-            # Wide signal conductor
-            quant1 = 2*b / (b-t)
-            quant2 = b/(b-t) + 1
-            quant3 = t / (b-t)
-            quant4 = 1 / (1-t/b)**2 - 1
-            cf = quant1*(np.log(quant2) - quant3*np.log(quant4))
-            z0 = 94.15 / (Er**0.5 * (w/(b-t) + cf/np.pi))
-        return z0
+        w, Er, t, b = _as_float(self.trace_w, self.Er, self.dy, self.sub_thk)
+        h = b / 2
+        # Narrow signal conductor
+        m = 6*h / (3*h + t)
+        quant1 = t / (4*h + t)
+        quant2 = np.pi * t / (4*(w + 1.1*t))
+        w_eff = w + t/np.pi * np.log(Er / (quant1**2 + quant2**m)**0.5)
+        quant4 = 8*h / (np.pi*w_eff)
+        quant5 = 16*h / (np.pi*w_eff)
+        quant6 = 16*h/(np.pi*w_eff)
+        z0_narrow = 60 / Er**0.5 * \
+            np.log(1 + quant4*(quant5 + (quant6**2 + 6.27)**0.5))
+        # Wide signal conductor
+        quant1 = 2*b / (b-t)
+        quant2 = b/(b-t) + 1
+        quant3 = t / (b-t)
+        quant4 = 1 / (1-t/b)**2 - 1
+        cf = quant1*(np.log(quant2) - quant3*np.log(quant4))
+        z0_wide = 94.15 / (Er**0.5 * (w/(b-t) + cf/np.pi))
+        return _where(w / b < 0.35, z0_narrow, z0_wide)
 
 
 class Microstrip(FDAScenario):
@@ -333,30 +1160,31 @@ class Microstrip(FDAScenario):
     def _draw_geometry(self):
         """Draw conductor and dielectric geometries."""
         Nx = self.Nx
+        Ny = self.Ny
         tr_w = round(self.trace_w / self.dx)     # Trace width in cells
         tr_h = round(self.sub_thk / self.dy)+1   # Trace y-offset in cells
         idx1 = Nx//2-tr_w//2                     # Start idx of trace
         idx2 = idx1 + tr_w                       # End index of trace
-        self.signal_mat[-tr_h-1, idx1:idx2] = 1  # 1V applied to trace
-        self.ground_mat[-1, :] = 1               # Bottom ground plane
-        self.er_mat[-tr_h:, :] = self.Er         # Define substrate
+        trace = rectangle_mask((Ny, Nx), Ny-tr_h-1, Ny-tr_h, idx1, idx2)
+        self.signal_mat[trace] = 1               # 1V applied to trace
+        self.ground_mat[rectangle_mask((Ny, Nx), Ny-1, Ny)] = 1    # Bottom
+        self.er_mat[rectangle_mask((Ny, Nx), Ny-tr_h, Ny)] = self.Er   # Sub
 
+    @np.errstate(divide='ignore', invalid='ignore')
     def analytical_soln(self):
         """Calculate transmission line impedance using analytical formula."""
-        w = self.trace_w
-        Er = self.Er
-        h = self.sub_thk
-        if w / h < 1:
-            quant1 = 1 / (1+12*(h/w))**0.5
-            quant2 = (1 - w/h)
-            eps_eff = (Er+1)/2 + (Er-1)/2*(quant1 + 0.04*quant2**2)
-            z0 = 60 / eps_eff**0.5 * np.log(8*h/w + 0.25*w/h)
-        elif w / h >= 1:
-            quant3 = 1 + 12*h/w
-            eps_eff = (Er+1)/2 + (Er-1) / (2*quant3**0.5)
-            quant4 = w/h + 1.393 + 2/3*np.log(w/h+1.444)
-            z0 = 120 * np.pi / (eps_eff**0.5*quant4)
-        return z0
+        w, Er, h = _as_float(self.trace_w, self.Er, self.sub_thk)
+        # Narrow signal conductor
+        quant1 = 1 / (1+12*(h/w))**0.5
+        quant2 = (1 - w/h)
+        eps_eff = (Er+1)/2 + (Er-1)/2*(quant1 + 0.04*quant2**2)
+        z0_narrow = 60 / eps_eff**0.5 * np.log(8*h/w + 0.25*w/h)
+        # Wide signal conductor
+        quant3 = 1 + 12*h/w
+        eps_eff = (Er+1)/2 + (Er-1) / (2*quant3**0.5)
+        quant4 = w/h + 1.393 + 2/3*np.log(w/h+1.444)
+        z0_wide = 120 * np.pi / (eps_eff**0.5*quant4)
+        return _where(w / h < 1, z0_narrow, z0_wide)
 
 
 class Coaxial(FDAScenario):
@@ -391,15 +1219,13 @@ class Coaxial(FDAScenario):
         Ny = self.Ny
         dx = self.dx
         dy = self.dy
-        center_x = Nx // 2
-        center_y = Ny // 2
-        for i in range(Ny):
-            for j in range(Nx):
-                dist = (((i-center_y)*dy)**2 + ((j-center_x)*dx)**2)**0.5
-                if dist >= self.outer_rad:
-                    self.ground_mat[i, j] = 1
-                if dist <= self.inner_rad:
-                    self.signal_mat[i, j] = 1
+        center_x = (Nx - 1) / 2         # Center of the domain, between cells
+        center_y = (Ny - 1) / 2         # when the number of cells is even
+        center = (center_y, center_x)
+        inner = circle_mask((Ny, Nx), center, self.inner_rad, dx, dy)
+        outer = circle_mask((Ny, Nx), center, self.outer_rad, dx, dy)
+        self.ground_mat[~outer] = 1         # Everything outside outer radius
+        self.signal_mat[inner] = 1
 
     def _draw_geometry(self):
         """Draw conductor and dielectric geometries."""
@@ -412,11 +1238,10 @@ class Coaxial(FDAScenario):
         self._define_coax()                 # Create inner and outer conductors
         self.er_mat = er_mat * self.Er      # Teflon dielectric
 
+    @np.errstate(divide='ignore', invalid='ignore')
     def analytical_soln(self):
         """Calculate transmission line impedance using analytical formula."""
-        Er = self.Er
-        D = self.outer_rad  # Factor of 2 for diameter/radius cancels out
-        d = self.inner_rad
+        Er, D, d = _as_float(self.Er, self.outer_rad, self.inner_rad)
         z0 = 138 * np.log10(D/d) / Er**0.5
         return z0
 
@@ -453,23 +1278,23 @@ class AsymmetricStripline(FDAScenario):
     def _draw_geometry(self):
         """Draw conductor and dielectric geometries."""
         Nx = self.Nx
+        Ny = self.Ny
         offs = round(self.offset / self.dy)     # Trace offset in cells
         yidx = 1 + offs                         # Trace vertical start index
         tr_w = round(self.trace_w / self.dx)    # Trace width in cells
         idx1 = Nx//2-tr_w//2                    # Start idx of stripline trace
         idx2 = idx1 + tr_w                      # End index of trace
-        self.signal_mat[yidx, idx1:idx2] = 1    # 1V applied to stripline trace
-        self.ground_mat[0, :] = 1               # Top ground plane
-        self.ground_mat[-1, :] = 1              # Bottom ground plane
-        self.er_mat = self.Er * self.er_mat     # Set dielectric constant
+        trace = rectangle_mask((Ny, Nx), yidx, yidx+1, idx1, idx2)
+        self.signal_mat[trace] = 1              # 1V applied to stripline trace
+        self.ground_mat[rectangle_mask((Ny, Nx), 0, 1)] = 1    # Top ground
+        self.ground_mat[rectangle_mask((Ny, Nx), Ny-1, Ny)] = 1    # Bottom
+        self.er_mat = self.Er * np.ones((Ny, Nx))   # Set dielectric constant
 
+    @np.errstate(divide='ignore', invalid='ignore')
     def analytical_soln(self):
         """Calculate transmission line impedance using analytical formula."""
-        Er = self.Er
-        w = self.trace_w
-        t = self.dy
-        b = self.sub_thk
-        h1 = self.offset
+        Er, w, t, b, h1 = _as_float(self.Er, self.trace_w, self.dy,
+                                    self.sub_thk, self.offset)
         h2 = b - h1
         # Impedance of symmetric stripline with b = b and Er = 1
         z0_ss = self._symm_stripline(w, 1, t, b)
@@ -487,27 +1312,26 @@ class AsymmetricStripline(FDAScenario):
 
     def _symm_stripline(self, w, Er, t, b):
         """Return impedance of symmetric stripline."""
+        w, Er, t, b = _as_float(w, Er, t, b)
         h = b / 2
-        if w / b < 0.35:
-            # Narrow signal conductor
-            m = 6*h / (3*h + t)
-            quant1 = t / (4*h + t)
-            quant2 = np.pi * t / (4*(w + 1.1*t))
-            w_eff = w + t/np.pi * np.log(Er / (quant1**2 + quant2**m)**0.5)
-            quant4 = 8*h / (np.pi*w_eff)
-            quant5 = 16*h / (np.pi*w_eff)
-            quant6 = 16*h/(np.pi*w_eff)
-            z0 = 60 / Er**0.5 * \
-                np.log(1 + quant4*(quant5 + (quant6**2 + 6.27)**0.5))
-        elif w / b >= 0.35:
-            # Wide signal conductor
-            quant1 = 2*b / (b-t)
-            quant2 = b/(b-t) + 1
-            quant3 = t / (b-t)
-            quant4 = 1 / (1-t/b)**2 - 1
-            cf = quant1*(np.log(quant2) - quant3*np.log(quant4))
-            z0 = 94.15 / (Er**0.5 * (w/(b-t) + cf/np.pi))
-        return z0
+        # Narrow signal conductor
+        m = 6*h / (3*h + t)
+        quant1 = t / (4*h + t)
+        quant2 = np.pi * t / (4*(w + 1.1*t))
+        w_eff = w + t/np.pi * np.log(Er / (quant1**2 + quant2**m)**0.5)
+        quant4 = 8*h / (np.pi*w_eff)
+        quant5 = 16*h / (np.pi*w_eff)
+        quant6 = 16*h/(np.pi*w_eff)
+        z0_narrow = 60 / Er**0.5 * \
+            np.log(1 + quant4*(quant5 + (quant6**2 + 6.27)**0.5))
+        # Wide signal conductor
+        quant1 = 2*b / (b-t)
+        quant2 = b/(b-t) + 1
+        quant3 = t / (b-t)
+        quant4 = 1 / (1-t/b)**2 - 1
+        cf = quant1*(np.log(quant2) - quant3*np.log(quant4))
+        z0_wide = 94.15 / (Er**0.5 * (w/(b-t) + cf/np.pi))
+        return _where(w / b < 0.35, z0_narrow, z0_wide)
 
 
 class DifferentialMicrostrip(FDAScenario):
@@ -544,24 +1368,34 @@ class DifferentialMicrostrip(FDAScenario):
         self.er_mat = np.ones((self.Ny, self.Nx))       # Dielectric material
 
     def _draw_geometry(self):
-        """Draw conductor and dielectric geometries."""
+        """Draw conductor and dielectric geometries.
+
+        The pair is centered on the domain.  It is only mirror symmetric, and
+        solved on half the mesh, if the domain width and the spacing have
+        the same parity in cells.  Otherwise one trace sits a cell closer to
+        its side wall and the full mesh is solved.
+        """
         Nx = self.Nx
+        Ny = self.Ny
         spacing_idx = round(self.spacing / self.dx)   # Num grid cells spacing
         tr_w = round(self.trace_w / self.dx)          # Trace width in cells
         tr_h = round(self.sub_thk / self.dy)+1        # Trace y-offset in cells
-        idx1 = Nx//2-int(np.ceil(spacing_idx/2))-tr_w   # Left trace start idx
-        idx2 = idx1 + tr_w                              # Left trace stop idx
-        idx3 = Nx//2+int(np.floor(spacing_idx/2))+1   # Right microstrip trace
+        idx2 = (Nx - spacing_idx) // 2                # Left trace stop idx
+        idx1 = idx2 - tr_w                            # Left trace start idx
+        idx3 = idx2 + spacing_idx                     # Right microstrip trace
         idx4 = idx3 + tr_w                            # Right trace stop idx
+        left = rectangle_mask((Ny, Nx), Ny-tr_h-1, Ny-tr_h, idx1, idx2)
+        right = rectangle_mask((Ny, Nx), Ny-tr_h-1, Ny-tr_h, idx3, idx4)
         if self.diff_mode == 'diff':
-            self.signal_mat[-tr_h-1, idx1:idx2] = 0.5  # Pos microstrip trace
-            self.neg_mat[-tr_h-1, idx3:idx4] = -0.5    # Neg microstrip trace
+            self.signal_mat[left] = 0.5     # Pos microstrip trace
+            self.neg_mat[right] = -0.5      # Neg microstrip trace
         else:
-            self.signal_mat[-tr_h-1, idx1:idx2] = 1  # Pos microstrip trace
-            self.neg_mat[-tr_h-1, idx3:idx4] = 1     # Pos (common) voltage
-        self.ground_mat[-1, :] = 1                   # Bottom ground plane
-        self.er_mat[-tr_h:, :] = self.Er             # Define substrate
+            self.signal_mat[left] = 1       # Pos microstrip trace
+            self.neg_mat[right] = 1         # Pos (common) voltage
+        self.ground_mat[rectangle_mask((Ny, Nx), Ny-1, Ny)] = 1    # Bottom
+        self.er_mat[rectangle_mask((Ny, Nx), Ny-tr_h, Ny)] = self.Er   # Sub
 
+    @np.errstate(divide='ignore', invalid='ignore')
     def analytical_soln(self):
         """Calculate transmission line impedance using analytical formula."""
         er_eff, er_effo, er_effe, z0_surf, q4, q10 = self._calc_quantities()
@@ -580,16 +1414,10 @@ class DifferentialMicrostrip(FDAScenario):
         Dependent Characteristic of Parallel Coupled Microstrip Lines" by
         Kirschning and Jansen.
         """
-        Er = self.Er
-        w = self.trace_w
-        t = self.dy
-        h = self.sub_thk
-        s = self.spacing
-        if w/h < 1:
-            er_eff = (Er+1)/2 + (Er-1)/2 * \
-                ((w/(w+12*h))**0.5 + 0.04*(1-w/h)**2)
-        elif w/h >= 1:
-            er_eff = (Er+1)/2 + (Er-1)/2 * (w/(w+12*h))**0.5
+        Er, w, t, h, s = _as_float(self.Er, self.trace_w, self.dy,
+                                   self.sub_thk, self.spacing)
+        er_eff = (Er+1)/2 + (Er-1)/2 * \
+            ((w/(w+12*h))**0.5 + _where(w/h < 1, 0.04*(1-w/h)**2, 0))
         quant1 = t/(w*np.pi+1.1*t*np.pi)
         quant2 = 4*np.exp(1) / ((t/h)**2 + quant1**2)**0.5
         quant3 = (er_eff+1)/(2*er_eff)
@@ -663,32 +1491,38 @@ class DifferentialStripline(FDAScenario):
         self.er_mat = np.ones((self.Ny, self.Nx))       # Dielectric material
 
     def _draw_geometry(self):
-        """Draw conductor and dielectric geometries."""
+        """Draw conductor and dielectric geometries.
+
+        The pair is centered on the domain.  It is only mirror symmetric, and
+        solved on half the mesh, if the domain width and the spacing have
+        the same parity in cells.  Otherwise one trace sits a cell closer to
+        its side wall and the full mesh is solved.
+        """
         Nx = self.Nx
         Ny = self.Ny
         spacing_idx = round(self.spacing / self.dx)  # Num grid cells spacing
         tr_w = round(self.trace_w / self.dx)         # Trace width in cells
         tr_h = Ny // 2                               # Trace y-offset in cells
-        idx1 = Nx//2-int(np.ceil(spacing_idx/2))-tr_w   # Left trace start idx
-        idx2 = idx1 + tr_w                           # Left trace stop idx
-        idx3 = Nx//2+int(np.floor(spacing_idx/2))    # Right microstrip trace
+        idx2 = (Nx - spacing_idx) // 2               # Left trace stop idx
+        idx1 = idx2 - tr_w                           # Left trace start idx
+        idx3 = idx2 + spacing_idx                    # Right stripline trace
         idx4 = idx3 + tr_w                           # Right trace stop idx
+        left = rectangle_mask((Ny, Nx), tr_h, tr_h+1, idx1, idx2)
+        right = rectangle_mask((Ny, Nx), tr_h, tr_h+1, idx3, idx4)
         if self.diff_mode == 'diff':
-            self.signal_mat[tr_h, idx1:idx2] = 0.5   # Pos microstrip trace
-            self.neg_mat[tr_h, idx3:idx4] = -0.5     # Neg microstrip trace
+            self.signal_mat[left] = 0.5     # Pos stripline trace
+            self.neg_mat[right] = -0.5      # Neg stripline trace
         else:
-            self.signal_mat[tr_h, idx1:idx2] = 1     # Pos microstrip trace
-            self.neg_mat[tr_h, idx3:idx4] = 1        # Pos (common) voltage
-        self.ground_mat[0, :] = 1               # Top ground plane
-        self.ground_mat[-1, :] = 1              # Bottom ground plane
-        self.er_mat = self.Er * self.er_mat     # Set dielectric constant
+            self.signal_mat[left] = 1       # Pos stripline trace
+            self.neg_mat[right] = 1         # Pos (common) voltage
+        self.ground_mat[rectangle_mask((Ny, Nx), 0, 1)] = 1    # Top ground
+        self.ground_mat[rectangle_mask((Ny, Nx), Ny-1, Ny)] = 1    # Bottom
+        self.er_mat = self.Er * np.ones((Ny, Nx))   # Set dielectric constant
 
+    @np.errstate(divide='ignore', invalid='ignore')
     def analytical_soln(self):
         """Return impedances of finite thickness edge-coupled stripline."""
-        t = self.dy
-        b = self.sub_thk
-        s = self.spacing
-        Er = self.Er
+        t, b, s, Er = _as_float(self.dy, self.sub_thk, self.spacing, self.Er)
         z0_zero = self._zero_stripline()
         z0_finite = self._finite_stripline()
         z0_odd0, z0_even0 = self._zero_coupled_stripline()
@@ -698,61 +1532,45 @@ class DifferentialStripline(FDAScenario):
         cf_zero = q2*2*np.log(2)
         q3 = cf_finite/cf_zero
         z0_even = (z0_finite**-1 - q3*(z0_zero**-1 - z0_even0**-1))**-1
-        if s/t >= 5:
-            z0_odd = (z0_finite**-1 + q3*(z0_odd0**-1 - z0_zero**-1))**-1
-        elif s/t < 5:
-            z0_odd = (
-                z0_odd0**-1
-                + (z0_finite**-1 - z0_zero**-1)
-                - 2/self.n0*(cf_finite/(0.0885*Er) - cf_zero/(0.0885*Er))
-                + 2*t/(self.n0*s)
-            )**-1
+        z0_odd_wide = (z0_finite**-1 + q3*(z0_odd0**-1 - z0_zero**-1))**-1
+        z0_odd_narrow = (
+            z0_odd0**-1
+            + (z0_finite**-1 - z0_zero**-1)
+            - 2/self.n0*(cf_finite/(0.0885*Er) - cf_zero/(0.0885*Er))
+            + 2*t/(self.n0*s)
+        )**-1
+        z0_odd = _where(s/t >= 5, z0_odd_wide, z0_odd_narrow)
         z0_diff = 2 * z0_odd
         z0_comm = 0.5 * z0_even
         return z0_diff, z0_comm, z0_odd, z0_even
 
     def _elliptic(self, k, k_p):
         """Return approximation of elliptic integral function K/K'."""
-        if k**2 < 0.5:
-            elliptic = np.pi / np.log(2*(1+k_p**0.5)/(1-k_p**0.5))
-        elif k**2 >= 0.5:
-            elliptic = (1/np.pi)*np.log(2*(1+k**0.5)/(1-k**0.5))
-        return elliptic
+        return _where(k**2 < 0.5,
+                      np.pi / np.log(2*(1+k_p**0.5)/(1-k_p**0.5)),
+                      (1/np.pi)*np.log(2*(1+k**0.5)/(1-k**0.5)))
 
     def _zero_stripline(self):
         """Return characteristic impedance of zero thickness stripline."""
-        w = self.trace_w
-        b = self.sub_thk
-        Er = self.Er
-        if w/b < 0.35:
-            w_eff_b = w/b - (0.35-w/b)**2
-        elif w/b >= 0.35:
-            w_eff_b = w/b
+        w, b, Er = _as_float(self.trace_w, self.sub_thk, self.Er)
+        w_eff_b = w/b - _where(w/b < 0.35, (0.35-w/b)**2, 0)
         z0 = (30*np.pi/Er**0.5) * (w_eff_b + 0.441)**-1
         return z0
 
     def _finite_stripline(self):
         """Return characteristic impedance of finite thickness stripline."""
-        t = self.dy
-        b = self.sub_thk
-        w = self.trace_w
-        Er = self.Er
+        t, b, w, Er = _as_float(self.dy, self.sub_thk, self.trace_w, self.Er)
         q1 = (1-(t/b))**-1 + 1
         q2 = 1 / (1-(t/b))**2 - 1
         c_f = (2/np.pi)*np.log(q1) - (t/(np.pi*b))*np.log(q2)
-        if w/b < 0.35:
-            w_eff_b = w/b - (0.35-w/b)**2 / (1 + 12*t/b)
-        elif w/b >= 0.35:
-            w_eff_b = w/b
+        w_eff_b = w/b - _where(w/b < 0.35, (0.35-w/b)**2 / (1 + 12*t/b), 0)
         z0 = (30*np.pi/Er**0.5) * (1-t/b) / (w_eff_b + c_f)
         return z0
 
     def _zero_coupled_stripline(self):
         """Return impedances of zero thickness edge-coupled stripline."""
-        b = self.sub_thk
-        w = self.trace_w
-        s = self.spacing
-        Er = self.Er
+        b, w, s, Er = _as_float(self.sub_thk, self.trace_w, self.spacing,
+                                self.Er)
         x = np.pi*(w+s)/(2*b)
         ke = np.tanh(np.pi*w/(w*b))*np.tanh(x)
         ko = np.tanh(np.pi*w/(2*b))/np.tanh(x)
@@ -805,16 +1623,19 @@ class BroadsideStripline(FDAScenario):
         idx2 = idx1 + tr_w + 1                       # Trace horiz stop idx
         tr_h1 = Ny//2+int(np.ceil(spacing_idx/2))+1  # Bot trace vertical idx
         tr_h2 = Ny//2-int(np.floor(spacing_idx/2))   # Top trace vert idx
+        bottom = rectangle_mask((Ny, Nx), tr_h1, tr_h1+1, idx1, idx2)
+        top = rectangle_mask((Ny, Nx), tr_h2, tr_h2+1, idx1, idx2)
         if self.diff_mode == 'diff':
-            self.signal_mat[tr_h1, idx1:idx2] = 0.5  # Positive stripline trace
-            self.neg_mat[tr_h2, idx1:idx2] = -0.5    # Negative (diff) voltage
+            self.signal_mat[bottom] = 0.5   # Positive stripline trace
+            self.neg_mat[top] = -0.5        # Negative (diff) voltage
         else:
-            self.signal_mat[tr_h1, idx1:idx2] = 1  # Positive microstrip trace
-            self.neg_mat[tr_h2, idx1:idx2] = 1     # Positive (common) voltage
-        self.ground_mat[0, :] = 1               # Top ground plane
-        self.ground_mat[-1, :] = 1              # Bottom ground plane
-        self.er_mat = self.Er * self.er_mat     # Set dielectric constant
+            self.signal_mat[bottom] = 1     # Positive stripline trace
+            self.neg_mat[top] = 1           # Positive (common) voltage
+        self.ground_mat[rectangle_mask((Ny, Nx), 0, 1)] = 1    # Top ground
+        self.ground_mat[rectangle_mask((Ny, Nx), Ny-1, Ny)] = 1    # Bottom
+        self.er_mat = self.Er * np.ones((Ny, Nx))   # Set dielectric constant
 
+    @np.errstate(divide='ignore', invalid='ignore')
     def analytical_soln(self):
         """Calculate quantities used in broadside stripline.
 
@@ -822,17 +1643,14 @@ class BroadsideStripline(FDAScenario):
         broadside-coupled striplines and millimeter-wave suspended substrate
         microstrip lines.
         """
-        s = self.spacing
-        b = self.sub_thk
-        Er = self.Er
+        s, b, Er = _as_float(self.spacing, self.sub_thk, self.Er)
         z0_a, delta_z0_a = self._calc_quantities()
         z0_odd = (z0_a-delta_z0_a)/Er**0.5
         k = np.tanh(293.9*s/b/(z0_odd * Er**0.5))
         k_p = (1-k**2)**0.5
-        if k**2 < 0.5:
-            elliptic = np.pi / np.log(2*(1+k_p**0.5)/(1-k_p**0.5))
-        elif k**2 >= 0.5:
-            elliptic = (1/np.pi)*np.log(2*(1+k**0.5)/(1-k**0.5))
+        elliptic = _where(k**2 < 0.5,
+                          np.pi / np.log(2*(1+k_p**0.5)/(1-k_p**0.5)),
+                          (1/np.pi)*np.log(2*(1+k**0.5)/(1-k**0.5)))
         z0_even = 60*np.pi/(Er**0.5*elliptic)
         z0_diff = 2 * z0_odd
         z0_comm = 0.5 * z0_even
@@ -840,21 +1658,40 @@ class BroadsideStripline(FDAScenario):
 
     def _calc_quantities(self):
         """Calculate quantities used in broadside striplines."""
-        s = self.spacing
-        b = self.sub_thk
-        w = self.trace_w
+        s, b, w = _as_float(self.spacing, self.sub_thk, self.trace_w)
         z0_a = self.n0 / (2*np.pi) * np.log(3*s/w + ((s/w)**2+1)**0.5)
         P = 270*(1-np.tanh(0.28+1.2*((b-s)/s)**0.5))
         quant1 = 0.48*(2*w/s-1)**0.5
         quant2 = (1+(b-s)/s)**2
         Q = 1 - np.arctanh(quant1/quant2)
-        if w/s < 0.5:
-            delta_z0_a = P
-        elif w/s >= 0.5:
-            delta_z0_a = P*Q
+        delta_z0_a = _where(w/s < 0.5, P, P*Q)
         return z0_a, delta_z0_a
 
 
+# %% Functions
+def _as_float(*values):
+    """Return scalar or array parameters of formulas as float arrays."""
+    return [np.asarray(value, dtype=float) for value in values]
+
+
+def _where(condition, x, y):
+    """Return formula branch x where condition holds and y elsewhere.
+
+    Both branches are evaluated over the whole array, and scalar inputs
+    return a scalar.
+    """
+    return np.where(condition, x, y)[()]
+
+
+def _run_lines(scenario_class, params, settings, lines):
+    """Return run_sim results of a scenario solved on (rows, cols) lines."""
+    scenario = scenario_class(**params)
+    scenario.apply_settings(settings)
+    scenario.solve_lines = lines
+    scenario.store_fields = False
+    return scenario._run_once()
+
+
 fda_scenario_list = (SymmetricStripline, Microstrip, Coaxial,
                      AsymmetricStripline, DifferentialMicrostrip,
                      BroadsideStripline, DifferentialStripline)
@@ -0,0 +1,484 @@
+"""Contains linear solver backends used for FDA of transmission lines."""
+# %% Imports
+# Standard system imports
+import inspect
+import warnings
+
+# Related third party imports
+import numpy as np
+from numba import njit
+from scipy import sparse
+from scipy.linalg import cho_factor, cho_solve
+from scipy.sparse.linalg import LinearOperator, bicgstab, cg, splu
+
+# Local application/library specific imports
+
+
+# %% Globals
+# SciPy 1.12 renamed the relative tolerance keyword of its Krylov solvers
+_TOL_KWARG = 'rtol' if 'rtol' in inspect.signature(cg).parameters else 'tol'
+krylov_methods = {'cg': cg, 'bicgstab': bicgstab}
+precisions = ('double', 'mixed', 'single')
+single_tol = 1e-5           # Relative residual reachable in single precision
+max_refinements = 10        # Iterative refinements of mixed precision solves
+residual_block_rows = 65536  # Single precision rows upcast per residual
+
+
+# %% Functions
+@njit(cache=True)
+def _ic0_factor(indptr, indices, data):
+    """Compute IC(0) factor values in place on CSR lower triangle of matrix.
+
+    Column indices of each row must be sorted with the diagonal entry last.
+    """
+    n = indptr.size - 1
+    for i in range(n):
+        row_start = indptr[i]
+        row_end = indptr[i+1]
+        for p in range(row_start, row_end - 1):
+            k = indices[p]
+            # Dot product of rows i and k over columns less than k
+            total = data[p]
+            p_i = row_start
+            p_k = indptr[k]
+            while p_i < p and p_k < indptr[k+1] - 1:
+                if indices[p_i] == indices[p_k]:
+                    total -= data[p_i] * data[p_k]
+                    p_i += 1
+                    p_k += 1
+                elif indices[p_i] < indices[p_k]:
+                    p_i += 1
+                else:
+                    p_k += 1
+            data[p] = total / data[indptr[k+1] - 1]
+        total = data[row_end - 1]
+        for p in range(row_start, row_end - 1):
+            total -= data[p] ** 2
+        if total <= 0:
+            raise ValueError('Incomplete Cholesky factorization broke down.')
+        data[row_end - 1] = np.sqrt(total)
+
+
+@njit(cache=True)
+def _ic0_solve(indptr, indices, data, rhs):
+    """Solve L L^T x = rhs given the IC(0) factor L stored in CSR format."""
+    n = rhs.size
+    y = np.empty_like(rhs)
+    for i in range(n):
+        # Forward substitution, diagonal entry is last in each row
+        total = rhs[i]
+        for p in range(indptr[i], indptr[i+1] - 1):
+            total -= data[p] * y[indices[p]]
+        y[i] = total / data[indptr[i+1] - 1]
+    for i in range(n - 1, -1, -1):
+        # Backward substitution, rows of L are columns of L^T
+        y[i] /= data[indptr[i+1] - 1]
+        for p in range(indptr[i], indptr[i+1] - 1):
+            y[indices[p]] -= data[p] * y[i]
+    return y
+
+
+def incomplete_cholesky(matrix):
+    """Return zero fill-in incomplete Cholesky factor of an SPD matrix."""
+    lower = sparse.tril(matrix, format='csr')
+    lower.sort_indices()
+    factor = lower.data.astype(np.result_type(lower.data, np.float32))
+    _ic0_factor(lower.indptr, lower.indices, factor)
+    return lower.indptr, lower.indices, factor
+
+
+def make_preconditioner(matrix, preconditioner=None, grid=None):
+    """Return a preconditioner for a Krylov solver as a LinearOperator.
+
+    Supported preconditioners are 'jacobi' (inverse of the diagonal), 'ic'
+    (zero fill-in incomplete Cholesky factorization), and 'multigrid' (one
+    V-cycle per application).  The multigrid preconditioner requires grid, a
+    tuple of the (Ny, Nx) grid shape and the indices of the free cells.
+    """
+    if preconditioner is None:
+        return None
+    if preconditioner == 'jacobi':
+        inv_diag = 1 / matrix.diagonal()
+        return LinearOperator(matrix.shape, matvec=lambda x: inv_diag * x,
+                              dtype=matrix.dtype)
+    if preconditioner == 'ic':
+        indptr, indices, factor = incomplete_cholesky(matrix)
+        return LinearOperator(
+            matrix.shape, dtype=matrix.dtype,
+            matvec=lambda x: _ic0_solve(indptr, indices, factor,
+                                        np.ravel(x).astype(factor.dtype)))
+    if preconditioner == 'multigrid':
+        if grid is None:
+            raise ValueError('Multigrid preconditioner requires grid shape.')
+        mg = MultigridSolver(matrix, *grid)
+        return LinearOperator(
+            matrix.shape, dtype=matrix.dtype,
+            matvec=lambda x: mg.vcycle(
+                np.ravel(x), np.zeros(matrix.shape[0], matrix.dtype)))
+    raise ValueError(f"Unknown preconditioner '{preconditioner}'.")
+
+
+def relative_residual(matrix, x, rhs):
+    """Return the residual norm of a solution relative to the rhs norm."""
+    residual = np.linalg.norm(rhs - matrix @ x)
+    rhs_norm = np.linalg.norm(rhs)
+    if rhs_norm > 0:
+        residual /= rhs_norm
+    return float(residual)
+
+
+def iterations_saved(info):
+    """Return estimated iterations saved by an initial guess.
+
+    Assumes the residual fell by the same factor every iteration, so the
+    iterations needed from the cold start residual follow from the observed
+    convergence factor.  Guesses that already meet the tolerance report no
+    savings since no convergence factor is observed.
+    """
+    iterations = info['iterations']
+    initial = info['initial_residual']
+    final = info['residual']
+    if iterations == 0 or not 0 < final < initial:
+        return 0
+    cold = iterations * np.log(final / info['cold_residual']) / \
+        np.log(final / initial)
+    return int(round(cold)) - iterations
+
+
+def combine_info(infos):
+    """Return information about several solves combined into one dict.
+
+    Iteration counts are summed, residuals maximized, and the solves only
+    converged if all of them did.
+    """
+    info = dict(infos[0])
+    for key in ('iterations', 'iterations_saved'):
+        if key in info:
+            info[key] = sum(i.get(key, 0) for i in infos)
+    for key in ('residual', 'initial_residual', 'cold_residual'):
+        if key in info:
+            info[key] = max(i.get(key, 0) for i in infos)
+    if 'converged' in info:
+        info['converged'] = all(i.get('converged', True) for i in infos)
+    return info
+
+
+def krylov_solve(matrix, rhs, method='cg', M=None, tol=1e-8, maxiter=None,
+                 x0=None):
+    """Solve a sparse system with a preconditioned Krylov method.
+
+    M is a preconditioner returned by make_preconditioner.  Returns the
+    solution and a dict containing the iteration count and the relative
+    residuals of the initial guess, of a cold (zero) start, and of the
+    solution.
+    """
+    if method not in krylov_methods:
+        raise ValueError(f"Unknown Krylov method '{method}'.")
+    initial_residual = 1.0
+    if x0 is not None:
+        initial_residual = relative_residual(matrix, x0, rhs)
+    iterations = 0
+
+    def count_iterations(_):
+        nonlocal iterations
+        iterations += 1
+
+    kwargs = {_TOL_KWARG: tol, 'atol': 0.0}
+    x, status = krylov_methods[method](matrix, rhs, x0=x0, maxiter=maxiter,
+                                       M=M, callback=count_iterations,
+                                       **kwargs)
+    residual = relative_residual(matrix, x, rhs)
+    if status != 0:
+        warnings.warn(f"{method} did not converge after {iterations} "
+                      f"iterations (relative residual {residual:.3g}).")
+    info = {'method': method, 'iterations': iterations, 'residual': residual,
+            'converged': status == 0, 'initial_residual': initial_residual,
+            'cold_residual': 1.0}
+    return x, info
+
+
+def multigrid_solve(mg, rhs, tol=1e-8, maxiter=None, x0=None):
+    """Solve a sparse FDA system with multigrid V-cycles.
+
+    mg is the MultigridSolver hierarchy of the system.  Starts from a full
+    multigrid (FMG) estimate, or from the initial guess x0 if it has a lower
+    residual.  Returns the solution and a dict containing the number of
+    V-cycles and the relative residuals of the starting point, of the FMG
+    (cold) start, and of the solution.  Using the V-cycle as a preconditioner
+    of cg takes fewer cycles and is usually the faster of the two.
+    """
+    matrix = mg.matrix
+    if maxiter is None:
+        maxiter = 100
+    x = mg.full_multigrid(rhs)
+    cold_residual = residual = relative_residual(matrix, x, rhs)
+    if x0 is not None:
+        guess_residual = relative_residual(matrix, x0, rhs)
+        if guess_residual < residual:
+            x = np.array(x0, dtype=float)
+            residual = guess_residual
+    initial_residual = residual
+    cycles = 0
+    while residual > tol and cycles < maxiter:
+        x = mg.vcycle(rhs, x)
+        residual = relative_residual(matrix, x, rhs)
+        cycles += 1
+    if residual > tol:
+        warnings.warn(f"multigrid did not converge after {cycles} V-cycles "
+                      f"(relative residual {residual:.3g}).")
+    info = {'method': 'multigrid', 'levels': len(mg.levels) + 1,
+            'iterations': cycles, 'residual': residual,
+            'converged': residual <= tol, 'initial_residual': initial_residual,
+            'cold_residual': cold_residual}
+    return x, info
+
+
+def _interpolation_1d(n):
+    """Return linear interpolation matrix from every other node of n nodes.
+
+    The last node is always a coarse node, so both ends of the grid, where
+    the domain boundary conditions apply, are kept on every level.
+    """
+    n_coarse = n // 2 + 1
+    fine = np.arange(n)
+    coincident = (fine % 2 == 0) | (fine == n - 1)
+    odd = np.flatnonzero(~coincident)
+    # Coarse nodes copy to their fine nodes and odd nodes average neighbors
+    rows = np.concatenate((fine[coincident], odd, odd))
+    cols = np.concatenate((np.arange(n_coarse), odd // 2, odd // 2 + 1))
+    vals = np.concatenate((np.ones(n_coarse), np.full(2 * odd.size, 0.5)))
+    return sparse.csr_matrix((vals, (rows, cols)), shape=(n, n_coarse))
+
+
+def _color_rows(matrix, cells, Nx):
+    """Return (indices, matrix rows, inverse diagonal) of each cell color.
+
+    cells are the flat grid indices of the unknowns on a grid Nx cells wide.
+    Colors are the four combinations of row and column parity.
+    """
+    color = 2 * (cells // Nx % 2) + cells % Nx % 2
+    inv_diag = 1 / matrix.diagonal()
+    colors = []
+    for c in range(4):
+        idx = np.flatnonzero(color == c)
+        if idx.size:
+            colors.append((idx, matrix[idx], inv_diag[idx]))
+    return colors
+
+
+# %% Classes
+class MultigridSolver:
+    """Geometric multigrid hierarchy for FDA systems on rectilinear grids.
+
+    Unknowns are the free (non-conductor) cells of an (Ny, Nx) grid.  Coarse
+    grids take every other row and column plus the last ones, and drop nodes
+    that lie on conductors.  Prolongation is bilinear interpolation between
+    the remaining nodes, so corrections fall to zero at conductors, and
+    coarse operators are formed by the Galerkin product.
+    The smoother is four-color Gauss-Seidel: cells are colored by the parity
+    of their row and column, which decouples every color of the 5-point fine
+    and 9-point coarse stencils.  Colors are swept in reverse order after
+    coarse grid correction, so a V-cycle stays symmetric for use as a CG
+    preconditioner.
+    """
+
+    def __init__(self, matrix, shape, free, min_size=1000, smooth_steps=2):
+        """Build the grid hierarchy and factor the coarsest level."""
+        self.smooth_steps = smooth_steps
+        self.levels = []
+        self.matrix = sparse.csr_matrix(matrix)
+        matrix = self.matrix
+        Ny, Nx = shape
+        keep = np.asarray(free)
+        while matrix.shape[0] > min_size and min(Ny, Nx) > 2:
+            prolong = sparse.kron(_interpolation_1d(Ny), _interpolation_1d(Nx),
+                                  format='csr')[keep].astype(matrix.dtype)
+            self.levels.append({'A': matrix,
+                                'colors': _color_rows(matrix, keep, Nx)})
+            # Coarse nodes on conductor cells are fixed at zero correction
+            is_free = np.zeros(Ny * Nx, dtype=bool)
+            is_free[keep] = True
+            rows = np.minimum(np.arange(Ny // 2 + 1) * 2, Ny - 1)
+            cols = np.minimum(np.arange(Nx // 2 + 1) * 2, Nx - 1)
+            keep = np.flatnonzero(is_free[np.add.outer(rows * Nx, cols)])
+            prolong = prolong[:, keep].tocsr()
+            self.levels[-1].update({'P': prolong, 'R': prolong.T.tocsr()})
+            matrix = (prolong.T @ matrix @ prolong).tocsr()
+            Ny = Ny // 2 + 1
+            Nx = Nx // 2 + 1
+        self.coarse_solve = splu(matrix.tocsc()).solve
+
+    def _smooth(self, level, rhs, x, reverse=False):
+        """Apply multicolor Gauss-Seidel sweeps."""
+        x = np.array(x, dtype=level['A'].dtype)
+        colors = level['colors'][::-1] if reverse else level['colors']
+        for _ in range(self.smooth_steps):
+            for idx, rows, inv_diag in colors:
+                x[idx] += inv_diag * (rhs[idx] - rows @ x)
+        return x
+
+    def vcycle(self, rhs, x, depth=0):
+        """Return the result of one V-cycle starting from guess x."""
+        if depth == len(self.levels):
+            return self.coarse_solve(rhs)
+        level = self.levels[depth]
+        x = self._smooth(level, rhs, x)
+        residual = level['R'] @ (rhs - level['A'] @ x)
+        correction = self.vcycle(residual, np.zeros_like(residual), depth+1)
+        x = x + level['P'] @ correction
+        return self._smooth(level, rhs, x, reverse=True)
+
+    def full_multigrid(self, rhs, depth=0):
+        """Return full multigrid estimate of the solution."""
+        if depth == len(self.levels):
+            return self.coarse_solve(rhs)
+        level = self.levels[depth]
+        coarse = self.full_multigrid(level['R'] @ rhs, depth+1)
+        return self.vcycle(rhs, level['P'] @ coarse, depth)
+
+
+class FDASystem:
+    """FDA equations with the known conductor potentials eliminated.
+
+    The free cells are coupled by a symmetric positive definite matrix which
+    is factored (direct solvers) or preconditioned (iterative solvers) once on
+    creation.  Any number of excitations that share the conductor geometry
+    can then be solved as additional right-hand sides.
+
+    With 'mixed' or 'single' precision, the factor or preconditioner and the
+    matrix used by the solver are stored in float32.  Mixed precision solves
+    then correct the solution by iterative refinement, with residuals
+    computed from the float64 matrix, until they meet tol.  Mixed precision
+    keeps both matrices, so it uses about half again the operator memory of
+    double precision.  Single precision solves stop after the first solve
+    and keep only the float32 matrix, whose rows are upcast a block at a time
+    to report the float64 residual, so matrix is None.
+    """
+
+    def __init__(self, laplacian_mat, fixed, shape, solver='sparse',
+                 preconditioner='ic', tol=1e-8, maxiter=None,
+                 precision='double'):
+        """Eliminate conductor cells and factor the reduced matrix."""
+        if precision not in precisions:
+            raise ValueError(f"Unknown FDA precision '{precision}'.")
+        self.free = np.flatnonzero(~fixed)
+        self.known = np.flatnonzero(fixed)
+        self.solver = solver
+        self.preconditioner = preconditioner
+        self.tol = tol
+        self.maxiter = maxiter
+        self.precision = precision
+        free_rows = sparse.csr_matrix(laplacian_mat)[self.free]
+        # Negate the Laplacian so that the reduced matrix is positive definite
+        self.matrix = -free_rows[:, self.free].tocsr()
+        self.coupling = free_rows[:, self.known].tocsr()
+        if precision == 'double':
+            self.work_matrix = self.matrix
+        else:
+            self.work_matrix = self.matrix.astype(np.float32)
+        if precision == 'single':
+            self.matrix = None
+        work_matrix = self.work_matrix
+        if solver == 'dense':
+            self.factor = cho_factor(work_matrix.toarray())
+        elif solver == 'sparse':
+            self.factor = splu(work_matrix.tocsc())
+        elif solver in krylov_methods:
+            self.factor = make_preconditioner(work_matrix, preconditioner,
+                                              (shape, self.free))
+        elif solver == 'multigrid':
+            self.factor = MultigridSolver(work_matrix, shape, self.free)
+        else:
+            raise ValueError(f"Unknown FDA solver '{solver}'.")
+
+    def solve(self, b_mat, x0=None):
+        """Return voltages for one or more excitations.
+
+        b_mat holds the potentials forced on the conductor cells, either as a
+        vector or with one excitation per column.  x0 is an optional initial
+        guess of the voltages, of the same shape, used by iterative solvers.
+        Also returns a dict of information about the solve.  Iteration counts
+        are summed and residuals maximized over the excitations.  Given x0,
+        the dict also estimates the iterations it saved over a cold start.
+        Reduced precision solves report the float64 relative residual of the
+        solution and the number of refinements.
+        """
+        rhs = self.coupling @ b_mat[self.known]
+        if x0 is not None:
+            x0 = np.reshape(x0, (b_mat.shape[0], -1))[self.free]
+        if self.precision == 'double':
+            x, info = self._solve_rhs(rhs, x0, self.tol)
+        else:
+            x, info = self._solve_refined(rhs, x0)
+        voltages = np.array(b_mat, dtype=float)
+        voltages[self.free] = x
+        return voltages, info
+
+    def _solve_rhs(self, rhs, x0, tol):
+        """Solve right-hand sides in the precision of the work matrix."""
+        rhs = rhs.astype(self.work_matrix.dtype, copy=False)
+        if self.solver == 'dense':
+            return cho_solve(self.factor, rhs), {'method': 'dense'}
+        if self.solver == 'sparse':
+            return self.factor.solve(rhs), {'method': 'sparse'}
+        return self._solve_iterative(rhs, x0, tol)
+
+    def _solve_refined(self, rhs, x0=None):
+        """Solve in float32 and refine the solution with float64 residuals."""
+        columns = rhs.reshape((rhs.shape[0], -1))
+        x = np.zeros(columns.shape) if x0 is None else np.array(x0, float)
+        norms = np.linalg.norm(columns, axis=0)
+        norms[norms == 0] = 1
+        tol = self.tol if self.precision == 'mixed' else single_tol
+        infos = []
+        for _ in range(max_refinements + 1):
+            residuals = self._residuals(columns, x)
+            residual = np.max(np.linalg.norm(residuals, axis=0) / norms)
+            if residual <= tol or (self.precision == 'single' and infos):
+                break
+            correction, info = self._solve_rhs(residuals, None,
+                                               max(self.tol, single_tol))
+            x += correction.reshape(columns.shape)
+            infos.append(info)
+        if residual > tol:
+            warnings.warn(f"{self.precision} precision solve reached a "
+                          f"relative residual of {residual:.3g}.")
+        info = combine_info(infos) if infos else {'method': self.solver}
+        info.update({'precision': self.precision, 'residual': float(residual),
+                     'refinements': max(len(infos) - 1, 0),
+                     'converged': bool(residual <= tol)})
+        return x.reshape(rhs.shape), info
+
+    def _residuals(self, columns, x):
+        """Return float64 residuals of solutions x of right-hand sides."""
+        if self.matrix is not None:
+            return columns - self.matrix @ x
+        residuals = np.empty(columns.shape)
+        for start in range(0, columns.shape[0], residual_block_rows):
+            stop = start + residual_block_rows
+            block = self.work_matrix[start:stop].astype(np.float64)
+            residuals[start:stop] = columns[start:stop] - block @ x
+        return residuals
+
+    def _solve_iterative(self, rhs, x0=None, tol=None):
+        """Solve each column of the right-hand side iteratively."""
+        columns = rhs.reshape((rhs.shape[0], -1))
+        tol = self.tol if tol is None else tol
+        x = np.empty(columns.shape, dtype=columns.dtype)
+        infos = []
+        for k in range(columns.shape[1]):
+            guess = None if x0 is None else x0[:, k]
+            if self.solver == 'multigrid':
+                x[:, k], info = multigrid_solve(
+                    self.factor, columns[:, k], tol=tol,
+                    maxiter=self.maxiter, x0=guess)
+            else:
+                x[:, k], info = krylov_solve(
+                    self.work_matrix, columns[:, k], method=self.solver,
+                    M=self.factor, tol=tol, maxiter=self.maxiter,
+                    x0=guess)
+                info['preconditioner'] = self.preconditioner
+            if x0 is not None:
+                info['iterations_saved'] = iterations_saved(info)
+            infos.append(info)
+        return x.reshape(rhs.shape), combine_info(infos)
@@ -0,0 +1,244 @@
+"""Interpolating surrogate models of FDA results for instant lookups."""
+# %% Imports
+# Standard system imports
+import json
+from pathlib import Path
+
+# Related third party imports
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+# Local application/library specific imports
+from pycem.fda_scenarios import fda_scenario_list
+from pycem.fda_sweep import parameter_grid, result_fields, sweep
+from pycem.utilities import get_project_root
+
+
+# %% Globals
+scenario_classes = {scenario_class.name: scenario_class
+                    for scenario_class in fda_scenario_list}
+# Surrogates loaded by the webapp
+webapp_surrogates = get_project_root() / 'src/webapp/surrogates'
+
+
+# %% Classes
+class Surrogate:
+    """Tensor-product spline of run_sim results over a box of parameters.
+
+    axes maps each swept __init__ argument to its increasing grid values,
+    and values holds the run_sim results at every grid point, with one
+    trailing axis for the results.  Other __init__ arguments take their
+    fixed values, or their defaults.  Only points inside the box with the
+    fixed arguments are trusted; errors holds the largest relative error of
+    each result found at held-out points.
+    """
+
+    def __init__(self, scenario_class, axes, values, fixed=None,
+                 settings=None, errors=None, method='cubic'):
+        """Fit interpolating spline to results on a grid of parameters."""
+        self.scenario_class = scenario_class
+        self.axes = {name: np.asarray(grid, dtype=float)
+                     for name, grid in axes.items()}
+        self.values = np.asarray(values, dtype=float)
+        self.fixed = dict(fixed or {})
+        self.settings = dict(settings or {})
+        self.errors = None if errors is None else np.asarray(errors)
+        self.fields = result_fields(scenario_class)
+        self._defaults = scenario_class().get_params()
+        # Cubic splines need at least four points along every axis
+        if min(grid.size for grid in self.axes.values()) < 4:
+            method = 'linear'
+        self.method = method
+        # Spline fits converge to an absolute tolerance, so results as small
+        # as capacitances are interpolated relative to their largest value
+        scale = np.abs(self.values).reshape((-1, len(self.fields))).max(axis=0)
+        self._scale = np.where(scale > 0, scale, 1)
+        self._interpolator = RegularGridInterpolator(
+            tuple(self.axes.values()), self.values / self._scale,
+            method=method)
+
+    @classmethod
+    def build(cls, scenario_class, box, num_points=5, fixed=None,
+              settings=None, num_holdout=8, max_workers=None, seed=0):
+        """Sweep a box of parameters and fit a surrogate to the results.
+
+        box maps __init__ arguments to (low, high) bounds, each sampled at
+        num_points evenly spaced values, and fixed holds values of other
+        arguments.  The results at num_holdout random points of the box are
+        also simulated to estimate the errors of the surrogate.
+        """
+        axes = {name: np.linspace(low, high, num_points)
+                for name, (low, high) in box.items()}
+        grid = [dict(fixed or {}, **params)
+                for params in parameter_grid(**axes)]
+        table = sweep(scenario_class, grid, settings, max_workers)
+        fields = result_fields(scenario_class)
+        shape = tuple(grid.size for grid in axes.values())
+        values = np.stack([table[field] for field in fields],
+                          axis=-1).reshape(shape + (len(fields),))
+        surrogate = cls(scenario_class, axes, values, fixed, settings)
+        if num_holdout:
+            rng = np.random.default_rng(seed)
+            holdout = [dict(fixed or {}, **{
+                name: rng.uniform(low, high) for name, (low, high)
+                in box.items()}) for _ in range(num_holdout)]
+            surrogate.validate(sweep(scenario_class, holdout, settings,
+                                     max_workers))
+        return surrogate
+
+    def validate(self, table):
+        """Set errors from a sweep table of simulated points in the box."""
+        params = {name: table[name] for name in self.axes}
+        predicted = self.predict(fallback=False, **params)
+        self.errors = np.array([
+            np.max(np.abs(pred / table[field] - 1))
+            for field, pred in zip(self.fields, predicted)])
+        return dict(zip(self.fields, self.errors))
+
+    def trusted(self, **params):
+        """Return whether parameters lie inside the box of the surrogate.
+
+        Parameters are scalars or arrays of __init__ arguments, and any that
+        were not swept must match the fixed values used to build it.
+        """
+        self._check_params(params)
+        inside = True
+        for name, value in params.items():
+            inside = inside & self._inside(name, value)
+        return inside
+
+    def explain(self, **params):
+        """Return why scalar parameters are not trusted, or '' if they are."""
+        self._check_params(params)
+        reasons = []
+        for name, value in params.items():
+            if self._inside(name, value):
+                continue
+            if name in self.axes:
+                grid = self.axes[name]
+                reasons.append(f"{name} must lie in [{grid[0]:.4g}, "
+                               f"{grid[-1]:.4g}]")
+            else:
+                reasons.append(f"{name} must be {self._expected(name):.4g}")
+        return '; '.join(reasons)
+
+    def _check_params(self, params):
+        """Raise ValueError for missing swept or unknown parameters."""
+        missing = set(self.axes) - set(params)
+        if missing:
+            raise ValueError(f"Surrogate requires parameters "
+                             f"{sorted(missing)}.")
+        unknown = set(params) - set(self._defaults)
+        if unknown:
+            raise ValueError(f"{self.scenario_class.name} has no parameters "
+                             f"{sorted(unknown)}.")
+
+    def _expected(self, name):
+        """Return value of an argument that was not swept."""
+        return self.fixed.get(name, self._defaults.get(name))
+
+    def _inside(self, name, value):
+        """Return whether values of one parameter are trusted."""
+        value = np.asarray(value, dtype=float)
+        if name in self.axes:
+            grid = self.axes[name]
+            return (value >= grid[0]) & (value <= grid[-1])
+        return np.isclose(value, self._expected(name), rtol=1e-9, atol=0)
+
+    def predict(self, fallback=True, **params):
+        """Return run_sim results interpolated at scalars or arrays of params.
+
+        Results of untrusted points are simulated in full if fallback is set
+        and are nan otherwise.  Returns a tuple ordered like run_sim.
+        """
+        trusted = self.trusted(**params)
+        arrays = np.broadcast_arrays(trusted, *[
+            np.asarray(value, dtype=float) for value in params.values()])
+        trusted, arrays = arrays[0], dict(zip(params, arrays[1:]))
+        points = np.stack([arrays[name][trusted] for name in self.axes],
+                          axis=-1)
+        results = np.full(trusted.shape + (len(self.fields),), np.nan)
+        results[trusted] = self._interpolator(points) * self._scale
+        if fallback:
+            for idx in map(tuple, np.argwhere(~trusted)):
+                point = {name: float(array[idx])
+                         for name, array in arrays.items()}
+                results[idx] = self._simulate(point)
+        return tuple(results[..., k][()] for k in range(len(self.fields)))
+
+    def _simulate(self, params):
+        """Return run_sim results of a full solve at a single point."""
+        scenario = self.scenario_class(**dict(self.fixed, **params))
+        scenario.store_fields = False
+        scenario.apply_settings(self.settings)
+        return scenario.run_sim()
+
+    def save(self, path):
+        """Save surrogate to a NumPy archive."""
+        header = {'scenario': self.scenario_class.name,
+                  'axes': list(self.axes), 'fixed': self.fixed,
+                  'settings': self.settings, 'method': self.method}
+        arrays = {f'axis_{name}': grid for name, grid in self.axes.items()}
+        if self.errors is not None:
+            arrays['errors'] = self.errors
+        with open(path, 'wb') as fh:
+            np.savez(fh, header=json.dumps(header), values=self.values,
+                     **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Return surrogate saved to a NumPy archive."""
+        with np.load(path) as data:
+            header = json.loads(str(data['header']))
+            axes = {name: data[f'axis_{name}'] for name in header['axes']}
+            errors = data['errors'] if 'errors' in data.files else None
+            return cls(scenario_classes[header['scenario']], axes,
+                       data['values'], header['fixed'], header['settings'],
+                       errors, header['method'])
+
+
+# %% Functions
+def load_surrogates(path):
+    """Return surrogates saved in a directory keyed by scenario name.
+
+    Each archive is named after the scenario it models.  A missing directory
+    holds no surrogates.
+    """
+    return {file.stem: Surrogate.load(file)
+            for file in sorted(Path(path).glob('*.npz'))}
+
+
+def default_box(scenario_class, scale=0.5):
+    """Return box of the geometry arguments within scale of their defaults.
+
+    The mesh arguments dx and dy are left at their defaults.
+    """
+    params = scenario_class().get_params()
+    return {name: ((1 - scale) * value, (1 + scale) * value)
+            for name, value in params.items() if name not in ('dx', 'dy')}
+
+
+def build_surrogates(path, scenario_list=fda_scenario_list, scale=0.5,
+                     num_points=5, num_holdout=8, max_workers=None):
+    """Build a surrogate of each scenario over its default box and save it.
+
+    Archives are named after their scenarios, as load_surrogates expects.
+    Returns the surrogates keyed by scenario name.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    surrogates = {}
+    for scenario_class in scenario_list:
+        surrogate = Surrogate.build(scenario_class,
+                                    default_box(scenario_class, scale),
+                                    num_points, num_holdout=num_holdout,
+                                    max_workers=max_workers)
+        surrogate.save(path / f'{scenario_class.name}.npz')
+        surrogates[scenario_class.name] = surrogate
+    return surrogates
+
+
+if __name__ == '__main__':
+    for name, surrogate in build_surrogates(webapp_surrogates).items():
+        print(f'{name:>24}: max held-out error '
+              f'{100 * np.max(surrogate.errors):.2f}%')
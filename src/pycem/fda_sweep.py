@@ -0,0 +1,159 @@
+"""Sweep geometry parameters of FDA scenarios across a process pool."""
+# %% Imports
+# Standard system imports
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import inspect
+import itertools
+import os
+
+# Related third party imports
+import numpy as np
+
+# Local application/library specific imports
+
+
+# %% Globals
+single_fields = ('C', 'L', 'z0')
+diff_fields = ('diff_C', 'diff_L', 'diff_z0', 'comm_C', 'comm_L', 'comm_z0',
+               'odd_z0', 'even_z0')
+info_fields = ('iterations', 'iterations_saved')
+analytical_fields = ('diff_z0', 'comm_z0', 'odd_z0', 'even_z0')
+
+
+# %% Functions
+def parameter_grid(**params):
+    """Return list of parameter dicts for every combination of the values."""
+    names = list(params)
+    return [dict(zip(names, values))
+            for values in itertools.product(*params.values())]
+
+
+def result_fields(scenario_class):
+    """Return names of the run_sim results of a scenario class."""
+    if scenario_class().differential:
+        return diff_fields
+    return single_fields
+
+
+def run_point(scenario_class, params, settings=None):
+    """Run the simulation of a single sweep point and return its results."""
+    return run_chain(scenario_class, [params], settings)[0]
+
+
+def run_chain(scenario_class, chain, settings=None, warm_start=False):
+    """Run sweep points in order and return (results, solver_info) of each.
+
+    With warm_start, each point starts its iterative solve from the voltages
+    of the previous point.
+    """
+    return list(_iter_chain(scenario_class, chain, settings, warm_start))
+
+
+def iter_sweep(scenario_class, grid, settings=None, max_workers=None,
+               warm_start=False):
+    """Yield (index, params, results, solver_info) of each sweep point.
+
+    Keys of each parameter dict must be arguments of the scenario __init__,
+    and settings is a dict of solver attributes named in FDAScenario.settings
+    (e.g. solver, tol) applied to every point.  Points are yielded as they
+    complete.  A max_workers of 1 runs the points serially in this process.
+    With warm_start, the grid is split into one contiguous chain per worker,
+    and neighboring points of a chain are warm-started from each other, so
+    they are yielded a chain at a time.
+    """
+    _check_params(scenario_class, grid, settings)
+    if max_workers == 1:
+        for idx, (results, info) in enumerate(
+                _iter_chain(scenario_class, grid, settings, warm_start)):
+            yield idx, grid[idx], results, info
+        return
+    if warm_start:
+        num_chains = min(len(grid), max_workers or os.cpu_count() or 1)
+    else:
+        num_chains = len(grid)
+    chains = np.array_split(np.arange(len(grid)), num_chains)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_chain, scenario_class,
+                                   [grid[idx] for idx in chain], settings,
+                                   warm_start): chain
+                   for chain in chains if chain.size}
+        for future in as_completed(futures):
+            for idx, (results, info) in zip(futures[future],
+                                            future.result()):
+                yield idx, grid[idx], results, info
+
+
+def sweep(scenario_class, grid, settings=None, max_workers=None,
+          callback=None, warm_start=False):
+    """Run every point of a parameter grid and return a structured array.
+
+    The array has one float field per swept parameter followed by the
+    run_sim results and the solver iterations (zero for direct solvers) and
+    estimated iterations saved by warm starts, in grid order.  The optional
+    callback is called with (index, params, results) as each point
+    completes.
+    """
+    names = list(grid[0]) if grid else []
+    fields = result_fields(scenario_class)
+    table = np.zeros(len(grid), dtype=[(name, float) for name in
+                                       names + list(fields)] +
+                     [(name, int) for name in info_fields])
+    for idx, params, results, info in iter_sweep(
+            scenario_class, grid, settings, max_workers, warm_start):
+        for name in names:
+            table[name][idx] = params[name]
+        for name, value in zip(fields, results):
+            table[name][idx] = value
+        for name in info_fields:
+            table[name][idx] = info.get(name, 0)
+        if callback:
+            callback(idx, params, results)
+    return table
+
+
+def analytical_sweep(scenario_class, grid):
+    """Return analytical impedances of a parameter grid as a structured array.
+
+    The array has the same parameter fields as sweep followed by 'z0', or
+    the impedances of each mode of differential pairs.  Every point is
+    evaluated in a single vectorized call, so dense grids can be charted to
+    choose the points worth simulating.
+    """
+    _check_params(scenario_class, grid)
+    names = list(grid[0]) if grid else []
+    fields = analytical_fields if scenario_class().differential else ('z0',)
+    table = np.zeros(len(grid), dtype=[(name, float) for name in
+                                       names + list(fields)])
+    for name in names:
+        table[name] = [params[name] for params in grid]
+    results = scenario_class.analytical_batch(
+        **{name: table[name] for name in names})
+    if len(fields) == 1:
+        results = (results,)
+    for name, values in zip(fields, results):
+        table[name] = values
+    return table
+
+
+def _iter_chain(scenario_class, chain, settings=None, warm_start=False):
+    """Yield (results, solver_info) of each sweep point of a chain in order."""
+    previous = None
+    for params in chain:
+        scenario = scenario_class(**params)
+        scenario.store_fields = False   # Only results of sweeps are kept
+        scenario.apply_settings(settings or {})
+        if warm_start and previous is not None:
+            scenario.warm_start(previous)
+        yield scenario.run_sim(), scenario.solver_info
+        previous = scenario
+
+
+def _check_params(scenario_class, grid, settings=None):
+    """Raise ValueError for parameters or settings a scenario lacks."""
+    valid = inspect.signature(scenario_class.__init__).parameters
+    for params in grid:
+        unknown = set(params) - set(valid)
+        if unknown:
+            raise ValueError(f"{scenario_class.name} has no parameters "
+                             f"{sorted(unknown)}.")
+    scenario_class().apply_settings(settings or {})
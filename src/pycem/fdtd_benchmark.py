@@ -0,0 +1,87 @@
+"""Benchmark throughput of the FDTD field update kernels of the C engine."""
+# %% Imports
+# Standard system imports
+import ctypes
+import subprocess
+import time
+
+# Related third party imports
+import numpy as np
+
+# Local application/library specific imports
+from pycem.fdtd_scenarios import ArrayStorage, Grid
+from pycem.utilities import get_project_root
+
+
+# %% Globals
+kernel_sets = ('pthread', 'openmp')     # KERNELS of MakeFDTD_TMz.mk
+
+
+# %% Functions
+def build_kernels(kernels=kernel_sets):
+    """Build a shared library of each kernel set and return their paths."""
+    root = get_project_root() / 'src/C'
+    paths = {}
+    for kernel in kernels:
+        libfile = f'libFDTD_TMz_{kernel}.so'
+        subprocess.run(['make', '-f', 'MakeFDTD_TMz.mk', f'KERNELS={kernel}',
+                        f'LIBFILE={libfile}'], cwd=root / 'makefiles',
+                       check=True, stdout=subprocess.DEVNULL)
+        paths[kernel] = root / 'lib' / libfile
+    return paths
+
+
+def kernel_throughput(lib_path, size=1000, max_time=200, num_threads=0,
+                      repeats=3, tile_steps=0):
+    """Return cells per second of the Ricker scenario on a square grid.
+
+    The best of repeats runs is timed, with no snapshots recorded so that
+    only the field updates are measured.  tile_steps above one advances the
+    fields by wavefront sweeps of that many time steps.
+    """
+    scenario = ctypes.CDLL(lib_path).scenarioRicker
+    scenario.argtypes = [ctypes.POINTER(Grid)]
+    scenario.restype = None
+    best = np.inf
+    for _ in range(repeats):
+        g = Grid()
+        g.sizeX = size
+        g.sizeY = size
+        g.time = 0
+        g.max_time = max_time
+        g.Cdtds = 1.0 / np.sqrt(2.0)
+        g.num_threads = num_threads
+        g.tile_steps = tile_steps
+        storage = ArrayStorage(g, snap_steps=[])
+        start = time.perf_counter()
+        scenario(g)
+        best = min(best, time.perf_counter() - start)
+        del storage                     # Arrays must outlive the C run
+    return size**2 * (max_time - 1) / best
+
+
+def compare_kernels(sizes=(200, 1000, 2000), max_time=200, num_threads=0):
+    """Return cells per second of each kernel set at each grid size."""
+    paths = build_kernels()
+    return {kernel: [kernel_throughput(path, size, max_time, num_threads)
+                     for size in sizes] for kernel, path in paths.items()}
+
+
+def compare_tiling(size=4000, max_time=50, tile_steps=(0, 2, 4, 8)):
+    """Return cells per second of the default library at each tile_steps."""
+    lib_path = get_project_root() / 'src/C/lib/libFDTD_TMz.so'
+    return {steps: kernel_throughput(lib_path, size, max_time, num_threads=1,
+                                     repeats=1, tile_steps=steps)
+            for steps in tile_steps}
+
+
+if __name__ == "__main__":
+    grid_sizes = (200, 1000, 2000)
+    results = compare_kernels(grid_sizes)
+    print(f"{'Grid':>10}" + ''.join(f'{kernel:>16}' for kernel in results))
+    for k, size in enumerate(grid_sizes):
+        print(f'{size:>5}x{size:<4}' + ''.join(
+            f'{rates[k] / 1e6:>10.1f} Mc/s' for rates in results.values()))
+    print(f"\n{'Tile steps':>10}{'4000x4000':>16}")
+    for steps, rate in compare_tiling().items():
+        print(f'{steps:>10}{rate / 1e6:>11.1f} Mc/s')
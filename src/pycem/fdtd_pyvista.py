@@ -13,6 +13,7 @@ import pyvista as pv
 fdtd_theme = pv.themes.DefaultTheme()
 fdtd_theme.cmap = 'jet'
 fdtd_theme.show_edges = True
+movie_snap_every = 2            # Time steps recorded per animation frame
 
 
 # %% PyVista Plotting Functions
@@ -22,7 +23,7 @@ def log_norm(data, z_norm=1):
 
 
 def save_mesh_png(filepath, scenario, frame=0, clim=[-3, 0]):
-    """Create a .PNG image of a PyVista mesh at a specified frame."""
+    """Create a .PNG image of a PyVista mesh at a recorded time step."""
     # Create the spatial reference
     grid = pv.UniformGrid()
 
@@ -35,7 +36,7 @@ def save_mesh_png(filepath, scenario, frame=0, clim=[-3, 0]):
     grid.spacing = (1, 1, 0)  # These are the cell sizes along each axis
 
     # Get data from simulation results
-    values = log_norm(scenario.arr.Ez[frame, :, :])
+    values = log_norm(scenario.arr.snapshot(frame))
 
     # Add the data values to the cell data
     grid.cell_data["values"] = values.flatten(order="F")  # Flatten the array!
@@ -54,7 +55,7 @@ def save_mesh_png(filepath, scenario, frame=0, clim=[-3, 0]):
 
 
 def save_mesh_movie(filepath_mov, scenario, set_progress, clim=[-3, 0]):
-    """Create a .MP4 animation of a PyVista mesh."""
+    """Create a .MP4 animation of a PyVista mesh from recorded snapshots."""
     if filepath_mov.is_file():
         return
 
@@ -70,7 +71,7 @@ def save_mesh_movie(filepath_mov, scenario, set_progress, clim=[-3, 0]):
     grid.spacing = (1, 1, 0)  # These are the cell sizes along each axis
 
     # Get data from simulation results
-    values = scenario.arr.Ez[0, :, :]
+    values = scenario.arr.snapshots[0, :, :]
     grid.cell_data["values"] = values.flatten(order="F")
 
     pl = pv.Plotter(off_screen=True)
@@ -80,10 +81,11 @@ def save_mesh_movie(filepath_mov, scenario, set_progress, clim=[-3, 0]):
     pl.view_xy()
 
     pl.open_movie(filepath_mov)
-    for i in range(scenario.g.max_time):
-        values = log_norm(scenario.arr.Ez[i, :, :])
+    num_frames = len(scenario.arr.snapshots)
+    for i in range(num_frames):
+        values = log_norm(scenario.arr.snapshots[i, :, :])
         pl.update_scalars(values.flatten(order="F"))
         pl.render()
         pl.write_frame()
-        set_progress((str(i + 1), str(scenario.g.max_time)))
+        set_progress((str(i + 1), str(num_frames)))
     pl.close()
@@ -10,72 +10,141 @@ import numpy as np
 from pycem.utilities import get_project_root
 
 
+# %% Globals
+ez_levels = 2                       # Time levels of Ez kept by the C engine
+mat_free_space = 0                  # Material ID of free space
+mat_pec = 1                         # Material ID of perfect electric conductor
+material_dtype = np.dtype([(name, np.double) for name in (
+    'Chxh', 'Chxe', 'Chyh', 'Chye', 'Ceze', 'Cezh')])   # struct Material
+
+
 # %% Simulation Classes
 class ArrayStorage:
-    """Initializes and stores E-Field and H-Field arrays."""
+    """Initializes and stores E-Field and H-Field arrays.
+
+    Each cell holds a uint8 ID into a table of materials, whose update
+    coefficients are applied to Hx, Hy and Ez at the indices of the cell.
+    Every cell starts as free space, and scatterers are cells set to mat_pec.
+    The C kernels select the coefficients of free space or PEC by comparing
+    IDs with mat_pec, so the table holds only those two materials and
+    check_materials rejects any other ID before a run.
+
+    Ez holds only the two time levels needed by the updates, indexed by the
+    time step modulo two.  Snapshots of Ez are recorded every snap_every time
+    steps, or at the increasing time steps in snap_steps, so memory scales
+    with the size of the grid times the number of snapshots.  The default
+    snap_every of one records all max_time steps, 8 * sizeX * sizeY *
+    max_time bytes, or 19.6 MB for a 101 x 81 grid run for 300 steps.
+
+    Scenarios update the fields with num_threads threads, or if num_threads
+    is zero with one per processor but no more than one per 32 rows of the
+    grid.  RickerTMz2D also takes tile_steps, and above one a single thread
+    advances the fields by up to tile_steps time steps per sweep over the
+    grid, ending sweeps at recorded snapshots, which keeps large grids in
+    cache.
+    """
 
-    def __init__(self, g):
+    def __init__(self, g, snap_every=1, snap_steps=None):
         """Create arrays and pointers to arrays."""
         imp0 = 377.0  # Impedance of free space
         # Initialize Numpy arrays
         Hx = np.zeros((g.sizeX, g.sizeY-1), dtype=np.double)
-        Chxh = np.ones((g.sizeX, g.sizeY-1), dtype=np.double)
-        Chxe = np.ones((g.sizeX, g.sizeY-1), dtype=np.double) * g.Cdtds / imp0
         Hy = np.zeros((g.sizeX-1, g.sizeY), dtype=np.double)
-        Chyh = np.ones((g.sizeX-1, g.sizeY), dtype=np.double)
-        Chye = np.ones((g.sizeX-1, g.sizeY), dtype=np.double) * g.Cdtds / imp0
-        Ez = np.zeros((g.max_time, g.sizeX, g.sizeY), dtype=np.double)
-        Ceze = np.ones((g.sizeX, g.sizeY), dtype=np.double)
-        Cezh = np.ones((g.sizeX, g.sizeY), dtype=np.double) * g.Cdtds * imp0
+        Ez = np.zeros((ez_levels, g.sizeX, g.sizeY), dtype=np.double)
+        material = np.full((g.sizeX, g.sizeY), mat_free_space, dtype=np.uint8)
+        free_space = (1, g.Cdtds / imp0, 1, g.Cdtds / imp0, 1, g.Cdtds * imp0)
+        pec = free_space[:4] + (0, 0)   # Ez of PEC cells remains zero
+        materials = np.array([free_space, pec], dtype=material_dtype)
+        if snap_steps is None:
+            snap_steps = np.arange(0, g.max_time, snap_every)
+        snap_steps = np.asarray(snap_steps, dtype=np.uintc)
+        if (np.any(np.diff(snap_steps.astype(int)) <= 0)
+                or np.any(snap_steps >= g.max_time) or snap_every < 1):
+            raise ValueError("Snapshot steps must increase and lie within "
+                             "max_time.")
+        snapshots = np.zeros((snap_steps.size, g.sizeX, g.sizeY),
+                             dtype=np.double)
         # Create pointers to Numpy arrays
         Hx_ptr = Hx.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
-        Chxh_ptr = Chxh.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
-        Chxe_ptr = Chxe.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
         Hy_ptr = Hy.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
-        Chyh_ptr = Chyh.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
-        Chye_ptr = Chye.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
         Ez_ptr = Ez.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
-        Ceze_ptr = Ceze.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
-        Cezh_ptr = Cezh.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+        material_ptr = material.ctypes.data_as(ctypes.POINTER(ctypes.c_uint8))
+        materials_ptr = materials.ctypes.data_as(ctypes.POINTER(Material))
+        snapshots_ptr = snapshots.ctypes.data_as(
+            ctypes.POINTER(ctypes.c_double))
+        snap_steps_ptr = snap_steps.ctypes.data_as(
+            ctypes.POINTER(ctypes.c_uint))
         # Store pointers to arrays in struct Grid
         g.Hx = Hx_ptr
-        g.Chxh = Chxh_ptr
-        g.Chxe = Chxe_ptr
         g.Hy = Hy_ptr
-        g.Chyh = Chyh_ptr
-        g.Chye = Chye_ptr
         g.Ez = Ez_ptr
-        g.Ceze = Ceze_ptr
-        g.Cezh = Cezh_ptr
+        g.material = material_ptr
+        g.materials = materials_ptr
+        g.snapshots = snapshots_ptr
+        g.snap_steps = snap_steps_ptr
+        g.snap_every = snap_every
+        g.num_snaps = snap_steps.size
+        g.snap_count = 0
         # Store arrays in class instance
         self.Hx = Hx
-        self.Chxh = Chxh
-        self.Chxe = Chxe
         self.Hy = Hy
-        self.Chyh = Chyh
-        self.Chye = Chye
         self.Ez = Ez
-        self.Ceze = Ceze
-        self.Cezh = Cezh
+        self.material = material
+        self.materials = materials
+        self.snapshots = snapshots
+        self.snap_steps = snap_steps
+
+    def snapshot(self, step):
+        """Return recorded Ez at a time step."""
+        frame = np.searchsorted(self.snap_steps, step)
+        if frame == self.snap_steps.size or self.snap_steps[frame] != step:
+            raise ValueError(f"Time step {step} was not recorded.")
+        return self.snapshots[frame]
+
+    def check_materials(self):
+        """Raise ValueError unless every cell is free space or PEC."""
+        if (self.materials.shape != (mat_pec + 1,)
+                or self.material.max() > mat_pec):
+            raise ValueError("The C kernels only support the free space and "
+                             "PEC materials.")
+
+    def coefficients(self, name):
+        """Return array of an update coefficient looked up for every cell."""
+        coefs = self.materials[name][self.material]
+        if name.startswith('Chx'):
+            return coefs[:, :-1]        # Shape of Hx
+        if name.startswith('Chy'):
+            return coefs[:-1, :]        # Shape of Hy
+        return coefs
+
+
+class Material(ctypes.Structure):
+    """Creates a class representing struct Material."""
+
+    _fields_ = [(name, ctypes.c_double) for name in material_dtype.names]
 
 
 class Grid(ctypes.Structure):
     """Creates a class representing struct Grid."""
 
     _fields_ = [('Hx', ctypes.POINTER(ctypes.c_double)),
-                ('Chxh', ctypes.POINTER(ctypes.c_double)),
-                ('Chxe', ctypes.POINTER(ctypes.c_double)),
                 ('Hy', ctypes.POINTER(ctypes.c_double)),
-                ('Chyh', ctypes.POINTER(ctypes.c_double)),
-                ('Chye', ctypes.POINTER(ctypes.c_double)),
                 ('Ez', ctypes.POINTER(ctypes.c_double)),
-                ('Ceze', ctypes.POINTER(ctypes.c_double)),
-                ('Cezh', ctypes.POINTER(ctypes.c_double)),
+                ('material', ctypes.POINTER(ctypes.c_uint8)),
+                ('materials', ctypes.POINTER(Material)),
                 ('sizeX', ctypes.c_int),
                 ('sizeY', ctypes.c_int),
                 ('time', ctypes.c_int),
                 ('max_time', ctypes.c_int),
-                ('Cdtds', ctypes.c_double)]
+                ('Cdtds', ctypes.c_double),
+                ('snapshots', ctypes.POINTER(ctypes.c_double)),
+                ('snap_steps', ctypes.POINTER(ctypes.c_uint)),
+                ('snap_every', ctypes.c_int),
+                ('num_snaps', ctypes.c_int),
+                ('snap_count', ctypes.c_int),
+                ('num_threads', ctypes.c_int),
+                ('pool', ctypes.c_void_p),
+                ('tile_steps', ctypes.c_int)]
 
 
 # %% Scenarios
@@ -102,14 +171,21 @@ class RickerTMz2D:
         boundary that reflects the radiated waves.
         """
 
-    def __init__(self, g):
-        """Initialize the FDTD grid and any update functions."""
+    def __init__(self, g, snap_every=1, snap_steps=None, num_threads=0,
+                 tile_steps=0):
+        """Initialize the FDTD grid and any update functions.
+
+        Snapshot, thread and tiling arguments are described in ArrayStorage.
+        """
         g.sizeX = RickerTMz2D.sizeX         # X size of domain
         g.sizeY = RickerTMz2D.sizeY         # Y size of domain
         g.time = 0                          # Current time step
         g.max_time = RickerTMz2D.max_time   # Duration of simulation
         g.Cdtds = RickerTMz2D.Cdtds         # Courant number
-        self.arr = ArrayStorage(g)          # Initialize E and H-field arrays
+        g.num_threads = num_threads         # Threads updating fields
+        g.tile_steps = tile_steps           # Time steps per sweep of grid
+        # Initialize E and H-field arrays and snapshots of Ez
+        self.arr = ArrayStorage(g, snap_every, snap_steps)
         self.g = g
         self.init_c_funcs()                 # Initialize C foreign function
 
@@ -124,6 +200,7 @@ class RickerTMz2D:
 
     def run_sim(self):
         """Run simulation by calling C foreign function."""
+        self.arr.check_materials()
         self.scenario(self.g)
 
 
@@ -151,14 +228,19 @@ class TFSFSource:
         capture the radiated waves.
         """
 
-    def __init__(self, g):
-        """Initialize the FDTD grid and any update functions."""
+    def __init__(self, g, snap_every=1, snap_steps=None, num_threads=0):
+        """Initialize the FDTD grid and any update functions.
+
+        Snapshot, thread and tiling arguments are described in ArrayStorage.
+        """
         g.sizeX = TFSFSource.sizeX          # X size of domain
         g.sizeY = TFSFSource.sizeY          # Y size of domain
         g.time = 0                          # Current time step
         g.max_time = TFSFSource.max_time    # Duration of simulation
         g.Cdtds = TFSFSource.Cdtds          # Courant number
-        self.arr = ArrayStorage(g)          # Initialize E and H-field arrays
+        g.num_threads = num_threads         # Threads updating fields
+        # Initialize E and H-field arrays and snapshots of Ez
+        self.arr = ArrayStorage(g, snap_every, snap_steps)
         self.g = g
         self.init_c_funcs()                 # Initialize C foreign function
 
@@ -173,6 +255,7 @@ class TFSFSource:
 
     def run_sim(self):
         """Run simulation by calling C foreign function."""
+        self.arr.check_materials()
         self.scenario(self.g)
 
 
@@ -200,14 +283,19 @@ class TFSFPlate:
         capture the radiated waves.
         """
 
-    def __init__(self, g):
-        """Initialize the FDTD grid and any update functions."""
+    def __init__(self, g, snap_every=1, snap_steps=None, num_threads=0):
+        """Initialize the FDTD grid and any update functions.
+
+        Snapshot, thread and tiling arguments are described in ArrayStorage.
+        """
         g.sizeX = 101                   # X size of domain
         g.sizeY = 81                    # Y size of domain
         g.time = 0                      # Current time step
         g.max_time = 300                # Duration of simulation
         g.Cdtds = 1.0 / np.sqrt(2.0)    # Courant number
-        self.arr = ArrayStorage(g)      # Initialize E and H-field arrays
+        g.num_threads = num_threads     # Threads updating fields
+        # Initialize E and H-field arrays and snapshots of Ez
+        self.arr = ArrayStorage(g, snap_every, snap_steps)
         self.g = g
         self.init_c_funcs()             # Initialize C foreign function
 
@@ -222,6 +310,7 @@ class TFSFPlate:
 
     def run_sim(self):
         """Run simulation by calling C foreign function."""
+        self.arr.check_materials()
         self.scenario(self.g)
 
 
@@ -249,14 +338,19 @@ class TFSFDisk:
         capture the radiated waves.
         """
 
-    def __init__(self, g):
-        """Initialize the FDTD grid and any update functions."""
+    def __init__(self, g, snap_every=1, snap_steps=None, num_threads=0):
+        """Initialize the FDTD grid and any update functions.
+
+        Snapshot, thread and tiling arguments are described in ArrayStorage.
+        """
         g.sizeX = 101                   # X size of domain
         g.sizeY = 81                    # Y size of domain
         g.time = 0                      # Current time step
         g.max_time = 300                # Duration of simulation
         g.Cdtds = 1.0 / np.sqrt(2.0)    # Courant number
-        self.arr = ArrayStorage(g)      # Initialize E and H-field arrays
+        g.num_threads = num_threads     # Threads updating fields
+        # Initialize E and H-field arrays and snapshots of Ez
+        self.arr = ArrayStorage(g, snap_every, snap_steps)
         self.g = g
         self.init_c_funcs()             # Initialize C foreign function
 
@@ -271,6 +365,7 @@ class TFSFDisk:
 
     def run_sim(self):
         """Run simulation by calling C foreign function."""
+        self.arr.check_materials()
         self.scenario(self.g)
 
 
@@ -295,14 +390,19 @@ class TFSFCornerReflector:
         capture the radiated waves.
         """
 
-    def __init__(self, g):
-        """Initialize the FDTD grid and any update functions."""
+    def __init__(self, g, snap_every=1, snap_steps=None, num_threads=0):
+        """Initialize the FDTD grid and any update functions.
+
+        Snapshot, thread and tiling arguments are described in ArrayStorage.
+        """
         g.sizeX = 101                   # X size of domain
         g.sizeY = 81                    # Y size of domain
         g.time = 0                      # Current time step
         g.max_time = 300                # Duration of simulation
         g.Cdtds = 1.0 / np.sqrt(2.0)    # Courant number
-        self.arr = ArrayStorage(g)      # Initialize E and H-field arrays
+        g.num_threads = num_threads     # Threads updating fields
+        # Initialize E and H-field arrays and snapshots of Ez
+        self.arr = ArrayStorage(g, snap_every, snap_steps)
         self.g = g
         self.init_c_funcs()             # Initialize C foreign function
 
@@ -317,6 +417,7 @@ class TFSFCornerReflector:
 
     def run_sim(self):
         """Run simulation by calling C foreign function."""
+        self.arr.check_materials()
         self.scenario(self.g)
 
 
@@ -341,14 +442,19 @@ class TFSFMinefield:
         capture the radiated waves.
         """
 
-    def __init__(self, g):
-        """Initialize the FDTD grid and any update functions."""
+    def __init__(self, g, snap_every=1, snap_steps=None, num_threads=0):
+        """Initialize the FDTD grid and any update functions.
+
+        Snapshot, thread and tiling arguments are described in ArrayStorage.
+        """
         g.sizeX = 101                   # X size of domain
         g.sizeY = 81                    # Y size of domain
         g.time = 0                      # Current time step
         g.max_time = 300                # Duration of simulation
         g.Cdtds = 1.0 / np.sqrt(2.0)    # Courant number
-        self.arr = ArrayStorage(g)      # Initialize E and H-field arrays
+        g.num_threads = num_threads     # Threads updating fields
+        # Initialize E and H-field arrays and snapshots of Ez
+        self.arr = ArrayStorage(g, snap_every, snap_steps)
         self.g = g
         self.init_c_funcs()             # Initialize C foreign function
 
@@ -363,6 +469,7 @@ class TFSFMinefield:
 
     def run_sim(self):
         """Run simulation by calling C foreign function."""
+        self.arr.check_materials()
         self.scenario(self.g)
 
 
@@ -15,7 +15,7 @@ def create_fdtd_images():
     """Create image previews for FDTD scenarios if they don't exist."""
     for scenario in fdtd_scenario_list:
         g = Grid()
-        scenario_init = scenario(g)
+        scenario_init = scenario(g, snap_steps=[scenario.image_frame])
         filename = get_project_root() / \
             f'src/webapp/assets/img/fdtd/{scenario_init.name}.png'
         if not filename.is_file():
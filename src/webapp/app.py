@@ -9,12 +9,19 @@ import dash_bootstrap_components as dbc
 import diskcache
 
 # Local application/library specific imports
+from pycem.fda_cache import ResultCache
+from pycem.fda_surrogate import load_surrogates, webapp_surrogates
+from pycem.utilities import get_project_root
 
 
 # %% Instantiate Dash app
 # Pickle protocol must be <= 4
 cache = diskcache.Cache("./cache", disk_pickle_protocol=4)
 long_callback_manager = DiskcacheLongCallbackManager(cache)
+# Repeated FDA simulations with identical inputs skip the solve
+fda_cache = ResultCache(get_project_root() / 'src/webapp/cache/fda')
+# Instant FDA impedances of scenarios with a saved surrogate model
+fda_surrogates = load_surrogates(webapp_surrogates)
 
 app = Dash(__name__,
            long_callback_manager=long_callback_manager,
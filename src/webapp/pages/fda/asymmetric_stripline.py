@@ -7,7 +7,7 @@ from dash import html, Input, Output, State, ctx
 import dash_bootstrap_components as dbc
 
 # Local application/library specific imports
-from webapp.app import app
+from webapp.app import app, fda_cache, fda_surrogates
 from webapp.pages.styling import content_style
 from pycem.fda_scenarios import AsymmetricStripline
 from pycem.utilities import get_project_root, list_files
@@ -15,6 +15,7 @@ from pycem.utilities import get_project_root, list_files
 
 # %% Globals
 scenario = AsymmetricStripline()
+scenario.refine = 'field'    # Refine the mesh only where Z0 needs it
 
 
 # %% Dash Components
@@ -200,6 +201,7 @@ table_header = [
         [html.Th("Quantity"),
          html.Th("Analytical Formula"),
          html.Th("FDA Simulation"),
+         html.Th("FDA Surrogate"),
          html.Th("Percent Difference"),
          ]))
 ]
@@ -208,6 +210,7 @@ row1 = html.Tr([
     html.Td("Characteristic Impedance (Ohms)"),
     html.Td("", id=f"calc-z0-{scenario.name}"),
     html.Td("", id=f"sim-z0-{scenario.name}"),
+    html.Td("", id=f"surr-z0-{scenario.name}"),
     html.Td("", id=f"z0-perc-diff-{scenario.name}")
 ])
 
@@ -290,8 +293,8 @@ def run_sim(set_progress, sim_nclicks, width, height, dy, offset, Er, dx):
         scenario.dx = dx*1e-3
         root = get_project_root()
         filepath = root / 'src/webapp/assets/img/fda/scenarios'
-        _, _, sim_z0 = scenario.run_sim(filepath=filepath,
-                                        set_progress=set_progress)
+        _, _, sim_z0 = fda_cache.run_sim(scenario, filepath=filepath,
+                                          set_progress=set_progress)
     else:
         raise Exception("Invalid input.")
     sim_z0_str = str(round(sim_z0, 2))
@@ -345,6 +348,38 @@ def analytical_calc(_, sim_z0, width, height, dy, offset, Er, dx):
         return calc_z0, perc_diff
 
 
+@app.callback(
+    Output(f'surr-z0-{scenario.name}', "children"),
+    Input(f'calc-{scenario.name}-button', 'n_clicks'),
+    State(f'width-input-{scenario.name}', 'value'),
+    State(f'height-input-{scenario.name}', 'value'),
+    State(f'dy-input-{scenario.name}', 'value'),
+    State(f'offset-input-{scenario.name}', 'value'),
+    State(f'er-input-{scenario.name}', 'value'),
+    State(f'dx-input-{scenario.name}', 'value'),
+    prevent_initial_call=True,
+)
+def surrogate_calc(_, width, height, dy, offset, Er, dx):
+    """Display impedance interpolated from a surrogate of FDA sweeps."""
+    surrogate = fda_surrogates.get(scenario.name)
+    if surrogate is None:
+        return "No surrogate built"
+    if width and height and dy and offset and Er and dx:
+        scenario.trace_w = width*1e-3
+        scenario.sub_thk = height*1e-3
+        scenario.dy = dy*1e-3
+        scenario.offset = offset*1e-3
+        scenario.Er = Er
+        scenario.dx = dx*1e-3
+        params = scenario.get_params()
+        reason = surrogate.explain(**params)
+        if reason:
+            return f"Outside surrogate (SI units): {reason}"
+        results = surrogate.predict(**params)
+        return str(round(results[2], 2))
+    return ""
+
+
 def get_carousel_images():
     """Return list of dicts containing image paths for carousel."""
     root = get_project_root()
@@ -7,7 +7,7 @@ from dash import html, Input, Output, State, ctx
 import dash_bootstrap_components as dbc
 
 # Local application/library specific imports
-from webapp.app import app
+from webapp.app import app, fda_cache, fda_surrogates
 from webapp.pages.styling import content_style
 from pycem.fda_scenarios import DifferentialMicrostrip
 from pycem.utilities import get_project_root, list_files
@@ -15,6 +15,7 @@ from pycem.utilities import get_project_root, list_files
 
 # %% Globals
 scenario = DifferentialMicrostrip()
+scenario.refine = 'field'    # Refine the mesh only where Z0 needs it
 
 
 # %% Dash Components
@@ -199,6 +200,7 @@ table_header = [
         [html.Th("Quantity"),
          html.Th("Analytical Formula"),
          html.Th("FDA Simulation"),
+         html.Th("FDA Surrogate"),
          html.Th("Percent Difference"),
          ]))
 ]
@@ -207,6 +209,7 @@ row1 = html.Tr([
     html.Td("Differential Impedance (Ohms)"),
     html.Td("", id=f"calc-diff-{scenario.name}"),
     html.Td("", id=f"sim-diff-{scenario.name}"),
+    html.Td("", id=f"surr-diff-{scenario.name}"),
     html.Td("", id=f"diff-perc-diff-{scenario.name}")
 ])
 
@@ -214,6 +217,7 @@ row2 = html.Tr([
     html.Td("Common Impedance (Ohms)"),
     html.Td("", id=f"calc-comm-{scenario.name}"),
     html.Td("", id=f"sim-comm-{scenario.name}"),
+    html.Td("", id=f"surr-comm-{scenario.name}"),
     html.Td("", id=f"comm-perc-diff-{scenario.name}")
 ])
 
@@ -297,8 +301,8 @@ def run_sim(set_progress, sim_nclicks, width, height, dy, spacing, Er, dx):
         scenario.dx = dx*1e-3
         root = get_project_root()
         filepath = root / 'src/webapp/assets/img/fda/scenarios'
-        (_, _, diff_z0, _, _, comm_z0, _, _) = scenario.run_sim(
-            filepath=filepath,
+        (_, _, diff_z0, _, _, comm_z0, _, _) = fda_cache.run_sim(
+            scenario, filepath=filepath,
             set_progress=set_progress)
     else:
         raise Exception("Invalid input.")
@@ -362,6 +366,40 @@ def analytical_calc(_, sim_diff, sim_comm, width, height, dy, spacing, Er, dx):
         return diff_z0, perc_diff, comm_z0, perc_diff
 
 
+@app.callback(
+    Output(f'surr-diff-{scenario.name}', "children"),
+    Output(f'surr-comm-{scenario.name}', "children"),
+    Input(f'calc-{scenario.name}-button', 'n_clicks'),
+    State(f'width-input-{scenario.name}', 'value'),
+    State(f'height-input-{scenario.name}', 'value'),
+    State(f'dy-input-{scenario.name}', 'value'),
+    State(f'spacing-input-{scenario.name}', 'value'),
+    State(f'er-input-{scenario.name}', 'value'),
+    State(f'dx-input-{scenario.name}', 'value'),
+    prevent_initial_call=True,
+)
+def surrogate_calc(_, width, height, dy, spacing, Er, dx):
+    """Display impedance interpolated from a surrogate of FDA sweeps."""
+    surrogate = fda_surrogates.get(scenario.name)
+    if surrogate is None:
+        return "No surrogate built", ""
+    if width and height and dy and spacing and Er and dx:
+        scenario.trace_w = width*1e-3
+        scenario.sub_thk = height*1e-3
+        scenario.dy = dy*1e-3
+        scenario.spacing = spacing*1e-3
+        scenario.Er = Er
+        scenario.dx = dx*1e-3
+        params = scenario.get_params()
+        reason = surrogate.explain(**params)
+        if reason:
+            return f"Outside surrogate (SI units): {reason}", ""
+        results = surrogate.predict(**params)
+        diff_z0, comm_z0 = results[2], results[5]
+        return str(round(diff_z0, 2)), str(round(comm_z0, 2))
+    return "", ""
+
+
 def get_carousel_images():
     """Return list of dicts containing image paths for carousel."""
     root = get_project_root()
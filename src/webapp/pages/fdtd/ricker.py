@@ -10,12 +10,12 @@ import dash_bootstrap_components as dbc
 from webapp.app import app
 from webapp.pages.styling import content_style
 from pycem.fdtd_scenarios import RickerTMz2D, Grid
-from pycem.fdtd_pyvista import save_mesh_movie
+from pycem.fdtd_pyvista import save_mesh_movie, movie_snap_every
 from pycem.utilities import get_project_root
 
 
 # %% Globals
-scenario = RickerTMz2D(Grid())
+scenario = RickerTMz2D(Grid(), snap_every=movie_snap_every)
 
 
 # %% Dash Components
@@ -8,6 +8,8 @@ import pytest
 
 # Local application/library specific imports
 from pycem.benchmarking import C_Lib_Wrapper
+from pycem.fdtd_benchmark import kernel_throughput
+from pycem.utilities import get_project_root
 
 
 # %% Tests
@@ -40,3 +42,9 @@ def test_matrix_mult_invalid():
     mat2 = np.ones((10, 15), dtype=int)
     with pytest.raises(Exception):
         clib.mat_mult_wrapper(mat1, mat2)
+
+
+def test_fdtd_kernel_throughput():
+    """Time the FDTD update kernels of the default library."""
+    lib_path = get_project_root() / 'src/C/lib/libFDTD_TMz.so'
+    assert kernel_throughput(lib_path, size=50, max_time=20, repeats=1) > 0
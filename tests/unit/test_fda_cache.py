@@ -0,0 +1,67 @@
+"""Run pytest unit testing on the FDA result cache."""
+# %% Imports
+# Standard system imports
+import os
+
+# Related third party imports
+import numpy as np
+
+# Local application/library specific imports
+from pycem.fda_cache import ResultCache
+from pycem.fda_scenarios import DifferentialStripline, Microstrip
+
+
+# %% Tests
+def test_repeat_query_hits(tmp_path):
+    """Identical scenarios hit the cache and return identical results."""
+    cache = ResultCache(tmp_path)
+    first = cache.run_sim(Microstrip(dx=0.2e-3, dy=0.2e-3))
+    second = cache.run_sim(Microstrip(dx=0.2e-3, dy=0.2e-3))
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(first, second)
+    _, mode_voltages = cache.get(Microstrip(dx=0.2e-3, dy=0.2e-3))
+    assert list(mode_voltages) == ['']
+
+
+def test_key_changes(tmp_path):
+    """Geometry, mesh and solver settings are all part of the key."""
+    base = DifferentialStripline()
+    keys = {ResultCache.key(base), ResultCache.key(DifferentialStripline())}
+    assert len(keys) == 1
+    spacing = DifferentialStripline(spacing=0.3e-3)
+    mesh = DifferentialStripline(dx=0.05e-3)
+    solver = DifferentialStripline()
+    solver.solver = 'cg'
+    for scenario in (spacing, mesh, solver):
+        keys.add(ResultCache.key(scenario))
+    assert len(keys) == 4
+
+
+def test_lru_eviction(tmp_path):
+    """Least recently used entries are evicted beyond the size limit."""
+    cache = ResultCache(tmp_path)
+    scenarios = [Microstrip(Er=Er, dx=0.2e-3, dy=0.2e-3) for Er in (2, 3, 4)]
+    for scenario in scenarios[:2]:
+        cache.run_sim(scenario)
+    cache.max_bytes = int(1.25 * cache.size())  # Room for two entries
+    cache.get(scenarios[0])             # Most recently used entry is kept
+    cache.run_sim(scenarios[2])
+    assert cache.get(scenarios[0]) is not None
+    assert cache.get(scenarios[1]) is None
+
+
+def test_eviction_orders_by_nanoseconds(tmp_path):
+    """Entries used within the same second are evicted in order of use."""
+    cache = ResultCache(tmp_path)
+    scenarios = [Microstrip(Er=Er, dx=0.2e-3, dy=0.2e-3) for Er in (2, 3, 4)]
+    for scenario in scenarios:
+        cache.put(scenario, (1.0, 2.0))
+    second = 1_700_000_000 * 10**9
+    for offset, scenario in zip((30, 10, 20), scenarios):
+        file = cache._file(cache.key(scenario))
+        os.utime(file, ns=(second + offset, second + offset))
+    cache.max_bytes = int(2.5 * cache.size() / 3)   # Room for two entries
+    cache._evict()
+    assert cache.get(scenarios[1]) is None
+    assert cache.get(scenarios[0]) is not None
+    assert not list(tmp_path.glob('*.tmp'))
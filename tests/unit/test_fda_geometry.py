@@ -0,0 +1,61 @@
+"""Run pytest unit testing on FDA geometry mask primitives."""
+# %% Imports
+# Standard system imports
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from pycem.fda_geometry import circle_mask
+from pycem.fda_scenarios import (Coaxial, DifferentialMicrostrip,
+                                 DifferentialStripline)
+
+
+# %% Tests
+def test_circle_matches_loop():
+    """Vectorized circle must match a per-cell distance loop."""
+    shape = (37, 41)
+    center = (18, 20)
+    dx, dy = 0.05e-3, 0.04e-3
+    radius = 0.6e-3
+    expected = np.zeros(shape, dtype=bool)
+    for i in range(shape[0]):
+        for j in range(shape[1]):
+            dist = (((i-center[0])*dy)**2 + ((j-center[1])*dx)**2)**0.5
+            expected[i, j] = dist <= radius
+    np.testing.assert_array_equal(circle_mask(shape, center, radius, dx, dy),
+                                  expected)
+
+
+def test_coaxial_centered():
+    """Coax conductors are centered on the domain, not one cell off it."""
+    scenario = Coaxial()
+    scenario._draw_geometry()
+    for mat in (scenario.signal_mat, scenario.ground_mat):
+        np.testing.assert_array_equal(mat, mat[::-1, ::-1])
+
+
+@pytest.mark.parametrize('scenario_class', [DifferentialMicrostrip,
+                                            DifferentialStripline])
+@pytest.mark.parametrize('extra_cells', [0, 1])
+@pytest.mark.parametrize('extra_width', [0, 1])
+def test_differential_pair_gap(scenario_class, extra_cells, extra_width):
+    """Pair traces are spacing cells apart and centered on the domain."""
+    default = scenario_class()
+    spacing = default.spacing + extra_cells * default.dx
+    # A sixth of a cell wider trace widens the domain by one cell
+    trace_w = default.trace_w + extra_width * default.dx / 6
+    scenario = scenario_class(trace_w=trace_w, spacing=spacing)
+    assert scenario.Nx == default.Nx + extra_width
+    scenario.diff_mode = 'common'
+    scenario._draw_geometry()
+    row = np.flatnonzero(scenario.signal_mat.any(axis=1))[0]
+    left = np.flatnonzero(scenario.signal_mat[row])
+    right = np.flatnonzero(scenario.neg_mat[row])
+    spacing_idx = round(spacing / scenario.dx)
+    assert right[0] - left[-1] - 1 == spacing_idx
+    # Mirror symmetric unless width and spacing differ in parity
+    shift = (scenario.Nx - spacing_idx) % 2
+    np.testing.assert_array_equal(
+        scenario.signal_mat, np.roll(scenario.neg_mat[:, ::-1], -shift, 1))
@@ -0,0 +1,345 @@
+"""Run pytest unit testing on FDA scenarios."""
+# %% Imports
+# Standard system imports
+
+# Related third party imports
+import numpy as np
+import pytest
+from scipy.sparse import diags, kronsum
+
+# Local application/library specific imports
+from pycem import fda_solvers
+from pycem.fda_scenarios import (FDAScenario, SymmetricStripline,
+                                 Microstrip, Coaxial, DifferentialStripline)
+from pycem.fda_solvers import FDASystem
+
+
+# %% Tests
+@pytest.mark.parametrize('scenario_class', [SymmetricStripline, Microstrip,
+                                            DifferentialStripline])
+def test_sparse_matches_dense(scenario_class):
+    """Sparse and dense solver backends must produce identical results."""
+    dense = scenario_class(dx=0.1e-3, dy=0.1e-3)
+    dense.solver = 'dense'
+    sparse = scenario_class(dx=0.1e-3, dy=0.1e-3)
+    sparse.solver = 'sparse'
+
+    dense_result = dense.run_sim()
+    sparse_result = sparse.run_sim()
+
+    np.testing.assert_allclose(sparse_result, dense_result, rtol=1e-9)
+    np.testing.assert_allclose(sparse.voltages, dense.voltages, atol=1e-9)
+
+
+def test_invalid_solver():
+    """Request an FDA solver backend that does not exist."""
+    scenario = SymmetricStripline(dx=0.1e-3, dy=0.1e-3)
+    scenario.solver = 'invalid'
+    with pytest.raises(ValueError):
+        scenario.run_sim()
+
+
+@pytest.mark.parametrize('solver,preconditioner', [('cg', 'ic'),
+                                                   ('cg', 'jacobi'),
+                                                   ('bicgstab', 'ic'),
+                                                   ('cg', 'multigrid'),
+                                                   ('multigrid', None)])
+def test_iterative_matches_sparse(solver, preconditioner):
+    """Iterative solvers must converge to the sparse direct solution."""
+    direct = DifferentialStripline()
+    krylov = DifferentialStripline()
+    krylov.solver = solver
+    krylov.preconditioner = preconditioner
+    krylov.tol = 1e-10
+
+    direct_result = direct.run_sim()
+    krylov_result = krylov.run_sim()
+
+    np.testing.assert_allclose(krylov_result, direct_result, rtol=1e-6)
+    assert krylov.solver_info['converged']
+    assert krylov.solver_info['iterations'] > 0
+    assert krylov.solver_info['residual'] <= 1e-10
+
+
+def test_multigrid_cycles_flat():
+    """Multigrid V-cycle counts must not grow as the mesh is refined."""
+    cycles = []
+    for dx in (0.05e-3, 0.025e-3):
+        scenario = Microstrip(dx=dx, dy=dx)
+        scenario.solver = 'multigrid'
+        scenario.symmetry = False
+        scenario.run_sim()
+        cycles.append(scenario.solver_info['iterations'])
+    # Dielectric and free space solves
+    assert cycles[1] <= cycles[0] + 2
+    assert cycles[1] <= 20
+
+
+@pytest.mark.parametrize('scenario_class', [Microstrip, DifferentialStripline])
+def test_repeated_run_sim(scenario_class):
+    """Running a scenario twice must not compound the dielectric constant."""
+    scenario = scenario_class(dx=0.1e-3, dy=0.1e-3)
+
+    first_result = scenario.run_sim()
+    second_result = scenario.run_sim()
+
+    np.testing.assert_allclose(second_result, first_result, rtol=1e-9)
+
+
+def test_dielectric_scaling():
+    """Impedance in a uniform dielectric scales with 1/sqrt(Er)."""
+    air = SymmetricStripline(Er=1, dx=0.05e-3, dy=0.05e-3)
+    dielectric = SymmetricStripline(Er=4, dx=0.05e-3, dy=0.05e-3)
+
+    _, air_L, air_z0 = air.run_sim()
+    _, dielectric_L, dielectric_z0 = dielectric.run_sim()
+
+    np.testing.assert_allclose(dielectric_L, air_L, rtol=1e-9)
+    np.testing.assert_allclose(dielectric_z0, air_z0 / 2, rtol=1e-9)
+
+
+def test_microstrip_converges_to_analytical():
+    """Microstrip impedance approaches the analytical value as dx shrinks."""
+    errors = []
+    for dx in (0.1e-3, 0.05e-3, 0.025e-3):
+        scenario = Microstrip(dx=dx, dy=dx)
+        z0 = scenario.run_sim()[-1]
+        errors.append(abs(z0 / scenario.analytical_soln() - 1))
+    assert errors[0] > errors[1] > errors[2]
+    assert errors[2] < 0.01
+
+
+def test_solve_excitations_superposition():
+    """Voltages of multiple excitations must obey superposition."""
+    scenario = DifferentialStripline(dx=0.05e-3, dy=0.05e-3)
+    scenario.diff_mode = 'comm'
+    scenario._draw_geometry()
+    pos = (scenario.signal_mat > 0).astype(float)
+    neg = (scenario.neg_mat != 0).astype(float)
+
+    voltages = scenario.solve_excitations([pos, neg, pos + neg])
+
+    assert voltages.shape == (3, scenario.Ny, scenario.Nx)
+    np.testing.assert_allclose(voltages[0] + voltages[1], voltages[2],
+                               atol=1e-12)
+    np.testing.assert_allclose(voltages[0], voltages[1][:, ::-1], atol=1e-12)
+
+
+def test_extract_matrices():
+    """Diff pair matrices are symmetric and reproduce the mode capacitance."""
+    scenario = DifferentialStripline()
+    diff_C, diff_L, *_ = scenario.run_sim()
+    cap_mat, ind_mat = scenario.extract_matrices()
+    assert cap_mat.shape == ind_mat.shape == (2, 2)
+    np.testing.assert_allclose(cap_mat, cap_mat.T, rtol=1e-9)
+    np.testing.assert_allclose(ind_mat, ind_mat.T, rtol=1e-9)
+    assert np.all(np.diag(cap_mat) > 0) and cap_mat[0, 1] < 0
+    # Differential excitation of +/-0.5V on each conductor
+    excitation = np.array([0.5, -0.5])
+    np.testing.assert_allclose(excitation @ cap_mat @ excitation, diff_C,
+                               rtol=1e-6)
+
+
+def test_design_target_impedance():
+    """Design finds a trace width within a mesh cell of the target."""
+    scenario = DifferentialStripline()
+    width, diff_z0 = scenario.design(100)
+    assert len(scenario.design_history) <= 5
+    assert abs(diff_z0 - 100) < 2
+    result = DifferentialStripline(trace_w=width).run_sim()
+    np.testing.assert_allclose(result[2], diff_z0)
+
+
+def test_warm_start_matches_cold():
+    """Warm-started iterative solves converge to the same voltages."""
+    previous = SymmetricStripline()
+    previous.run_sim()
+    cold = SymmetricStripline(trace_w=0.4e-3)
+    cold.solver = 'cg'
+    cold.tol = 1e-10
+    warm = SymmetricStripline(trace_w=0.4e-3)
+    warm.solver = 'cg'
+    warm.tol = 1e-10
+    warm.warm_start(previous)
+    np.testing.assert_allclose(warm.run_sim(), cold.run_sim(), rtol=1e-8)
+
+
+@pytest.mark.parametrize('scenario_class, delta', [
+    (SymmetricStripline, 0.01e-3), (Microstrip, 0.05e-3),
+    (DifferentialStripline, 0.01e-3)])
+def test_graded_mesh(scenario_class, delta):
+    """Graded meshes match the uniform mesh with far fewer cells."""
+    uniform = scenario_class(dx=delta, dy=delta)
+    graded = scenario_class(dx=delta, dy=delta)
+    graded.grading = 1.2
+    np.testing.assert_allclose(graded.run_sim(), uniform.run_sim(),
+                               rtol=5e-3)
+    rows, cols = graded.mesh_lines
+    assert rows.size * cols.size * 3 < graded.Nx * graded.Ny
+    assert graded.voltages.size == graded.Nx * graded.Ny
+
+
+def test_graded_lines():
+    """Graded lines keep both sides of edges and grow away from them."""
+    edges = np.zeros(99, dtype=bool)
+    edges[49] = True
+    lines = SymmetricStripline._graded_lines(edges, 1.5)
+    assert lines[0] == 0 and lines[-1] == 99
+    assert 49 in lines and 50 in lines
+    spacing = np.diff(lines)
+    assert spacing.max() > 1
+    assert np.all(spacing[1:] <= np.ceil(1.5 * spacing[:-1]) + 1)
+
+
+@pytest.mark.parametrize('refine', ['global', 'field'])
+def test_adaptive_refinement(refine):
+    """Adaptive refinement converges towards the full grid solution."""
+    full = SymmetricStripline(dx=0.01e-3, dy=0.01e-3)
+    adaptive = SymmetricStripline(dx=0.01e-3, dy=0.01e-3)
+    adaptive.refine = refine
+    np.testing.assert_allclose(adaptive.run_sim(), full.run_sim(),
+                               rtol=5e-3)
+    cells = [num_cells for num_cells, _ in adaptive.refine_history]
+    assert len(cells) > 1 and cells == sorted(cells)
+    assert cells[-1] <= full.Nx * full.Ny
+    assert adaptive.voltages.size == full.Nx * full.Ny
+
+
+def test_invalid_refinement():
+    """Unknown refinement strategies raise ValueError."""
+    scenario = SymmetricStripline()
+    scenario.refine = 'everywhere'
+    with pytest.raises(ValueError):
+        scenario.run_sim()
+
+
+def test_richardson_extrapolation():
+    """Error estimates of coarse levels cover the full grid solution."""
+    scenario = SymmetricStripline(dx=0.005e-3, dy=0.005e-3)
+    full_scenario = SymmetricStripline(dx=0.005e-3, dy=0.005e-3)
+    full = full_scenario.run_sim()
+    results, errors = scenario.extrapolate(strides=(8, 4, 2), max_workers=1)
+    assert np.all(np.abs(np.subtract(results, full)) <= errors)
+    assert np.all(np.isfinite(scenario.convergence_order))
+    cells = [num_cells for num_cells, _ in scenario.extrapolation_history]
+    assert cells == sorted(cells)
+    assert cells[-1] < full_scenario.Nx * full_scenario.Ny
+    with pytest.raises(ValueError):
+        scenario.extrapolate(strides=(4, 2))
+
+
+def test_richardson_process_pool():
+    """Levels solved in a process pool match levels solved serially."""
+    serial = SymmetricStripline(dx=0.02e-3, dy=0.02e-3)
+    pooled = SymmetricStripline(dx=0.02e-3, dy=0.02e-3)
+    serial_results = serial.extrapolate(strides=(4, 2, 1), max_workers=1)
+    pooled_results = pooled.extrapolate(strides=(4, 2, 1), max_workers=2)
+    np.testing.assert_allclose(pooled_results, serial_results, rtol=1e-12)
+    for (serial_cells, serial_level), (pooled_cells, pooled_level) in zip(
+            serial.extrapolation_history, pooled.extrapolation_history):
+        assert pooled_cells == serial_cells
+        np.testing.assert_allclose(pooled_level, serial_level, rtol=1e-12)
+
+
+@pytest.mark.parametrize('scenario_class', [Coaxial, Microstrip,
+                                            DifferentialStripline])
+def test_mirror_symmetry(scenario_class):
+    """Folding symmetric meshes matches solving the full mesh."""
+    full = scenario_class()
+    full.symmetry = False
+    folded = scenario_class()
+    np.testing.assert_allclose(folded.run_sim(), full.run_sim(), rtol=1e-10)
+    np.testing.assert_allclose(folded.voltages, full.voltages, atol=1e-10)
+
+
+@pytest.mark.parametrize('shape', [(9, 12), (10, 11)])
+def test_solve_folded_parities(shape):
+    """Even and odd excitations of odd and even meshes fold exactly."""
+    rng = np.random.default_rng(0)
+    scenario = FDAScenario()
+    coef_x = rng.uniform(1, 2, (shape[0], shape[1] - 1))
+    coef_y = rng.uniform(1, 2, (shape[0] - 1, shape[1]))
+    coef_x = coef_x + coef_x[:, ::-1] + coef_x[::-1, :] + coef_x[::-1, ::-1]
+    coef_y = coef_y + coef_y[:, ::-1] + coef_y[::-1, :] + coef_y[::-1, ::-1]
+    coef_edge = np.zeros(shape)
+    coef_edge[:, [0, -1]] = 1
+    fixed = np.zeros(shape, dtype=bool)
+    fixed[[0, -1], :] = True
+    fixed[shape[0]//2, [2, -3]] = True
+    b_mat = np.zeros(shape)
+    b_mat[shape[0]//2, 2] = 1
+    b_mats = np.stack((b_mat + b_mat[:, ::-1], b_mat - b_mat[:, ::-1],
+                       b_mat), axis=-1).reshape((-1, 3))
+    folded, _ = scenario._solve_mesh(coef_x, coef_y, coef_edge, fixed,
+                                     b_mats)
+    scenario.symmetry = False
+    full, _ = scenario._solve_mesh(coef_x, coef_y, coef_edge, fixed,
+                                   b_mats)
+    np.testing.assert_allclose(folded, full, atol=1e-12)
+
+
+def test_skip_fields():
+    """Skipping field storage leaves results and voltages unchanged."""
+    stored = DifferentialStripline()
+    skipped = DifferentialStripline()
+    skipped.store_fields = False
+    np.testing.assert_allclose(skipped.run_sim(), stored.run_sim())
+    np.testing.assert_allclose(skipped.voltages, stored.voltages)
+    assert skipped.Ex_mat is None and stored.Ex_mat is not None
+
+
+@pytest.mark.parametrize('scenario_class', [SymmetricStripline, Microstrip])
+def test_analytical_batch(scenario_class):
+    """Array evaluation spans both formula branches like scalar calls."""
+    widths = np.linspace(0.05e-3, 3e-3, 7)
+    batch = scenario_class.analytical_batch(trace_w=widths)
+    scalar = [scenario_class(trace_w=width).analytical_soln()
+              for width in widths]
+    np.testing.assert_allclose(batch, scalar)
+    with pytest.raises(ValueError):
+        scenario_class.analytical_batch(width=widths)
+
+
+@pytest.mark.parametrize('solver', ['sparse', 'cg', 'multigrid'])
+def test_reduced_precision(solver):
+    """Mixed precision meets tol and single precision reports its residual."""
+    results = {}
+    for precision in ('double', 'mixed', 'single'):
+        scenario = Microstrip()
+        scenario.solver = solver
+        scenario.precision = precision
+        results[precision] = scenario.run_sim()
+        if precision != 'double':
+            assert scenario.solver_info['precision'] == precision
+            assert scenario.solver_info['converged']
+            assert scenario.Ex_mat.dtype == np.float32
+    assert scenario.solver_info['residual'] < 1e-4
+    np.testing.assert_allclose(results['mixed'], results['double'],
+                               rtol=1e-8)
+    np.testing.assert_allclose(results['single'], results['double'],
+                               rtol=1e-4)
+    with pytest.raises(ValueError):
+        scenario.precision = 'half'
+        scenario.run_sim()
+
+
+def test_single_precision_memory(monkeypatch):
+    """Single precision keeps only the float32 operator."""
+    monkeypatch.setattr(fda_solvers, 'residual_block_rows', 7)
+    shape = (12, 10)
+    laplacian = kronsum(diags([1.0, -2.0, 1.0], [-1, 0, 1], (shape[1],) * 2),
+                        diags([1.0, -2.0, 1.0], [-1, 0, 1], (shape[0],) * 2))
+    fixed = np.zeros(shape, dtype=bool)
+    fixed[[0, -1], :] = True
+    fixed = fixed.ravel()
+    b_mat = np.where(fixed, 1.0, 0.0)
+    double = FDASystem(laplacian, fixed, shape)
+    single = FDASystem(laplacian, fixed, shape, precision='single')
+    voltages, info = single.solve(b_mat)
+    assert single.work_matrix.dtype == np.float32 and single.matrix is None
+    x = voltages[single.free]
+    rhs = single.coupling @ b_mat[single.known]
+    residual = np.linalg.norm(rhs - single.work_matrix.astype(float) @ x)
+    np.testing.assert_allclose(info['residual'],
+                               residual / np.linalg.norm(rhs), rtol=1e-12)
+    np.testing.assert_allclose(voltages, double.solve(b_mat)[0], atol=1e-5)
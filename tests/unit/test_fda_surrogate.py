@@ -0,0 +1,72 @@
+"""Run pytest unit testing on FDA surrogate models."""
+# %% Imports
+# Standard system imports
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from pycem.fda_scenarios import SymmetricStripline
+from pycem.fda_surrogate import (Surrogate, build_surrogates, default_box,
+                                  load_surrogates)
+
+
+# %% Fixtures
+@pytest.fixture(scope='module')
+def surrogate():
+    """Return surrogate of stripline impedance over trace width and Er."""
+    return Surrogate.build(SymmetricStripline,
+                           {'trace_w': (0.15e-3, 0.4e-3), 'Er': (2, 5)},
+                           num_points=4, num_holdout=3, max_workers=1)
+
+
+# %% Tests
+def test_predict_within_error(surrogate):
+    """Predictions inside the box are within the held-out error bound."""
+    params = {'trace_w': 0.27e-3, 'Er': 3.1}
+    predicted = surrogate.predict(**params)
+    simulated = SymmetricStripline(**params).run_sim()
+    assert np.all(np.abs(np.divide(predicted, simulated) - 1)
+                  <= 2 * surrogate.errors)
+    z0 = surrogate.predict(trace_w=[0.2e-3, 0.3e-3], Er=3.1)[2]
+    assert z0.shape == (2,) and z0[0] > z0[1]
+
+
+def test_fallback_outside_box(surrogate):
+    """Untrusted points are simulated in full or left as nan."""
+    params = {'trace_w': 0.5e-3, 'Er': 3.1}
+    assert not surrogate.trusted(**params)
+    np.testing.assert_allclose(surrogate.predict(**params),
+                               SymmetricStripline(**params).run_sim())
+    assert np.isnan(surrogate.predict(fallback=False, **params)[2])
+    assert not surrogate.trusted(dx=0.01e-3, **params)
+
+
+def test_explain_untrusted(surrogate):
+    """Every parameter outside the surrogate is named in the explanation."""
+    assert surrogate.explain(trace_w=0.3e-3, Er=3.1) == ''
+    reason = surrogate.explain(trace_w=0.5e-3, Er=3.1, dx=0.01e-3)
+    assert 'trace_w must lie in' in reason
+    assert 'dx must be' in reason
+    assert 'Er' not in reason
+
+
+def test_save_load(surrogate, tmp_path):
+    """Saved surrogates predict the same results when loaded."""
+    surrogate.save(tmp_path / 'SymmetricStripline.npz')
+    loaded = load_surrogates(tmp_path)['SymmetricStripline']
+    np.testing.assert_allclose(loaded.predict(trace_w=0.3e-3, Er=4),
+                               surrogate.predict(trace_w=0.3e-3, Er=4))
+    np.testing.assert_allclose(loaded.errors, surrogate.errors)
+    assert load_surrogates(tmp_path / 'missing') == {}
+
+
+def test_build_surrogates(tmp_path):
+    """Built surrogates are saved where load_surrogates finds them."""
+    box = default_box(SymmetricStripline)
+    assert set(box) == {'Er', 'sub_thk', 'trace_w'}
+    build_surrogates(tmp_path, [SymmetricStripline], num_points=2,
+                     num_holdout=1, max_workers=1)
+    loaded = load_surrogates(tmp_path)['SymmetricStripline']
+    assert loaded.trusted(**SymmetricStripline().get_params())
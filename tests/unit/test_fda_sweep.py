@@ -0,0 +1,74 @@
+"""Run pytest unit testing on FDA parameter sweeps."""
+# %% Imports
+# Standard system imports
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from pycem.fda_scenarios import DifferentialStripline, SymmetricStripline
+from pycem.fda_sweep import analytical_sweep, parameter_grid, sweep
+
+
+# %% Tests
+def test_pool_matches_serial():
+    """Process pool sweep returns serial results in grid order."""
+    grid = parameter_grid(trace_w=[0.3e-3, 0.5e-3], Er=[2, 4], dx=[0.05e-3],
+                          dy=[0.05e-3])
+    completed = []
+    table = sweep(SymmetricStripline, grid, max_workers=2,
+                  callback=lambda idx, params, results: completed.append(idx))
+    assert sorted(completed) == list(range(len(grid)))
+    for row, params in zip(table, grid):
+        C, L, z0 = SymmetricStripline(**params).run_sim()
+        assert row['trace_w'] == params['trace_w']
+        np.testing.assert_allclose((row['C'], row['L'], row['z0']),
+                                   (C, L, z0), rtol=1e-12)
+
+
+def test_differential_fields():
+    """Differential scenarios report odd and even mode impedances."""
+    grid = parameter_grid(spacing=[0.2e-3], dx=[0.05e-3], dy=[0.05e-3])
+    table = sweep(DifferentialStripline, grid, settings={'solver': 'dense'},
+                  max_workers=1)
+    np.testing.assert_allclose(table['odd_z0'], 0.5 * table['diff_z0'])
+    np.testing.assert_allclose(table['even_z0'], 2 * table['comm_z0'])
+
+
+def test_unknown_parameter():
+    """Parameters that are not scenario arguments raise ValueError."""
+    with pytest.raises(ValueError):
+        sweep(SymmetricStripline, [{'spacing': 1e-3}], max_workers=1)
+
+
+@pytest.mark.parametrize('setting', ['name', 'run_sim', 'Er'])
+def test_unknown_setting(setting):
+    """Attributes that are not solver settings raise ValueError."""
+    with pytest.raises(ValueError):
+        sweep(SymmetricStripline, [{}], settings={setting: None},
+              max_workers=1)
+
+
+def test_warm_start_sweep():
+    """Warm-started sweeps match cold sweeps with fewer iterations."""
+    grid = parameter_grid(trace_w=[0.3e-3, 0.32e-3], Er=[3, 4])
+    settings = {'solver': 'cg', 'tol': 1e-10}
+    cold = sweep(SymmetricStripline, grid, settings=settings, max_workers=1)
+    warm = sweep(SymmetricStripline, grid, settings=settings, max_workers=1,
+                 warm_start=True)
+    np.testing.assert_allclose(warm['z0'], cold['z0'], rtol=1e-8)
+    assert warm['iterations'].sum() < cold['iterations'].sum()
+    assert np.all(cold['iterations_saved'] == 0)
+
+
+def test_analytical_sweep():
+    """Vectorized analytical impedances match scalar evaluation."""
+    grid = parameter_grid(trace_w=[0.1e-3, 0.35e-3, 1e-3], Er=[3, 4])
+    table = analytical_sweep(DifferentialStripline, grid)
+    for row, params in zip(table, grid):
+        scenario = DifferentialStripline(**params)
+        np.testing.assert_allclose(
+            [row[name] for name in ('diff_z0', 'comm_z0', 'odd_z0',
+                                    'even_z0')],
+            scenario.analytical_soln())
@@ -0,0 +1,115 @@
+"""Run pytest unit testing on FDTD scenarios."""
+# %% Imports
+# Standard system imports
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from pycem.fdtd_scenarios import Grid, RickerTMz2D, TFSFDisk, mat_pec
+
+
+# %% Functions
+def ricker_reference(sizeX, sizeY, max_time, Cdtds):
+    """Return Ez at every time step of the Ricker scenario in NumPy."""
+    imp0 = 377.0
+    Hx = np.zeros((sizeX, sizeY-1))
+    Hy = np.zeros((sizeX-1, sizeY))
+    Ez = np.zeros((max_time, sizeX, sizeY))
+    for time in range(1, max_time):
+        prev = Ez[time-1]
+        Hx -= Cdtds / imp0 * (prev[:, 1:] - prev[:, :-1])
+        Hy += Cdtds / imp0 * (prev[1:, :] - prev[:-1, :])
+        Ez[time, 1:-1, 1:-1] = prev[1:-1, 1:-1] + Cdtds * imp0 * (
+            (Hy[1:, 1:-1] - Hy[:-1, 1:-1]) - (Hx[1:-1, 1:] - Hx[1:-1, :-1]))
+        arg = (np.pi * ((Cdtds * time) / 20 - 1.0))**2
+        Ez[time, sizeX//2, sizeY//2] = (1.0 - 2.0 * arg) * np.exp(-arg)
+    return Ez
+
+
+# %% Tests
+def test_ricker_snapshots():
+    """Snapshots of the two level Ez buffer match the full time history."""
+    scenario = RickerTMz2D(Grid(), snap_every=7)
+    scenario.run_sim()
+    reference = ricker_reference(scenario.sizeX, scenario.sizeY,
+                                 scenario.max_time, scenario.Cdtds)
+    assert scenario.arr.Ez.shape[0] == 2
+    np.testing.assert_array_equal(scenario.arr.snap_steps,
+                                  np.arange(0, scenario.max_time, 7))
+    np.testing.assert_allclose(scenario.arr.snapshots, reference[::7],
+                               rtol=0, atol=1e-12)
+
+
+def test_snapshot_steps():
+    """Snapshots at listed steps match snapshots of every step."""
+    every = TFSFDisk(Grid())
+    every.run_sim()
+    listed = TFSFDisk(Grid(), snap_steps=[0, 115, 299])
+    listed.run_sim()
+    assert listed.arr.snapshots.shape[0] == 3
+    np.testing.assert_array_equal(listed.arr.snapshot(115),
+                                  every.arr.snapshots[115])
+    with pytest.raises(ValueError):
+        listed.arr.snapshot(116)
+    with pytest.raises(ValueError):
+        TFSFDisk(Grid(), snap_steps=[10, 5])
+
+
+@pytest.mark.parametrize('num_threads', [2, 3])
+def test_thread_pool(num_threads):
+    """Row tiles updated by a thread pool match a serial update."""
+    serial = TFSFDisk(Grid(), num_threads=1)
+    serial.run_sim()
+    threaded = TFSFDisk(Grid(), num_threads=num_threads)
+    threaded.run_sim()
+    np.testing.assert_array_equal(threaded.arr.snapshots,
+                                  serial.arr.snapshots)
+    assert not threaded.g.pool
+
+
+@pytest.mark.parametrize('tile_steps', [2, 5])
+def test_tiled_steps(tile_steps):
+    """Wavefront sweeps over several steps match single time steps."""
+    stepped = RickerTMz2D(Grid(), snap_steps=[0, 3, 4, 150, 299])
+    stepped.run_sim()
+    tiled = RickerTMz2D(Grid(), snap_steps=[0, 3, 4, 150, 299],
+                        tile_steps=tile_steps)
+    tiled.run_sim()
+    np.testing.assert_array_equal(tiled.arr.snapshots,
+                                  stepped.arr.snapshots)
+    np.testing.assert_array_equal(tiled.arr.Ez, stepped.arr.Ez)
+
+
+def test_material_map():
+    """PEC cells of the material map hold Ez at zero."""
+    scenario = TFSFDisk(Grid())
+    scenario.run_sim()
+    pec = scenario.arr.material == mat_pec
+    assert pec.sum() > 0 and scenario.arr.material.dtype == np.uint8
+    assert np.all(scenario.arr.snapshots[:, pec] == 0)
+    assert np.any(scenario.arr.snapshots[:, ~pec] != 0)
+    np.testing.assert_array_equal(scenario.arr.coefficients('Ceze') == 0, pec)
+    assert scenario.arr.coefficients('Chxe').shape == scenario.arr.Hx.shape
+    assert scenario.arr.coefficients('Chye').shape == scenario.arr.Hy.shape
+
+
+def test_unsupported_material():
+    """Material IDs beyond PEC are rejected before calling into C."""
+    scenario = TFSFDisk(Grid())
+    scenario.arr.material[10, 10] = mat_pec + 1
+    with pytest.raises(ValueError):
+        scenario.run_sim()
+
+
+def test_tfsf_ignores_tiling():
+    """TFSF scenarios reset tile_steps and step whole time steps."""
+    stepped = TFSFDisk(Grid())
+    stepped.run_sim()
+    tiled = TFSFDisk(Grid())
+    tiled.g.tile_steps = 4
+    tiled.run_sim()
+    assert tiled.g.tile_steps == 0
+    np.testing.assert_array_equal(tiled.arr.snapshots,
+                                  stepped.arr.snapshots)